@@ -1,29 +1,84 @@
 #include <Servo.h>
 
-// Create a servo object
-Servo myServo;
+// Servo pins, one per joint. Joint 0 (pin 9) is the one the text
+// commands drive; the others are only reachable through binary frames.
+const int SERVO_PINS[] = {9, 10, 11, 5, 6};
+const byte SERVO_COUNT = sizeof(SERVO_PINS) / sizeof(SERVO_PINS[0]);
+Servo servos[SERVO_COUNT];
+int targets[SERVO_COUNT];    // where each servo is headed
+int positions[SERVO_COUNT];  // what was last written to it
 
-// Define servo pin
-const int SERVO_PIN = 9;  // Servo on pin 9
+// Non-blocking moves: write the target and return at once instead of
+// delay(500), so the next command (or a host setpoint stream from
+// trajectory.py) is read immediately. Set to false for the old behaviour.
+const bool NON_BLOCKING_MOVES = true;
+// With non-blocking moves, optionally slew toward the target in loop()
+// instead of jumping: at most SLEW_DEG_PER_STEP every STEP_MS (0 = jump).
+const int SLEW_DEG_PER_STEP = 0;
+const unsigned long STEP_MS = 20;
+const unsigned long SETTLE_MS = 500;
+unsigned long lastStep = 0;
 
 // Define positions (0-180 degrees)
 const int OPEN_POS = 0;     // Open position (0°)
 const int CLOSE_POS = 90;   // Close position (90°)
 
+// Binary protocol (see serial_protocol.py on the host):
+//   0xA5 | cmd | seq | len | payload[len] | crc8(cmd, seq, len, payload)
+// Each request is answered with a short ack frame (cmd | 0x80).
+// Text commands ("open", "close", "shut") keep working as before.
+// Protocol 2 adds STATUS: the servos' positions, on request and
+// unprompted (seq 0, no ack flag) when slewing servos come to rest.
+const byte FRAME_START = 0xA5;
+const byte PROTOCOL_VERSION = 2;
+const byte CMD_HELLO = 0x01;
+const byte CMD_MOVE = 0x02;
+const byte CMD_POSE = 0x03;
+const byte CMD_BAUD = 0x04;
+const byte CMD_ECHO = 0x05;
+const byte CMD_STATUS = 0x06;
+const byte ACK_FLAG = 0x80;
+const byte STATUS_OK = 0;
+const byte STATUS_BAD_SERVO = 1;
+const byte STATUS_BAD_ANGLE = 2;
+const byte STATUS_UNKNOWN = 3;
+const byte MAX_PAYLOAD = 16;
+const unsigned long FRAME_TIMEOUT_MS = 50;
+
+// Baud negotiation: every session starts at BAUD_RATES[0]. After a BAUD
+// command the sketch switches and waits BAUD_CONFIRM_MS for a valid frame
+// at the new rate; if none arrives it goes back to 9600 by itself.
+const long BAUD_RATES[] = {9600, 19200, 38400, 57600, 115200};
+const byte BAUD_COUNT = sizeof(BAUD_RATES) / sizeof(BAUD_RATES[0]);
+const byte BAUD_MASK = 0x1F;  // bit i set = BAUD_RATES[i] supported
+const unsigned long BAUD_CONFIRM_MS = 1000;
+bool baudUnconfirmed = false;
+// Set once the host sends command frames: stray bytes (a frame that lost
+// a byte) are then skipped up to the next start byte instead of being
+// read as a text line, which would swallow every frame for a second
+bool binaryMode = false;
+unsigned long baudSwitchedAt = 0;
+
 void setup() {
   // Initialize serial communication
   Serial.begin(9600);
   while (!Serial) {
     ; // Wait for serial port to connect
   }
-  
-  // Attach the servo to its pin
-  if (myServo.attach(SERVO_PIN) == 0) {
-    Serial.println("Failed to attach servo! Check wiring.");
-  } else {
+
+  // Attach the servos to their pins
+  bool attachFailed = false;
+  for (byte i = 0; i < SERVO_COUNT; i++) {
+    targets[i] = positions[i] = CLOSE_POS;
+    if (servos[i].attach(SERVO_PINS[i]) == 0) {
+      Serial.println("Failed to attach servo! Check wiring.");
+      attachFailed = true;
+    }
+  }
+  if (!attachFailed) {
     Serial.println("Servo attached successfully to pin 9");
   }
-  
+
   // Start with servo in closed position
   closeServo();
   Serial.println("\nSingle Servo Control Ready!");
@@ -31,19 +86,34 @@ void setup() {
 }
 
 void loop() {
+  updateServos();
+  checkBaudConfirm();
+
   if (Serial.available() > 0) {
+    if (Serial.peek() == FRAME_START) {
+      readFrame();
+      return;
+    }
+    if (binaryMode) {
+      Serial.read();  // resync on the next frame
+      return;
+    }
+
     String command = Serial.readStringUntil('\n');
     command.trim();
-    
+    if (command.length() == 0) {
+      return;  // e.g. the newline that follows a binary HELLO
+    }
+
     // Echo back the received command for debugging
     Serial.print("\nReceived command: ");
     Serial.println(command);
-    
+
     // Process commands
     if (command == "open") {
       Serial.println("Opening servo...");
       openServo();
-    } 
+    }
     else if (command == "shut" || command == "close") {
       Serial.println("Closing servo...");
       closeServo();
@@ -68,14 +138,207 @@ void closeServo() {
 void moveServo(int angle) {
   // Constrain the angle to valid range (0-180)
   angle = constrain(angle, 0, 180);
-  
+
   Serial.print("Moving to ");
   Serial.print(angle);
   Serial.println("°");
-  
+
   // Move the servo to the specified angle
-  myServo.write(angle);
-  
-  // Add a small delay to allow the servo to reach the position
-  delay(500);
-}
\ No newline at end of file
+  setTarget(0, angle);
+  finishMove();
+}
+
+void setTarget(byte servo, int angle) {
+  targets[servo] = angle;
+  if (!NON_BLOCKING_MOVES || SLEW_DEG_PER_STEP == 0) {
+    servos[servo].write(angle);
+    positions[servo] = angle;
+  }
+}
+
+// In blocking mode, give the servos time to reach their targets
+void finishMove() {
+  if (!NON_BLOCKING_MOVES) {
+    delay(SETTLE_MS);
+  }
+}
+
+// Step slewing servos toward their targets (non-blocking mode only)
+void updateServos() {
+  if (!NON_BLOCKING_MOVES || SLEW_DEG_PER_STEP == 0) return;
+  if (millis() - lastStep < STEP_MS) return;
+  lastStep = millis();
+  bool settled = false;
+  for (byte i = 0; i < SERVO_COUNT; i++) {
+    int error = targets[i] - positions[i];
+    if (error == 0) continue;
+    positions[i] += constrain(error, -SLEW_DEG_PER_STEP, SLEW_DEG_PER_STEP);
+    servos[i].write(positions[i]);
+    if (positions[i] == targets[i]) settled = true;
+  }
+  if (settled) {
+    sendStatus(CMD_STATUS, 0);  // tell the host where the servos ended up
+  }
+}
+
+// CRC-8, polynomial 0x07, init 0 (same as crc8() in serial_protocol.py)
+byte crc8(const byte *data, byte length) {
+  byte crc = 0;
+  for (byte i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (byte bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : (crc << 1);
+    }
+  }
+  return crc;
+}
+
+// Read one byte, giving up after FRAME_TIMEOUT_MS
+int readByteTimeout() {
+  unsigned long start = millis();
+  while (Serial.available() == 0) {
+    if (millis() - start > FRAME_TIMEOUT_MS) {
+      return -1;
+    }
+  }
+  return Serial.read();
+}
+
+void sendAck(byte cmd, byte seq, const byte *payload, byte length) {
+  sendFrame(cmd | ACK_FLAG, seq, payload, length);
+}
+
+void sendFrame(byte cmd, byte seq, const byte *payload, byte length) {
+  byte frame[4 + MAX_PAYLOAD + 1];
+  frame[0] = FRAME_START;
+  frame[1] = cmd;
+  frame[2] = seq;
+  frame[3] = length;
+  for (byte i = 0; i < length; i++) {
+    frame[4 + i] = payload[i];
+  }
+  frame[4 + length] = crc8(frame + 1, 3 + length);
+  Serial.write(frame, 5 + length);
+}
+
+// Positions as [status, count, moving mask, angle * count]; cmd is
+// CMD_STATUS for an unprompted report, or CMD_STATUS | ACK_FLAG
+void sendStatus(byte cmd, byte seq) {
+  byte reply[3 + SERVO_COUNT];
+  reply[0] = STATUS_OK;
+  reply[1] = SERVO_COUNT;
+  reply[2] = 0;
+  for (byte i = 0; i < SERVO_COUNT; i++) {
+    if (positions[i] != targets[i]) reply[2] |= 1 << i;
+    reply[3 + i] = positions[i];
+  }
+  sendFrame(cmd, seq, reply, 3 + SERVO_COUNT);
+}
+
+void readFrame() {
+  // body = cmd, seq, len, payload (the part covered by the CRC)
+  byte body[3 + MAX_PAYLOAD];
+  Serial.read();  // start byte
+  for (byte i = 0; i < 3; i++) {
+    int value = readByteTimeout();
+    if (value < 0) return;
+    body[i] = value;
+  }
+  byte length = body[2];
+  if (length > MAX_PAYLOAD) return;
+  for (byte i = 0; i < length; i++) {
+    int value = readByteTimeout();
+    if (value < 0) return;
+    body[3 + i] = value;
+  }
+  int crc = readByteTimeout();
+  if (crc < 0 || crc != crc8(body, 3 + length)) {
+    return;  // corrupted frame: no ack, the host times out and retries
+  }
+  baudUnconfirmed = false;  // a valid frame arrived, so the current rate works
+  // Every host session starts with HELLO; text-only hosts send nothing else
+  binaryMode = body[0] != CMD_HELLO;
+  handleFrame(body[0], body[1], body + 3, length);
+}
+
+void setBaud(long rate) {
+  Serial.flush();  // finish sending the ack at the old rate
+  Serial.end();
+  Serial.begin(rate);
+}
+
+// Fall back to 9600 if the host never spoke at the negotiated rate
+void checkBaudConfirm() {
+  if (baudUnconfirmed && millis() - baudSwitchedAt > BAUD_CONFIRM_MS) {
+    baudUnconfirmed = false;
+    setBaud(BAUD_RATES[0]);
+  }
+}
+
+void handleFrame(byte cmd, byte seq, const byte *payload, byte length) {
+  byte reply[1 + MAX_PAYLOAD];
+  if (cmd == CMD_HELLO) {
+    reply[0] = STATUS_OK;
+    reply[1] = PROTOCOL_VERSION;
+    reply[2] = BAUD_MASK;
+    sendAck(cmd, seq, reply, 3);
+  }
+  else if (cmd == CMD_STATUS) {
+    sendStatus(cmd | ACK_FLAG, seq);
+  }
+  else if (cmd == CMD_BAUD && length == 1) {
+    byte index = payload[0];
+    reply[0] = index < BAUD_COUNT ? STATUS_OK : STATUS_UNKNOWN;
+    reply[1] = index;
+    sendAck(cmd, seq, reply, 2);
+    if (index < BAUD_COUNT) {
+      setBaud(BAUD_RATES[index]);
+      baudUnconfirmed = true;
+      baudSwitchedAt = millis();
+    }
+  }
+  else if (cmd == CMD_ECHO && length < MAX_PAYLOAD) {
+    reply[0] = STATUS_OK;
+    for (byte i = 0; i < length; i++) {
+      reply[1 + i] = payload[i];
+    }
+    sendAck(cmd, seq, reply, 1 + length);
+  }
+  else if (cmd == CMD_MOVE && length >= 2) {
+    byte servo = payload[0];
+    byte angle = payload[1];
+    reply[1] = servo;
+    reply[2] = angle;
+    if (servo >= SERVO_COUNT) {
+      reply[0] = STATUS_BAD_SERVO;
+    } else if (angle > 180) {
+      reply[0] = STATUS_BAD_ANGLE;
+    } else {
+      reply[0] = STATUS_OK;
+      setTarget(servo, angle);
+      finishMove();
+    }
+    sendAck(cmd, seq, reply, 3);
+  }
+  else if (cmd == CMD_POSE && length % 2 == 0) {
+    // Validate every joint first so a bad frame moves nothing
+    reply[0] = STATUS_OK;
+    for (byte i = 0; i < length; i += 2) {
+      if (payload[i] >= SERVO_COUNT) reply[0] = STATUS_BAD_SERVO;
+      else if (payload[i + 1] > 180) reply[0] = STATUS_BAD_ANGLE;
+    }
+    if (reply[0] == STATUS_OK) {
+      // All joints start together, then one settle delay for the whole pose
+      for (byte i = 0; i < length; i += 2) {
+        setTarget(payload[i], payload[i + 1]);
+      }
+      finishMove();
+    }
+    reply[1] = length / 2;
+    sendAck(cmd, seq, reply, 2);
+  }
+  else {
+    reply[0] = STATUS_UNKNOWN;
+    sendAck(cmd, seq, reply, 1);
+  }
+}
@@ -0,0 +1,54 @@
+// Push channel for dashboard.py: every event from /events (Server-Sent
+// Events) is written into the 'server-event' store (port list changes into
+// 'ports-event', new command history into 'history-event'), which triggers
+// the callbacks at once. 'servo' events carry the angle, so they go straight
+// to 'servo-angle' and the gauge moves without a round trip. While the
+// stream is up, the 'update-interval' poll is switched off; if it drops (or
+// the browser has no EventSource), polling takes over again.
+(function () {
+    var STORES = {ports: 'ports-event', history: 'history-event'};  // event kind -> store, if not 'server-event'
+
+    function setProps(id, props) {
+        try {
+            window.dash_clientside.set_props(id, props);
+            return true;
+        } catch (e) {
+            return false;
+        }
+    }
+
+    function connect() {
+        // Wait until the layout is rendered (set_props needs Dash 2.16+)
+        var ready = window.dash_clientside && window.dash_clientside.set_props &&
+            document.getElementById('servo-gauge');
+        if (!ready || !setProps('update-interval', {disabled: false})) {
+            setTimeout(connect, 500);
+            return;
+        }
+        if (!window.EventSource) {
+            return;  // polling only
+        }
+        var source = new EventSource('/events');
+        source.onopen = function () {
+            setProps('update-interval', {disabled: true});
+        };
+        source.onmessage = function (message) {
+            var event = JSON.parse(message.data);
+            if (event.kind === 'servo') {
+                setProps('servo-angle', {data: event.data.angle});
+                return;
+            }
+            setProps(STORES[event.kind] || 'server-event', {data: event});
+        };
+        source.onerror = function () {
+            // EventSource reconnects by itself; poll until it does
+            setProps('update-interval', {disabled: false});
+        };
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', connect);
+    } else {
+        connect();
+    }
+})();
@@ -0,0 +1,30 @@
+// Clientside gauge update for dashboard.py. The server (or a pushed 'servo'
+// event) only sends the angle; the figure made once by create_gauge() is
+// patched here instead of being rebuilt and re-sent on every update.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    gauge: {
+        update: function (angle, figure) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (angle === null || angle === undefined || !figure || !figure.data) {
+                return noUpdate;
+            }
+            var indicator = figure.data[0];
+            if (indicator.value === angle) {
+                return noUpdate;
+            }
+            var gauge = Object.assign({}, indicator.gauge, {
+                threshold: Object.assign({}, indicator.gauge.threshold, {value: angle})
+            });
+            var updated = Object.assign({}, indicator, {
+                value: angle,
+                title: Object.assign({}, indicator.title, {text: 'Servo Position: ' + angle + '°'}),
+                gauge: gauge
+            });
+            return Object.assign({}, figure, {
+                data: [updated].concat(figure.data.slice(1)),
+                // Let Plotly sweep the needle to the new angle
+                layout: Object.assign({}, figure.layout, {transition: {duration: 250, easing: 'cubic-in-out'}})
+            });
+        }
+    }
+});
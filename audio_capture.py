@@ -0,0 +1,197 @@
+import threading
+import time
+
+import pyaudio
+
+
+class RingBuffer:
+    """Preallocated single-producer / single-consumer byte ring.
+
+    The capture callback is the only writer and the decode thread the only
+    reader. Each side only advances its own position counter, so no lock
+    is shared between them. When the ring is full, incoming audio is
+    dropped and counted as an overrun instead of blocking the callback.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.write_total = 0  # only advanced by the producer
+        self.read_total = 0   # only advanced by the consumer
+        self.overruns = 0
+        self.dropped_bytes = 0
+        self.peak_fill = 0
+        self.data_ready = threading.Event()
+
+    def fill(self):
+        """Bytes currently buffered"""
+        return self.write_total - self.read_total
+
+    def write(self, data):
+        """Append data; returns False (and drops it) if it doesn't fit"""
+        size = len(data)
+        fill = self.fill()
+        if fill + size > self.capacity:
+            self.overruns += 1
+            self.dropped_bytes += size
+            self.data_ready.set()
+            return False
+        start = self.write_total % self.capacity
+        first = min(size, self.capacity - start)
+        self.view[start:start + first] = data[:first]
+        if first < size:
+            self.view[0:size - first] = data[first:]
+        self.write_total += size
+        self.peak_fill = max(self.peak_fill, fill + size)
+        self.data_ready.set()
+        return True
+
+    def read(self, size, timeout=None):
+        """Remove and return exactly size bytes, or None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.fill() < size:
+            self.data_ready.clear()
+            if self.fill() >= size:
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self.data_ready.wait(remaining)
+        start = self.read_total % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self.view[start:start + first])
+        if first < size:
+            data += bytes(self.view[0:size - first])
+        self.read_total += size
+        return data
+
+
+class CallbackCapture:
+    """PyAudio callback-mode capture feeding a RingBuffer.
+
+    The audio callback only copies into the ring, so a slow decoder can no
+    longer overflow the device buffer; it falls behind inside the ring
+    instead, and only loses audio once buffer_seconds of it are queued.
+    """
+
+    def __init__(self, frames_per_buffer, sample_rate, buffer_seconds=2.0, sample_width=2, channels=1):
+        self.frames_per_buffer = frames_per_buffer
+        self.frame_bytes = sample_width * channels
+        capacity = int(sample_rate * buffer_seconds) * self.frame_bytes
+        self.ring = RingBuffer(max(capacity, frames_per_buffer * self.frame_bytes * 2))
+        self.device_overflows = 0
+        self.callbacks = 0
+        self.stream = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.callbacks += 1
+        if status & pyaudio.paInputOverflow:
+            self.device_overflows += 1
+        self.ring.write(in_data)
+        return (None, pyaudio.paContinue)
+
+    def open(self, audio, **stream_kwargs):
+        """Open and start a callback stream on audio (PyAudio or SyntheticAudio)"""
+        self.stream = audio.open(
+            input=True,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+            **stream_kwargs
+        )
+        return self.stream
+
+    def read(self, frames, timeout=1.0):
+        """Read frames worth of audio, or None if none arrived within timeout"""
+        return self.ring.read(frames * self.frame_bytes, timeout)
+
+    def stats(self):
+        """Capture counters for logging and benchmarks"""
+        ring = self.ring
+        return {
+            'callbacks': self.callbacks,
+            'overruns': ring.overruns,
+            'dropped_bytes': ring.dropped_bytes,
+            'device_overflows': self.device_overflows,
+            'fill_bytes': ring.fill(),
+            'fill_pct': 100.0 * ring.fill() / ring.capacity,
+            'peak_fill_pct': 100.0 * ring.peak_fill / ring.capacity,
+        }
+
+
+class SyntheticStream:
+    """Stand-in for a PyAudio callback stream that plays back raw PCM"""
+
+    def __init__(self, pcm, frames_per_buffer, rate, stream_callback,
+                 realtime=True, loop=False, sample_width=2, start=True):
+        self.pcm = pcm
+        self.step = frames_per_buffer * sample_width
+        self.frames_per_buffer = frames_per_buffer
+        self.period = frames_per_buffer / rate
+        self.callback = stream_callback
+        self.realtime = realtime
+        self.loop = loop
+        self.active = False
+        self.thread = None
+        if start:
+            self.start_stream()
+
+    def _run(self):
+        next_time = time.monotonic()
+        position = 0
+        while self.active:
+            chunk = self.pcm[position:position + self.step]
+            position += self.step
+            if len(chunk) < self.step:
+                if not self.loop or not self.pcm:
+                    self.active = False
+                    break
+                position = 0
+                continue
+            self.callback(chunk, self.frames_per_buffer, {}, 0)
+            if self.realtime:
+                next_time += self.period
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def start_stream(self):
+        self.active = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop_stream(self):
+        self.active = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def is_active(self):
+        return self.active
+
+    def is_stopped(self):
+        return not self.active
+
+    def close(self):
+        self.stop_stream()
+
+
+class SyntheticAudio:
+    """Minimal PyAudio replacement that serves a fixed PCM buffer.
+
+    Use it in place of pyaudio.PyAudio() to exercise callback capture
+    without a microphone, e.g. with audio loaded by wav_dataset.py.
+    """
+
+    def __init__(self, pcm, realtime=True, loop=False):
+        self.pcm = pcm
+        self.realtime = realtime
+        self.loop = loop
+
+    def open(self, rate, frames_per_buffer, stream_callback, start=True, **kwargs):
+        return SyntheticStream(
+            self.pcm, frames_per_buffer, rate, stream_callback,
+            realtime=self.realtime, loop=self.loop, start=start
+        )
+
+    def terminate(self):
+        pass
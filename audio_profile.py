@@ -0,0 +1,43 @@
+import os
+
+# Select with the VOICE_AUDIO_PROFILE environment variable. A bare number
+# ("2000") means that many frames per buffer and per read, with no sleep.
+PROFILE_ENV = "VOICE_AUDIO_PROFILE"
+DEFAULT_PROFILE = "balanced"
+
+
+class AudioProfile:
+    """Capture/read sizes and poll policy shared by every entry point"""
+
+    def __init__(self, name, frames_per_buffer, read_size, sleep=0.0):
+        self.name = name
+        self.frames_per_buffer = frames_per_buffer  # device buffer size
+        self.read_size = read_size                  # frames handed to the recognizer per read
+        self.sleep = sleep                          # pause after each read (0 = block on the device)
+
+    def read_seconds(self, sample_rate):
+        return self.read_size / sample_rate
+
+    def __repr__(self):
+        return (f"AudioProfile({self.name!r}, frames_per_buffer={self.frames_per_buffer}, "
+                f"read_size={self.read_size}, sleep={self.sleep})")
+
+
+PROFILES = {
+    'ultra-low': AudioProfile('ultra-low', 800, 800),            # 50 ms reads
+    'low': AudioProfile('low', 1600, 1600),                      # 100 ms
+    'balanced': AudioProfile('balanced', 4000, 4000),            # 250 ms
+    'legacy': AudioProfile('legacy', 8192, 8192),                # old voice_control.py
+    'dashboard-legacy': AudioProfile('dashboard-legacy', 4000, 4000, sleep=0.1),  # old dashboard.py
+}
+
+
+def get_profile(name=None):
+    """Look up a profile by name (default: $VOICE_AUDIO_PROFILE or 'balanced')"""
+    name = name or os.environ.get(PROFILE_ENV) or DEFAULT_PROFILE
+    if name in PROFILES:
+        return PROFILES[name]
+    if name.isdigit():
+        return AudioProfile(name, int(name), int(name))
+    print(f"⚠️  Unknown audio profile '{name}', using '{DEFAULT_PROFILE}'")
+    return PROFILES[DEFAULT_PROFILE]
@@ -0,0 +1,85 @@
+"""Dashboard gauge update cost: full figure per update vs angle only
+
+Usage: python benchmark_dashboard.py [--updates 500] [--json gauge.json]
+
+update_servo used to return create_gauge(angle), so every click, pushed
+event and poll rebuilt the whole Plotly figure and sent it to the browser.
+Now it returns only the confirmed angle, and assets/gauge.js moves the
+gauge in the browser. For both ways this measures what one update costs
+the server (building the output and serializing it the way Dash does)
+and how many bytes of it go over the wire.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from plotly.utils import PlotlyJSONEncoder
+
+from dashboard_gauge import create_gauge
+from latency import percentile
+
+ANGLES = [0, 45, 90, 135, 180]
+
+
+def figure_update(angle):
+    """Before: the gauge figure rebuilt for every update"""
+    return json.dumps(create_gauge(angle), cls=PlotlyJSONEncoder)
+
+
+def angle_update(angle):
+    """After: only the angle; the browser patches its own figure"""
+    return json.dumps(angle, cls=PlotlyJSONEncoder)
+
+
+METHODS = [('figure', figure_update), ('angle', angle_update)]
+
+
+def bench(name, update, count):
+    """Time count updates and measure their serialized size"""
+    figure_update(90)  # warm up plotly's validators outside the timed loop
+    timings, sizes = [], []
+    for i in range(count):
+        start = time.perf_counter()
+        payload = update(ANGLES[i % len(ANGLES)])
+        timings.append((time.perf_counter() - start) * 1e6)
+        sizes.append(len(payload.encode('utf-8')))
+    return {
+        'method': name,
+        'updates': count,
+        'bytes': max(sizes),
+        'us': {'p50': percentile(timings, 50), 'p90': percentile(timings, 90),
+               'p99': percentile(timings, 99), 'mean': sum(timings) / len(timings)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servo gauge update payload and server time")
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    rows = [bench(name, update, args.updates) for name, update in METHODS]
+
+    print(f"\n📊 Gauge updates: {args.updates} per method")
+    print("=" * 52)
+    print(f"{'method':<10}{'bytes':>9}{'p50 µs':>11}{'p99 µs':>11}{'mean µs':>11}")
+    for r in rows:
+        print(f"{r['method']:<10}{r['bytes']:>9}{r['us']['p50']:>11.1f}{r['us']['p99']:>11.1f}"
+              f"{r['us']['mean']:>11.1f}")
+    before, after = rows
+    print(f"\nAngle-only updates are {before['bytes'] / after['bytes']:.0f}x smaller and "
+          f"{before['us']['mean'] / after['us']['mean']:.0f}x faster to build on the server")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'updates': args.updates, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'python': platform.python_version(), 'platform': platform.platform(),
+                       'runs': rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
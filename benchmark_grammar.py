@@ -0,0 +1,89 @@
+"""Compare decode CPU time and command accuracy: open vocabulary vs grammar
+
+Usage: python benchmark_grammar.py <wav_dir> [voice_control|voice_control_fixed]
+
+<wav_dir> holds 16 kHz mono WAV files labeled via labels.json or their
+file names (see wav_dataset.py).
+"""
+import importlib
+import json
+import sys
+import time
+
+from recognition import create_recognizer
+from wav_dataset import iter_chunks, load_labeled_wavs
+
+
+def command_parser(vc):
+    """The text -> command function the controller uses"""
+    if hasattr(vc, 'extract_number'):
+        return vc.extract_number
+    return vc.process_command
+
+
+def decode(recognizer, pcm, chunk):
+    """Feed one utterance through the recognizer; return (text, cpu_seconds)"""
+    texts = []
+    start = time.process_time()
+    for data in iter_chunks(pcm, chunk):
+        if recognizer.AcceptWaveform(data):
+            texts.append(json.loads(recognizer.Result()).get("text", ""))
+    texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+    cpu = time.process_time() - start
+    return " ".join(text for text in texts if text), cpu
+
+
+def run(vc, samples, grammar):
+    """Decode every sample with the given grammar and score the commands"""
+    parse = command_parser(vc)
+    cpu_total = 0.0
+    audio_seconds = 0.0
+    correct = 0
+    false_commands = 0
+    for filename, label, pcm in samples:
+        recognizer = create_recognizer(vc.model, vc.SAMPLE_RATE, grammar)
+        text, cpu = decode(recognizer, pcm, vc.CHUNK)
+        cpu_total += cpu
+        audio_seconds += len(pcm) / 2 / vc.SAMPLE_RATE
+        expected = parse(label)
+        heard = parse(text) if text else None
+        if heard == expected:
+            correct += 1
+        elif heard is not None:
+            false_commands += 1
+    return {
+        'cpu_seconds': cpu_total,
+        'real_time_factor': cpu_total / audio_seconds if audio_seconds else 0.0,
+        'accuracy': correct / len(samples),
+        'false_commands': false_commands,
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    module = importlib.import_module(sys.argv[2] if len(sys.argv) > 2 else 'voice_control')
+    vc = module.VoiceControl(open_devices=False)
+    samples = load_labeled_wavs(sys.argv[1], vc.SAMPLE_RATE)
+    if not samples:
+        print("❌ No usable WAV files found")
+        return 1
+
+    results = {
+        'open': run(vc, samples, None),
+        'grammar': run(vc, samples, vc.command_grammar()),
+    }
+
+    print(f"\nGrammar benchmark ({len(samples)} utterances, chunk {vc.CHUNK})")
+    print("=" * 60)
+    print(f"{'mode':<10}{'CPU s':>10}{'RTF':>10}{'accuracy':>12}{'false cmds':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['cpu_seconds']:>10.3f}{r['real_time_factor']:>10.3f}"
+              f"{r['accuracy']:>11.1%}{r['false_commands']:>12}")
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
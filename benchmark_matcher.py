@@ -0,0 +1,126 @@
+"""Micro-benchmark: CommandMatcher vs the old regex scan in extract_number"""
+import re
+import sys
+import timeit
+
+from command_matcher import CommandMatcher
+
+# Tables exactly as extract_number used them before the matcher
+LEGACY_COMMANDS = {
+    'open': 0,
+    'close': 90,
+    'shut': 90,
+    'zero': 0,
+    'ninety': 90,
+    'one eighty': 180,
+    'one hundred eighty': 180,
+    'forty five': 45,
+    'forty-five': 45
+}
+
+LEGACY_PATTERNS = {
+    r'\b(zero|oh|no|hero|nero|arrow|narrow|nora|nora|nora|nora)\b': 0,
+    r"\b(one|won|when|wine|won't|want|once|on|won't|when|wine|won't|want|once|on|won't|when|wine|won't|want|once|on)\b": 1,
+    r'\b(two|to|too|true|through|do|two|to|too|true|through|do|two|to|too|true|through|do)\b': 2,
+    r'\b(three|free|tree|the|three|free|tree|the|three|free|tree|the)\b': 3,
+    r'\b(four|for|fore|fourth|forth|for|fore|fourth|forth|for|fore|fourth|forth)\b': 4,
+    r'\b(five|fire|fight|fifth|five|fire|fight|fifth|five|fire|fight|fifth)\b': 5,
+    r'\b(six|sick|sikh|sikh|sick|sikh|sick|sikh|sick|sikh|sick|sikh)\b': 6,
+    r'\b(seven|saving|savings|saving|savings|saving|savings|saving|savings|saving|savings)\b': 7,
+    r'\b(eight|ate|hate|hate|hate|hate|hate|hate|hate|hate|hate|hate)\b': 8,
+    r'\b(nine|niner|niner|niner|niner|niner|niner|niner|niner|niner|niner|niner)\b': 9,
+    r'\b(ten|tennis|tenth|tennis|tenth|tennis|tenth|tennis|tenth|tennis|tenth|tennis)\b': 10,
+    r'\b(twenty|20|twenty|20|twenty|20|twenty|20|twenty|20|twenty|20)\b': 20,
+    r'\b(thirty|30|thirty|30|thirty|30|thirty|30|thirty|30|thirty|30)\b': 30,
+    r'\b(forty|40|forty|40|forty|40|forty|40|forty|40|forty|40)\b': 40,
+    r'\b(fifty|50|fifty|50|fifty|50|fifty|50|fifty|50|fifty|50)\b': 50,
+    r'\b(sixty|60|sixty|60|sixty|60|sixty|60|sixty|60|sixty|60)\b': 60,
+    r'\b(seventy|70|seventy|70|seventy|70|seventy|70|seventy|70|seventy|70)\b': 70,
+    r'\b(eighty|80|eighty|80|eighty|80|eighty|80|eighty|80|eighty|80)\b': 80,
+    r'\b(ninety|90|ninety|90|ninety|90|ninety|90|ninety|90|ninety|90)\b': 90,
+    r'\b(hundred|100|hundred|100|hundred|100|hundred|100|hundred|100|hundred|100)\b': 100,
+    r'\b(one hundred|100|one hundred|100|one hundred|100|one hundred|100|one hundred|100|one hundred|100)\b': 100,
+    r'\b(one eighty|180|one eighty|180|one eighty|180|one eighty|180|one eighty|180|one eighty|180)\b': 180
+}
+
+# Typical Vosk final results, including misses and long utterances
+TRANSCRIPTS = [
+    "open",
+    "close",
+    "shut it",
+    "forty five",
+    "move to one eighty",
+    "one hundred eighty",
+    "set it to sixty please",
+    "go to 135",
+    "turn the servo to seventy",
+    "hello there",
+    "i said ninety",
+    "",
+    "can you rotate the hand a little bit more towards the middle position please",
+]
+
+
+def legacy_extract_number(text):
+    """The pre-matcher implementation of VoiceControl.extract_number"""
+    text = text.lower()
+    for cmd, angle in LEGACY_COMMANDS.items():
+        if cmd in text:
+            return angle
+    for pattern, number in LEGACY_PATTERNS.items():
+        if re.search(pattern, text):
+            return number
+    numbers = re.findall(r'\d+', text)
+    if numbers:
+        return min(int(numbers[0]), 180)
+    return None
+
+
+def legacy_number_words():
+    """Flatten the legacy alternations into an ordered phrase table"""
+    words = {}
+    for pattern, number in LEGACY_PATTERNS.items():
+        for phrase in pattern[3:-3].split('|'):
+            words.setdefault(phrase, number)
+    return words
+
+
+def main(iterations=20000):
+    matcher = CommandMatcher(LEGACY_COMMANDS, legacy_number_words())
+
+    mismatches = [
+        (text, legacy_extract_number(text), matcher.match(text))
+        for text in TRANSCRIPTS
+        if legacy_extract_number(text) != matcher.match(text)
+    ]
+
+    def run_legacy():
+        for text in TRANSCRIPTS:
+            legacy_extract_number(text)
+
+    def run_matcher():
+        for text in TRANSCRIPTS:
+            matcher.match(text)
+
+    calls = iterations * len(TRANSCRIPTS)
+    legacy = min(timeit.repeat(run_legacy, number=iterations, repeat=3))
+    compiled = min(timeit.repeat(run_matcher, number=iterations, repeat=3))
+
+    print("Command matcher benchmark")
+    print("=========================")
+    print(f"Transcripts: {len(TRANSCRIPTS)}, calls per run: {calls}")
+    print(f"Legacy regex scan: {legacy / calls * 1e6:8.2f} µs/call")
+    print(f"CommandMatcher:    {compiled / calls * 1e6:8.2f} µs/call")
+    print(f"Speed-up:          {legacy / compiled:8.1f}x")
+
+    if mismatches:
+        print("\nResults that differ from the legacy function:")
+        for text, old, new in mismatches:
+            print(f"  {text!r}: legacy={old} matcher={new}")
+        return 1
+    print("\n✅ Matcher agrees with the legacy function on every transcript")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
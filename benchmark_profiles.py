@@ -0,0 +1,97 @@
+"""Sweep the audio profiles on recorded audio: latency vs CPU
+
+Usage: python benchmark_profiles.py <wav_dir> [--target voice_control]
+                                    [--fast] [--json sweep.json]
+
+Each profile in audio_profile.PROFILES is replayed through the target's
+pipeline (see replay.py). By default chunks are paced like a live
+microphone, so the latency includes buffering and poll sleeps. A
+profile is marked sustainable when decoding uses less than
+MAX_REALTIME_FACTOR of a core per second of audio. The recommended
+profile is the sustainable one with the lowest p90 latency.
+"""
+import argparse
+import json
+import sys
+
+from audio_profile import PROFILES
+from replay import TARGETS, load_target, run_replay
+from wav_dataset import load_labeled_wavs
+
+MAX_REALTIME_FACTOR = 0.8  # leave headroom for capture, serial and the OS
+
+
+def sweep(target, samples, realtime=True):
+    """Replay samples once per profile and collect the summaries"""
+    rows = []
+    for name, profile in PROFILES.items():
+        target.chunk = profile.read_size
+        target.poll_sleep = profile.sleep
+        print(f"▶ {name} ({profile.read_size} frames, sleep {profile.sleep}s)...")
+        result = run_replay(target, samples, realtime, verbose=False)
+        rtf = result['cpu_seconds'] / result['audio_seconds'] if result['audio_seconds'] else 0.0
+        rows.append({
+            'profile': name,
+            'frames_per_buffer': profile.frames_per_buffer,
+            'read_size': profile.read_size,
+            'sleep': profile.sleep,
+            'latency_ms': result['latency_ms'],
+            'accuracy': result['accuracy'],
+            'cpu_seconds': result['cpu_seconds'],
+            'realtime_factor': rtf,
+            'sustainable': rtf < MAX_REALTIME_FACTOR,
+        })
+    return rows
+
+
+def recommend(rows):
+    """Lowest-p90 sustainable profile, or None"""
+    candidates = [r for r in rows if r['sustainable'] and r['latency_ms']['p90'] is not None]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda r: r['latency_ms']['p90'])['profile']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio profile latency/CPU sweep")
+    parser.add_argument('wav_dir')
+    parser.add_argument('--target', choices=TARGETS, default='voice_control')
+    parser.add_argument('--fast', action='store_true', help="feed audio as fast as possible")
+    parser.add_argument('--json', help="write the sweep results to this file")
+    args = parser.parse_args()
+
+    target = load_target(args.target)
+    samples = load_labeled_wavs(args.wav_dir, target.sample_rate)
+    if not samples:
+        print("❌ No usable WAV files found")
+        return 1
+
+    rows = sweep(target, samples, realtime=not args.fast)
+
+    def ms(value):
+        return f"{value:.0f}" if value is not None else "n/a"
+
+    print(f"\n📊 Profile sweep: {args.target}, {len(samples)} utterances")
+    print("=" * 72)
+    print(f"{'profile':<18}{'read':>6}{'sleep':>7}{'p50 ms':>8}{'p90 ms':>8}{'p99 ms':>8}"
+          f"{'RTF':>7}{'acc':>7}  ok")
+    for r in rows:
+        lat = r['latency_ms']
+        print(f"{r['profile']:<18}{r['read_size']:>6}{r['sleep']:>7.2f}{ms(lat['p50']):>8}"
+              f"{ms(lat['p90']):>8}{ms(lat['p99']):>8}{r['realtime_factor']:>7.2f}"
+              f"{r['accuracy']:>7.0%}  {'✅' if r['sustainable'] else '❌'}")
+    best = recommend(rows)
+    if best:
+        print(f"\nRecommended: VOICE_AUDIO_PROFILE={best}")
+    else:
+        print("\n⚠️  No profile is sustainable on this host")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'target': args.target, 'recommended': best, 'profiles': rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
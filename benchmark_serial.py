@@ -0,0 +1,243 @@
+"""Serial actuation benchmark: command rate, ack round trip and wire bytes per send path
+
+Usage: python benchmark_serial.py [--port /dev/ttyACM0] [--commands 200]
+                                  [--paths transport,voice_control,voice_control_fixed,dashboard]
+                                  [--protocols binary,ascii] [--bauds 9600,115200]
+                                  [--windows 1,4] [--json serial.json] [--baseline old.json]
+
+Every send path fires the same moves ('open' and 'close', i.e. 0° and
+90°, alternating) as fast as it accepts them:
+
+  transport            SerialConnection.submit() back to back (the floor)
+  voice_control        VoiceControl.send_command, acks handled by on_ack
+  voice_control_fixed  the same for voice_control_fixed.py
+  dashboard            the dashboard's DashboardState.send, which waits for each reply
+
+Without --port, each run gets a fresh virtual_arduino.py board on a
+pseudo-terminal. With --port, a real board running servo_control.ino is
+reopened for each run. --bauds caps the negotiated rate (text links stay
+at 9600). --windows sets how many commands may be in flight (binary only).
+The controllers are built with open_devices=False, as in replay.py, so
+the voice model must be available.
+
+The ack time of a command runs from the call into the send path to its
+ack, so it includes any wait for a free slot in the window. Use --json
+to keep the results and --baseline to compare with an earlier run.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import platform
+import sys
+import time
+
+from latency import CommandTrace, percentile
+from serial_connection import SerialConnection
+from serial_protocol import BAUD_RATES
+
+PATHS = ['transport', 'voice_control', 'voice_control_fixed', 'dashboard']
+PROTOCOLS = ['binary', 'ascii']
+# Named, because servo_control.ino's text mode only knows open/close/shut;
+# the binary codec sends them as 0° and 90° moves (NAMED_ANGLES)
+COMMANDS = ['open', 'close']
+SETTLE_TIMEOUT = 5.0      # give up when no ack arrives for this long
+
+
+def wait_for(done, total):
+    """Block until done() reaches total, or acks stop arriving"""
+    last, changed = done(), time.monotonic()
+    while last < total and time.monotonic() - changed < SETTLE_TIMEOUT:
+        time.sleep(0.005)
+        count = done()
+        if count != last:
+            last, changed = count, time.monotonic()
+
+
+def run_transport(connection, commands):
+    traces, futures = [], []
+    for command in commands:
+        trace = CommandTrace(enqueued=time.monotonic())
+        future = connection.submit(command)
+        future.add_done_callback(lambda f, trace=trace: f.exception() or trace.mark('acked'))
+        traces.append(trace)
+        futures.append(future)
+    for future in futures:
+        future.exception(SETTLE_TIMEOUT * len(commands))
+    return traces
+
+
+_controllers = {}
+
+
+def load_controller(name):
+    """One VoiceControl per script, reused across runs (it loads the voice model)"""
+    if name not in _controllers:
+        _controllers[name] = importlib.import_module(name).VoiceControl(open_devices=False)
+    return _controllers[name]
+
+
+def run_controller(vc, connection, commands):
+    """Drive VoiceControl.send_command; on_ack marks each trace and records it"""
+    vc.connection = connection
+    start = vc.latency.commands
+    traces = []
+    for command in commands:
+        trace = CommandTrace(enqueued=time.monotonic())
+        vc.send_command(command, trace)
+        traces.append(trace)
+    wait_for(lambda: vc.latency.commands - start, len(commands))
+    return traces
+
+
+def run_dashboard(connection, commands):
+    import dashboard
+    dashboard.state.attach(connection)
+    traces = []
+    for command in commands:
+        trace = CommandTrace(enqueued=time.monotonic())
+        dashboard.state.send(command, trace)
+        traces.append(trace)
+    return traces
+
+
+def run_path(path, connection, commands):
+    vc = load_controller(path) if path.startswith('voice_control') else None
+    # The controllers print a line per command; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        if path == 'transport':
+            return run_transport(connection, commands)
+        if path == 'dashboard':
+            return run_dashboard(connection, commands)
+        return run_controller(vc, connection, commands)
+
+
+def bench(path, protocol, max_baud, window, count, port=None):
+    """One run: open a link, push count moves through path, summarize"""
+    device = None
+    if port is None:
+        from virtual_arduino import VirtualArduino
+        device = VirtualArduino(boot_time=0.2).start()
+        port = device.port
+    connection = SerialConnection(port, BAUD_RATES[0], max_baud=max_baud, text_only=protocol == 'ascii',
+                                  transport_options={'max_in_flight': window}).open()
+    try:
+        commands = [COMMANDS[i % len(COMMANDS)] for i in range(count)]
+        start = time.monotonic()
+        traces = run_path(path, connection, commands)
+        acked = [t for t in traces if 'acked' in t.stamps]
+        elapsed = (max(t.stamps['acked'] for t in acked) if acked else time.monotonic()) - start
+        link = connection.stats()
+    finally:
+        connection.close()
+        if device:
+            device.stop()
+    ms = [(t.stamps['acked'] - t.stamps['enqueued']) * 1000 for t in acked]
+    wire = link.get('bytes_sent', 0) + link.get('bytes_received', 0)
+    return {
+        'path': path,
+        'protocol': link.get('protocol'),
+        'baud': link.get('baud'),
+        'window': link.get('max_in_flight'),
+        'commands': count,
+        'acked': len(acked),
+        'failed': count - len(acked),
+        'retries': link.get('retries', 0) + link.get('fast_retries', 0),
+        'seconds': elapsed,
+        'commands_per_second': len(acked) / elapsed if elapsed > 0 else 0.0,
+        'ack_ms': {'p50': percentile(ms, 50), 'p90': percentile(ms, 90),
+                   'p99': percentile(ms, 99), 'max': max(ms) if ms else None},
+        'rtt_ms_mean': link.get('rtt_ms_mean'),
+        'bytes_sent': link.get('bytes_sent', 0),
+        'bytes_received': link.get('bytes_received', 0),
+        'bytes_per_command': wire / len(acked) if acked else None,
+    }
+
+
+def configurations(paths, protocols, bauds, windows):
+    """(path, protocol, max baud, window) for every meaningful combination"""
+    for path in paths:
+        for protocol in protocols:
+            # Text links stay at 9600 and carry one command at a time
+            for baud in bauds if protocol == 'binary' else [BAUD_RATES[0]]:
+                for window in windows if protocol == 'binary' else [1]:
+                    yield path, protocol, baud, window
+
+
+def row_key(row):
+    return (row['path'], row['protocol'], row['baud'], row['window'])
+
+
+def compare(rows, baseline_file):
+    """Print rate and p99 changes against an earlier --json run"""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = {row_key(row): row for row in json.load(f)['runs']}
+    print(f"\n📊 Against {baseline_file}")
+    for row in rows:
+        old = baseline.get(row_key(row))
+        if not old:
+            continue
+        rate = row['commands_per_second'] / old['commands_per_second'] - 1 if old['commands_per_second'] else 0.0
+        p99, old_p99 = row['ack_ms']['p99'], old['ack_ms']['p99']
+        change = f"{p99 - old_p99:+.1f} ms" if p99 is not None and old_p99 is not None else "n/a"
+        print(f"{row['path']:<21}{row['protocol']:<8}{row['baud']:>7}{row['window']:>4}"
+              f"  rate {rate:+.0%}  p99 {change}")
+
+
+def csv_ints(text):
+    return [int(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial send path throughput and ack latency")
+    parser.add_argument('--port', help="real board (default: a virtual_arduino.py pty per run)")
+    parser.add_argument('--commands', type=int, default=200)
+    parser.add_argument('--paths', default=','.join(PATHS))
+    parser.add_argument('--protocols', default=','.join(PROTOCOLS))
+    parser.add_argument('--bauds', type=csv_ints, default=[9600, 115200], help="max negotiated rates")
+    parser.add_argument('--windows', type=csv_ints, default=[1, 4], help="commands in flight")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="compare with results from an earlier --json run")
+    args = parser.parse_args()
+
+    paths = args.paths.split(',')
+    protocols = args.protocols.split(',')
+    unknown = [name for name in paths if name not in PATHS] + [name for name in protocols if name not in PROTOCOLS]
+    if unknown:
+        print(f"❌ Unknown path or protocol: {', '.join(unknown)}")
+        return 1
+
+    rows = []
+    for path, protocol, baud, window in configurations(paths, protocols, args.bauds, args.windows):
+        print(f"▶ {path}, {protocol}, up to {baud} baud, window {window}...")
+        try:
+            rows.append(bench(path, protocol, baud, window, args.commands, args.port))
+        except Exception as e:
+            print(f"❌ {path} failed: {e}")
+
+    def ms(value):
+        return f"{value:.1f}" if value is not None else "n/a"
+
+    print(f"\n📊 Serial benchmark: {args.port or 'virtual board'}, {args.commands} commands per run")
+    print("=" * 88)
+    print(f"{'path':<21}{'proto':<8}{'baud':>7}{'win':>4}{'acked':>7}{'cmd/s':>8}"
+          f"{'p50 ms':>8}{'p99 ms':>8}{'B/cmd':>7}{'retry':>7}")
+    for r in rows:
+        print(f"{r['path']:<21}{r['protocol']:<8}{r['baud']:>7}{r['window']:>4}{r['acked']:>7}"
+              f"{r['commands_per_second']:>8.0f}{ms(r['ack_ms']['p50']):>8}{ms(r['ack_ms']['p99']):>8}"
+              f"{ms(r['bytes_per_command']):>7}{r['retries']:>7}")
+
+    if args.baseline:
+        compare(rows, args.baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'device': args.port or 'virtual', 'commands': args.commands,
+                       'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'runs': rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    """Split a transcript into lowercase word tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class CommandMatcher:
+    """Single-pass phrase matcher built once from the command tables.
+
+    Every phrase gets a priority from its position in the tables, so the
+    result is the same one the old scan-in-order lookup returned: the
+    earliest table entry that occurs anywhere in the transcript wins.
+    """
+
+    def __init__(self, *tables, max_number=180):
+        self.max_number = max_number
+        # first token -> [(tokens, value, priority), ...]
+        self.trie = {}
+        self.phrases = []
+        seen = set()
+        priority = 0
+        for table in tables:
+            for phrase, value in table.items():
+                tokens = tuple(tokenize(phrase))
+                if not tokens or tokens in seen:
+                    continue
+                seen.add(tokens)
+                self.trie.setdefault(tokens[0], []).append((tokens, value, priority))
+                self.phrases.append(tokens)
+                priority += 1
+        self.prefixes = {tokens[:i] for tokens in self.phrases for i in range(1, len(tokens))}
+        self.longest = max((len(tokens) for tokens in self.phrases), default=0)
+
+    def match(self, text):
+        """Return the value of the highest-priority phrase in text, or None"""
+        return self.match_tokens(tokenize(text))
+
+    def match_tokens(self, tokens):
+        """Same as match() for an already tokenized transcript"""
+        best = None
+        best_priority = None
+        first_digits = None
+        count = len(tokens)
+        for i, token in enumerate(tokens):
+            entries = self.trie.get(token)
+            if entries:
+                for phrase, value, priority in entries:
+                    if best_priority is not None and priority >= best_priority:
+                        break
+                    end = i + len(phrase)
+                    if end <= count and (len(phrase) == 1 or tuple(tokens[i:end]) == phrase):
+                        best, best_priority = value, priority
+                        break
+            elif first_digits is None and token.isdigit():
+                first_digits = token
+        if best is not None:
+            return best
+        if first_digits is not None:
+            return min(int(first_digits), self.max_number)
+        return None
+
+    def has_pending_phrase(self, text):
+        """True if the transcript ends part-way through a longer phrase"""
+        tokens = tuple(tokenize(text))
+        for size in range(1, min(len(tokens), self.longest) + 1):
+            if tokens[-size:] in self.prefixes:
+                return True
+        return False
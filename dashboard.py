@@ -1,78 +1,52 @@
+import atexit
 import dash
-from dash import dcc, html, Input, Output, State, callback, no_update
+import flask
+from dash import dcc, html, Input, Output, State, ClientsideFunction, Patch
 import dash_bootstrap_components as dbc
-import plotly.graph_objects as go
 from dash.exceptions import PreventUpdate
-import serial
-import serial.tools.list_ports
 import threading
 import time
-from datetime import datetime
-import queue
 import os
-from vosk import Model, KaldiRecognizer
+from vad import VoiceActivityGate
+from latency import CommandTrace, LatencyTracker
+from serial_connection import close_all, open_connection
+from dashboard_state import DashboardState
+from dashboard_gauge import create_gauge
+from dashboard_voice import (CHUNK, MODEL_PATH, PROFILE, SAMPLE_RATE, USE_VAD,
+                             get_recognizer, model_available, parse_voice_command)
+from event_stream import EventBroadcaster
+from port_watcher import PortWatcher
 import pyaudio
 import json
-import numpy as np
 
-# Configuration
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "vosk-model-small-en-us-0.15")
-SAMPLE_RATE = 16000
-CHUNK = 4000
-SERIAL_PORT = 'COM9'  # Default, will be updated by user
+# Configuration (voice settings are in dashboard_voice.py)
+SERIAL_PORT = os.environ.get('VOICE_SERIAL_PORT', 'COM9')  # Default, will be updated by user
 BAUD_RATE = 9600
+SUPPRESS_RESET = False  # Don't reset the board on open (see serial_connection.py)
+KEEP_PORT_OPEN = True  # Disconnect leaves the port open so reconnecting is instant
+HISTORY_SIZE = 10  # Commands kept in server memory and shown under Command History
+LATENCY_REPORT = os.path.join(os.path.dirname(__file__), "latency_report.json")
 
-def create_gauge(angle):
-    """Create a gauge chart showing the servo position"""
-    fig = go.Figure(go.Indicator(
-        mode = "gauge+number+delta",
-        value = angle,
-        domain = {'x': [0, 1], 'y': [0, 1]},
-        title = {'text': f"Servo Position: {angle}°", 'font': {'size': 24}},
-        gauge = {
-            'axis': {'range': [0, 180], 'tickwidth': 1, 'tickcolor': "darkblue"},
-            'bar': {'color': "darkblue"},
-            'bgcolor': "white",
-            'borderwidth': 2,
-            'bordercolor': "gray",
-            'steps': [
-                {'range': [0, 60], 'color': 'lightgreen'},
-                {'range': [60, 120], 'color': 'yellow'},
-                {'range': [120, 180], 'color': 'red'}
-            ],
-            'threshold': {
-                'line': {'color': "black", 'width': 4},
-                'thickness': 0.75,
-                'value': angle
-            }
-        }
-    ))
-    
-    fig.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font={'color': 'white'},
-        height=400
-    )
-    return fig
-
-def process_audio():
-    """Background thread to process audio input"""
-    global is_listening, audio_stream
-    
+def process_audio(audio, listening):
+    """Audio thread body, run by state.start_listening() while listening() is True"""
     print("Starting audio processing thread...")
+    vad = None
+    audio_stream = None
+    recognizer = get_recognizer()
+    if recognizer is None:
+        return
     
     try:
         # List available audio devices
         print("\nAvailable audio devices:")
-        for i in range(p.get_device_count()):
-            dev = p.get_device_info_by_index(i)
+        for i in range(audio.get_device_count()):
+            dev = audio.get_device_info_by_index(i)
             print(f"{i}: {dev['name']} (Input Channels: {dev['maxInputChannels']})")
         
         # Try to find a suitable input device
         input_device_index = None
-        for i in range(p.get_device_count()):
-            dev = p.get_device_info_by_index(i)
+        for i in range(audio.get_device_count()):
+            dev = audio.get_device_info_by_index(i)
             if dev['maxInputChannels'] > 0 and 'microphone' in dev['name'].lower():
                 input_device_index = i
                 print(f"\nUsing input device: {dev['name']}")
@@ -83,13 +57,13 @@ def process_audio():
         
         # Open audio stream with error handling
         try:
-            audio_stream = p.open(
+            audio_stream = audio.open(
                 format=pyaudio.paInt16,
                 channels=1,
                 rate=SAMPLE_RATE,
                 input=True,
                 input_device_index=input_device_index,
-                frames_per_buffer=CHUNK,
+                frames_per_buffer=PROFILE.frames_per_buffer,
                 start=False
             )
             audio_stream.start_stream()
@@ -99,27 +73,41 @@ def process_audio():
             return
         
         print("Listening for voice commands...")
+        vad = VoiceActivityGate(SAMPLE_RATE, CHUNK) if USE_VAD else None
         
-        while is_listening:
+        while listening():
             try:
                 if audio_stream.is_active():
-                    data = audio_stream.read(4000, exception_on_overflow=False)
-                    if recognizer.AcceptWaveform(data):
+                    data = audio_stream.read(CHUNK, exception_on_overflow=False)
+                    captured = time.monotonic()
+                    if vad:
+                        data = vad.gate(data)
+                        if not data:
+                            continue
+                        decode_start = time.thread_time()
+                        endpoint = recognizer.AcceptWaveform(data)
+                        vad.note_decode(time.thread_time() - decode_start, len(data))
+                    else:
+                        endpoint = recognizer.AcceptWaveform(data)
+                    if endpoint:
+                        trace = CommandTrace(captured=captured, recognized=time.monotonic())
                         result = json.loads(recognizer.Result())
                         if 'text' in result and result['text']:
                             command = result['text'].lower()
                             print(f"Recognized command: {command}")
                             # Process commands directly for better reliability
-                            if 'open' in command:
-                                command_queue.put(('button', 'open'))
-                            elif 'close' in command or 'shut' in command:
-                                command_queue.put(('button', 'close'))
+                            button = parse_voice_command(command)
+                            trace.mark('parsed')
+                            if button:
+                                trace.mark('enqueued')
+                                state.voice_command(button, trace)
                             else:
                                 print(f"Unknown command: {command}")
                 else:
                     print("Audio stream is not active")
                     break
-                time.sleep(0.1)
+                if PROFILE.sleep:
+                    time.sleep(PROFILE.sleep)
             except Exception as e:
                 print(f"Error in audio processing: {e}")
                 break
@@ -127,27 +115,25 @@ def process_audio():
     except Exception as e:
         print(f"Error in process_audio: {e}")
     finally:
+        if vad:
+            print(vad.summary())
         if audio_stream:
             print("Stopping audio stream...")
             if audio_stream.is_active():
                 audio_stream.stop_stream()
             if not audio_stream.is_stopped():
                 audio_stream.close()
-            p.terminate()
             print("Audio stream closed")
 
-def send_command(command):
-    """Send command to Arduino"""
-    global arduino
-    
-    if arduino and arduino.is_open:
-        try:
-            arduino.write(f"{command}\n".encode('utf-8'))
-            response = arduino.readline().decode('utf-8').strip()
-            return True, response
-        except Exception as e:
-            return False, str(e)
-    return False, "Not connected to Arduino"
+def history_item(entry):
+    """One Command History row"""
+    return dbc.ListGroupItem([
+        html.Div([
+            html.Small(entry['time'], className="text-muted"),
+            html.Strong(f" {entry['command'].title()}", className="ms-2")
+        ]),
+        html.Small(entry['response'], className="text-info" if entry['ok'] else "text-warning")
+    ], className="d-flex justify-content-between align-items-start")
 
 # Initialize the Dash app with a dark theme
 app = dash.Dash(__name__, 
@@ -182,7 +168,7 @@ app.layout = dbc.Container([
                             ),
                         ], width=8),
                         dbc.Col([
-                            html.Label("Baud Rate"),
+                            html.Label("Max Baud Rate"),
                             dcc.Dropdown(
                                 id='baud-rate-dropdown',
                                 options=[
@@ -192,7 +178,7 @@ app.layout = dbc.Container([
                                     {'label': '57600', 'value': 57600},
                                     {'label': '115200', 'value': 115200},
                                 ],
-                                value=9600,
+                                value=115200,
                                 className="mb-3"
                             ),
                         ], width=4)
@@ -252,7 +238,7 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     dcc.Graph(
                         id='servo-gauge',
-                        figure=create_gauge(90),  # Initial position at 90°
+                        figure=create_gauge(90),  # Built once; later updates only carry the angle
                         className="h-100"
                     )
                 ], className="h-100")
@@ -264,165 +250,178 @@ app.layout = dbc.Container([
             dbc.Card([
                 dbc.CardHeader("Command History", className="bg-primary text-white"),
                 dbc.CardBody([
-                    html.Div(id='command-history', className="command-history")
+                    html.Div(id='command-history', children=[], className="command-history")
                 ])
             ])
         ], width=12)
     ]),
     
-    # Hidden div to store data
-    dcc.Store(id='command-store', data=[]),
+    # History lives on the server; 'history' events say new entries are there and
+    # the tab keeps the id and row count of what it already shows
+    dcc.Store(id='history-event'),
+    dcc.Store(id='history-seen'),
+    # Confirmed servo angle; assets/gauge.js moves the gauge to it in the browser
+    dcc.Store(id='servo-angle'),
+    # Latest event pushed over /events (assets/event_stream.js); the interval
+    # is the fallback poll and is switched off while the stream is connected
+    dcc.Store(id='server-event'),
     dcc.Interval(id='update-interval', interval=1000, n_intervals=0),
+    # Port list changes arrive as 'ports' events; the version avoids resending an unchanged list
+    dcc.Store(id='ports-event'),
+    dcc.Store(id='ports-version'),
     
-    # Audio processing components
-    dcc.Store(id='audio-processing', data={'is_listening': False}),
-    dcc.Store(id='arduino-connection', data={'connected': False, 'port': None, 'baud': None})
+    # Connection and listening state live in DashboardState; the tab only keeps
+    # the version it last rendered
+    dcc.Store(id='state-version')
 ], fluid=True, className="p-4")
 
 # Initialize global variables
-arduino = None
-is_listening = False
-command_queue = queue.Queue()
+latency = LatencyTracker()
+events = EventBroadcaster()
+# Serial link, listening session, command dispatcher and history shared by all tabs
+state = DashboardState(
+    events, latency,
+    # Always open at BAUD_RATE (what the sketches start at) and negotiate up to the selection
+    opener=lambda port, max_baud: open_connection(port, BAUD_RATE, suppress_reset=SUPPRESS_RESET, max_baud=max_baud),
+    audio_factory=pyaudio.PyAudio,
+    history_size=HISTORY_SIZE,
+    keep_port_open=KEEP_PORT_OPEN)
 
-# Initialize Vosk model
-if not os.path.exists(MODEL_PATH):
-    print(f"Please download the Vosk model to {MODEL_PATH}")
-    print("Run: python download_model.py")
-    exit(1)
+@app.server.route('/events')
+def event_stream():
+    """State changes pushed to every open tab as Server-Sent Events"""
+    return flask.Response(events.stream(), mimetype='text/event-stream',
+                          headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-model = Model(MODEL_PATH)
-recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+@app.server.route('/latency')
+def latency_report():
+    """Per-stage voice command latency histograms as JSON"""
+    return flask.jsonify(latency.summary())
 
-# Audio setup
-audio_stream = None
-p = pyaudio.PyAudio()
+def export_latency():
+    """Write the latency report at shutdown"""
+    if latency.commands:
+        latency.export_json(LATENCY_REPORT)
+        print(f"Latency report written to {LATENCY_REPORT}")
 
+atexit.register(export_latency)
+atexit.register(close_all)
+
+# One port scanner for all tabs, started on first use like the model
+port_watcher = None
+port_watcher_lock = threading.Lock()
+
+def get_port_watcher():
+    """The shared PortWatcher, started on first use"""
+    global port_watcher
+    with port_watcher_lock:
+        if port_watcher is None:
+            # Pseudo-terminals (virtual_arduino.py) are not listed by comports()
+            extra = [SERIAL_PORT] if 'VOICE_SERIAL_PORT' in os.environ else []
+            port_watcher = PortWatcher(extra_ports=extra)
+            port_watcher.add_listener(lambda version, ports: events.publish('ports', {'version': version}))
+            port_watcher.start()
+        return port_watcher
 
 
 # Callbacks
 @app.callback(
-    Output('com-port-dropdown', 'options'),
-    Input('update-interval', 'n_intervals')
+    [Output('com-port-dropdown', 'options'),
+     Output('ports-version', 'data')],
+    [Input('ports-event', 'data'),
+     Input('update-interval', 'n_intervals')],
+    [State('ports-version', 'data')]
 )
-def update_com_ports(n):
-    """Update available COM ports"""
-    ports = [{'label': port.device, 'value': port.device} 
-             for port in serial.tools.list_ports.comports()]
-    return ports
+def update_com_ports(event, n, version):
+    """COM port options from the shared watcher, sent only when the ports changed"""
+    current, ports = get_port_watcher().snapshot()
+    if current == version:
+        raise PreventUpdate
+    return [{'label': port, 'value': port} for port in ports], current
+
+def render_controls(current, status=None):
+    """Connection and voice controls for a DashboardState snapshot"""
+    if current['connected']:
+        connection_status = f"Connected to {current['port']} @ {current['baud']} baud ({current['protocol']} protocol)"
+        connect = ("Disconnect", "danger")
+    else:
+        connection_status = f"Connection failed: {current['error']}" if current['error'] else "Disconnected"
+        connect = ("Connect", "success")
+    if current['listening']:
+        voice_status = "🎤 Listening... Speak clearly (say 'open' or 'close')"
+        listen = "⏹ Stop Listening"
+    else:
+        voice_status = "Click to start listening"
+        listen = "🎤 Start Listening"
+    last = f"Last command: {current['last_command'].title()}" if current['last_command'] else ""
+    return status or connection_status, connect[0], connect[1], voice_status, listen, last, current['version']
 
 @app.callback(
     [Output('connection-status', 'children'),
      Output('connect-btn', 'children'),
      Output('connect-btn', 'color'),
-     Output('arduino-connection', 'data')],
-    [Input('connect-btn', 'n_clicks')],
+     Output('voice-command-status', 'children'),
+     Output('listen-btn', 'children'),
+     Output('last-command', 'children'),
+     Output('state-version', 'data')],
+    [Input('connect-btn', 'n_clicks'),
+     Input('listen-btn', 'n_clicks'),
+     Input('server-event', 'data'),
+     Input('update-interval', 'n_intervals')],
     [State('com-port-dropdown', 'value'),
      State('baud-rate-dropdown', 'value'),
-     State('arduino-connection', 'data')]
+     State('connect-btn', 'children'),
+     State('listen-btn', 'children'),
+     State('state-version', 'data')]
 )
-def toggle_connection(n_clicks, port, baud, connection_data):
-    """Handle connection to Arduino"""
-    global arduino
-    
-    if n_clicks is None:
-        raise PreventUpdate
-    
-    if connection_data['connected']:
-        # Disconnect
-        if arduino and arduino.is_open:
-            arduino.close()
-        return "Disconnected", "Connect", "success", {'connected': False, 'port': None, 'baud': None}
+def update_controls(connect_clicks, listen_clicks, event, n_intervals, port, baud, connect_label, listen_label, version):
+    """Connect and listen act on the shared state; every tab shows the same state"""
+    ctx = dash.callback_context
+    button_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
+    status = None
     
-    # Connect
-    if not port or not baud:
-        return "Please select port and baud rate", "Connect", "success", connection_data
+    # The label says what this tab saw, so two tabs clicking Connect both mean connect
+    if button_id == 'connect-btn':
+        if connect_label == "Disconnect":
+            state.disconnect()
+        elif not port or not baud:
+            status = "Please select port and baud rate"
+        else:
+            state.connect(port, int(baud))
+    elif button_id == 'listen-btn':
+        if listen_label == "⏹ Stop Listening":
+            print("\nStopping voice command listener...\n")
+            state.stop_listening()
+        elif state.start_listening(process_audio):
+            print("\n" + "="*50)
+            print("Starting voice command listener...")
+            print("="*50 + "\n")
     
-    try:
-        arduino = serial.Serial(port, baud, timeout=1)
-        time.sleep(2)  # Wait for Arduino to initialize
-        return f"Connected to {port} @ {baud} baud", "Disconnect", "danger", {'connected': True, 'port': port, 'baud': baud}
-    except Exception as e:
-        return f"Connection failed: {str(e)}", "Connect", "success", connection_data
+    current = state.snapshot()
+    if status is None and current['version'] == version:
+        raise PreventUpdate
+    return render_controls(current, status)
 
-@app.callback(
-    [Output('voice-command-status', 'children'),
-     Output('audio-processing', 'data'),
-     Output('last-command', 'children')],
-    [Input('listen-btn', 'n_clicks')],
-    [State('audio-processing', 'data')]
+app.clientside_callback(
+    ClientsideFunction(namespace='gauge', function_name='update'),
+    Output('servo-gauge', 'figure'),
+    Input('servo-angle', 'data'),
+    State('servo-gauge', 'figure')
 )
-def toggle_listening(n_clicks, data):
-    """Toggle voice command listening"""
-    global is_listening, audio_thread, p
-    
-    if n_clicks is None:
-        raise PreventUpdate
-    
-    is_listening = not data.get('is_listening', False)
-    
-    if is_listening:
-        print("\n" + "="*50)
-        print("Starting voice command listener...")
-        print("="*50 + "\n")
-        
-        # Reinitialize PyAudio if needed
-        try:
-            p.terminate()
-        except:
-            pass
-        p = pyaudio.PyAudio()
-        
-        # Start listening thread
-        audio_thread = threading.Thread(target=process_audio, daemon=True)
-        audio_thread.start()
-        return "🎤 Listening... Speak clearly (say 'open' or 'close')", {'is_listening': True}, ""
-    else:
-        print("\nStopping voice command listener...\n")
-        return "Click to start listening", {'is_listening': False}, ""
 
 @app.callback(
-    [Output('servo-gauge', 'figure'),
-     Output('command-history', 'children'),
-     Output('command-store', 'data')],
+    Output('servo-angle', 'data'),
     [Input('open-btn', 'n_clicks'),
      Input('close-btn', 'n_clicks'),
      Input('set-angle-btn', 'n_clicks'),
-     Input('command-store', 'data')],
-    [State('angle-slider', 'value'),
-     State('command-store', 'data')]
+     Input('server-event', 'data'),
+     Input('update-interval', 'n_intervals')],
+    [State('angle-slider', 'value')]
 )
-def update_servo(open_clicks, close_clicks, set_angle_clicks, stored_commands, angle, _):
-    """Handle servo control buttons and update gauge"""
-    # Initialize variables
+def update_servo(open_clicks, close_clicks, set_angle_clicks, event, n_intervals, angle):
+    """Queue button commands for the dispatcher and update gauge"""
     ctx = dash.callback_context
-    button_id = None
-    command = ""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    
-    # Process voice commands first if any in queue
-    try:
-        print(f"\n{'='*50}")
-        print(f"Command queue size: {command_queue.qsize()}")
-        if not command_queue.empty():
-            cmd_type, cmd = command_queue.get_nowait()
-            print(f"Got command from queue - Type: {cmd_type}, Command: {cmd}")
-            if cmd_type == 'button':
-                command = cmd  # 'open' or 'close'
-                button_id = f"{command}-btn"
-                print(f"Processing voice command: {command}")
-                print(f"Button ID set to: {button_id}")
-            else:
-                print(f"Unexpected command type: {cmd_type}")
-        else:
-            print("No commands in queue")
-    except Exception as e:
-        print(f"Error processing command queue: {e}")
-    
-    # If no voice command, check which button was clicked
-    if not button_id:
-        if not ctx.triggered:
-            return create_gauge(90), stored_commands, stored_commands
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    button_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
     
     # Map button IDs to commands
     if button_id == 'open-btn':
@@ -432,60 +431,47 @@ def update_servo(open_clicks, close_clicks, set_angle_clicks, stored_commands, a
     elif button_id == 'set-angle-btn':
         command = f"set {angle}"
     else:
-        return create_gauge(90), stored_commands, stored_commands
+        # A pushed event or the fallback poll: just send the angle for the gauge
+        return state.servo_angle()
     
-    # Send command to Arduino
-    success = False
-    response = ""
-    
-    try:
-        if command:  # Only send if we have a valid command
-            print(f"\nPreparing to send command: {command}")
-            print(f"Arduino connected: {arduino is not None and arduino.is_open if arduino else False}")
-            if arduino:
-                print(f"Arduino port: {arduino.port}, is_open: {arduino.is_open}")
-            
-            print(f"Sending command to Arduino: {command}")
-            success, response = send_command(command)
-            print(f"Command sent. Success: {success}, Response: {response}")
-            
-            # Update command history
-            if success:
-                new_command = {
-                    'time': timestamp,
-                    'command': command,
-                    'response': response
-                }
-                stored_commands = [new_command] + stored_commands[:9]  # Keep last 10 commands
-        else:
-            print("No valid command to send to Arduino")
-    except Exception as e:
-        print(f"Error in command processing: {e}")
-        response = str(e)
-    
-    # Create history items
-    history_items = []
-    for cmd in stored_commands:
-        history_items.append(
-            dbc.ListGroupItem([
-                html.Div([
-                    html.Small(cmd['time'], className="text-muted"),
-                    html.Strong(f" {cmd['command'].title()}", className="ms-2")
-                ]),
-                html.Small(cmd['response'], className="text-info")
-            ], className="d-flex justify-content-between align-items-start")
-        )
+    print(f"\nQueueing command: {command}")
+    state.submit(command)
+    # The gauge shows where the Arduino says the servo is, not what was clicked;
+    # the dispatcher pushes a 'servo' event once the move is acked
+    return state.servo_angle()
+
+@app.callback(
+    [Output('command-history', 'children'),
+     Output('history-seen', 'data')],
+    [Input('history-event', 'data'),
+     Input('update-interval', 'n_intervals')],
+    [State('history-seen', 'data')]
+)
+def update_history(event, n_intervals, seen):
+    """Send a tab only the history entries it has not shown yet"""
+    entries = state.history_entries()
+    latest = entries[-1]['id'] if entries else 0
+    if seen and seen['id'] == latest:
+        raise PreventUpdate
     
-    # Update gauge based on command
-    if command == "open":
-        angle = 0
-    elif command == "close":
-        angle = 90
-    elif command.startswith("set"):
-        angle = int(command.split()[1])
+    new = [entry for entry in entries if entry['id'] > seen['id']] if seen else []
+    # First load, a server restart, or entries that left the ring before this tab
+    # saw them: send the whole (bounded) list once
+    if not seen or seen['id'] > latest or not entries or new[0]['id'] != seen['id'] + 1:
+        return [history_item(entry) for entry in reversed(entries)], {'id': latest, 'count': len(entries)}
     
-    return create_gauge(angle), history_items, stored_commands
+    rows = Patch()
+    for entry in new:
+        rows.prepend(history_item(entry))
+    shown = seen['count'] + len(new)
+    for index in range(shown - 1, HISTORY_SIZE - 1, -1):
+        del rows[index]
+    return rows, {'id': latest, 'count': min(shown, HISTORY_SIZE)}
 
 # Run the app
 if __name__ == '__main__':
+    if not model_available():
+        print(f"Please download the Vosk model to {MODEL_PATH}")
+        print("Run: python download_model.py")
+        exit(1)
     app.run(debug=True, port=8050)
@@ -0,0 +1,42 @@
+"""Servo gauge figure for dashboard.py
+
+Kept apart from the Dash app so benchmark_dashboard.py can build the
+figure without importing Dash, PyAudio or the dashboard's state.
+assets/gauge.js patches the figure in the browser after the first render.
+"""
+import plotly.graph_objects as go
+
+
+def create_gauge(angle):
+    """Create a gauge chart showing the servo position"""
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = angle,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': f"Servo Position: {angle}°", 'font': {'size': 24}},
+        gauge = {
+            'axis': {'range': [0, 180], 'tickwidth': 1, 'tickcolor': "darkblue"},
+            'bar': {'color': "darkblue"},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "gray",
+            'steps': [
+                {'range': [0, 60], 'color': 'lightgreen'},
+                {'range': [60, 120], 'color': 'yellow'},
+                {'range': [120, 180], 'color': 'red'}
+            ],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': angle
+            }
+        }
+    ))
+    
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font={'color': 'white'},
+        height=400
+    )
+    return fig
@@ -0,0 +1,274 @@
+"""Shared dashboard state: one serial link, one microphone, one command stream
+
+Dash runs each callback on a request thread, so every open tab, the audio
+thread and the command dispatcher all touch the same rig. DashboardState
+owns what they share (the serial connection, the listening session and
+its audio thread, the command queue and the history ring), guards it with
+locks, and publishes each change to an EventBroadcaster. Tabs render from
+snapshot() instead of keeping their own copy of the connection and
+listening state, so they cannot drift apart, and every serial write goes
+through the one dispatcher.
+"""
+import collections
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from dispatch_queue import CoalescingQueue
+
+NO_RESPONSE = "No response from Arduino"
+
+
+class DashboardState:
+    """Thread-safe hub for the dashboard's serial, audio and servo state"""
+
+    def __init__(self, events, latency=None, opener=None, audio_factory=None,
+                 history_size=10, keep_port_open=True, reply_margin=2.0):
+        self.events = events                # EventBroadcaster that tabs subscribe to
+        self.latency = latency              # LatencyTracker for voice command traces
+        self.opener = opener                # opener(port, max_baud) -> SerialConnection
+        self.audio_factory = audio_factory  # e.g. pyaudio.PyAudio, one per listening session
+        self.keep_port_open = keep_port_open
+        self.reply_margin = reply_margin    # seconds past the transport's own retries before send() gives up
+        self.lock = threading.RLock()       # guards the fields below
+        self.serial_lock = threading.Lock()  # one connect/disconnect at a time
+        self.audio_lock = threading.Lock()  # one listening start/stop at a time
+        self.version = 0                    # bumped on every change tabs render
+        self.connection = None
+        self.error = None                   # why the last connect failed
+        self.listening = False
+        self.audio = None
+        self.audio_thread = None
+        self.last_command = None            # last recognized voice command
+        self.commands = CoalescingQueue()
+        self.dispatcher = None
+        self.history = collections.deque(maxlen=history_size)  # oldest first
+        self.history_ids = itertools.count(1)
+        self.duplicate_requests = 0         # connect/listen requests for what was already the case
+
+    def changed(self, kind, data=None):
+        """Bump the version and push the change to every tab"""
+        with self.lock:
+            self.version += 1
+            data = dict(data or {}, version=self.version)
+        self.events.publish(kind, data)
+
+    def snapshot(self):
+        """Everything the controls show, read in one go"""
+        with self.lock:
+            connection = self.connection
+            return {
+                'version': self.version,
+                'connected': connection is not None,
+                'port': connection.port if connection else None,
+                'baud': connection.link_baud if connection else None,
+                'protocol': connection.codec.name if connection else None,
+                'error': self.error,
+                'listening': self.listening,
+                'last_command': self.last_command,
+            }
+
+    # Serial link
+
+    def connect(self, port, max_baud):
+        """Connect to port (a no-op if already connected to it at max_baud); returns the connection or None"""
+        with self.serial_lock:
+            with self.lock:
+                current = self.connection
+            if current and current.port == port and current.max_baud == max_baud:
+                self.note_duplicate()
+                return current
+            if current:
+                self.release(current)
+            try:
+                connection = self.opener(port, max_baud)
+            except Exception as e:
+                with self.lock:
+                    self.connection, self.error = None, str(e)
+                self.changed('connection', {'connected': False, 'error': str(e)})
+                return None
+            self.attach(connection)
+            return connection
+
+    def attach(self, connection):
+        """Use an already open connection"""
+        with self.lock:
+            self.connection, self.error = connection, None
+        self.changed('connection', {'connected': True, 'port': connection.port, 'baud': connection.link_baud})
+
+    def disconnect(self):
+        with self.serial_lock:
+            with self.lock:
+                current, self.connection = self.connection, None
+            if current is None:
+                self.note_duplicate()
+                return
+            self.release(current)
+            self.changed('connection', {'connected': False})
+
+    def note_duplicate(self):
+        with self.lock:
+            self.duplicate_requests += 1
+
+    def release(self, connection):
+        if not self.keep_port_open:
+            connection.close()
+
+    def servo_angle(self, default=90):
+        """Servo angle the Arduino has confirmed (from the connection's position cache)"""
+        with self.lock:
+            connection = self.connection
+        if connection:
+            return connection.positions.target(0, default)
+        return default
+
+    # Commands
+
+    def submit(self, command, trace=None):
+        """Queue a command for the dispatcher; a newer move replaces a waiting one"""
+        self.start_dispatcher()
+        self.commands.put(command, trace)
+
+    def voice_command(self, command, trace=None):
+        """Queue a recognized command and show it on every tab"""
+        self.submit(command, trace)
+        with self.lock:
+            self.last_command = command
+        self.changed('voice', {'command': command})
+
+    def send(self, command, trace=None):
+        """Send command to Arduino and wait for its reply (read by the transport thread)"""
+        with self.lock:
+            connection = self.connection
+        if connection and connection.ready:
+            try:
+                future = connection.submit(command)
+                if trace:
+                    trace.mark('sent')
+                response = future.result(timeout=self.reply_timeout(connection))
+                if trace:
+                    trace.mark('acked')
+                return True, response
+            except (TimeoutError, FutureTimeoutError):
+                return False, NO_RESPONSE
+            except Exception as e:
+                return False, str(e)
+        return False, "Not connected to Arduino"
+
+    def reply_timeout(self, connection):
+        """How long send() waits: every attempt the transport makes, plus a margin.
+
+        The transport resolves each future itself, but one submitted just as
+        the transport stops could be left pending, and the dispatcher must
+        not hang on it.
+        """
+        transport = connection.transport
+        attempts = transport.timeout * (transport.retries + 1) if transport else 0.0
+        return attempts + self.reply_margin
+
+    def start_dispatcher(self):
+        with self.lock:
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+                self.dispatcher.start()
+
+    def dispatch(self):
+        """Dispatcher thread: the only place commands reach the serial port"""
+        while True:
+            try:
+                command, trace = self.commands.get(timeout=1)
+            except queue.Empty:
+                continue
+            if trace:
+                trace.mark('dequeued')
+            print(f"Sending command to Arduino: {command}")
+            success, response = self.send(command, trace)
+            self.commands.forget(command=command)
+            if self.latency:
+                self.latency.record(trace)
+            print(f"Command sent. Success: {success}, Response: {response}")
+            if success:
+                self.events.publish('servo', {'angle': self.servo_angle(), 'command': command})
+            if success or response == NO_RESPONSE:
+                entry_id = self.add_history(command, response, ok=success)
+                self.events.publish('history', {'id': entry_id})
+
+    def add_history(self, command, response, ok=True):
+        """Append to the history ring; returns the entry's id"""
+        with self.lock:
+            entry = {'id': next(self.history_ids), 'time': time.strftime("%H:%M:%S"),
+                     'command': command, 'response': response, 'ok': ok}
+            self.history.append(entry)
+        return entry['id']
+
+    def history_entries(self):
+        with self.lock:
+            return list(self.history)
+
+    # Listening
+
+    def start_listening(self, worker):
+        """Run worker(audio, listening) on the audio thread until stop_listening().
+
+        audio is a fresh audio_factory() instance, terminated when the worker
+        returns; listening() turns False when the worker should stop. Only
+        one session runs at a time.
+        """
+        with self.audio_lock:
+            with self.lock:
+                if self.listening:
+                    self.duplicate_requests += 1
+                    return False
+                previous = self.audio_thread
+            # A stopped session may still be finishing its last read
+            if previous:
+                previous.join(timeout=2.0)
+            with self.lock:
+                self.listening = True
+                self.audio_thread = threading.Thread(target=self.listen, args=(worker,), daemon=True)
+            # Published before the thread starts, so a worker that fails at once is reported last
+            self.changed('listening', {'listening': True})
+            self.audio_thread.start()
+        return True
+
+    def stop_listening(self):
+        with self.audio_lock:
+            with self.lock:
+                if not self.listening:
+                    self.duplicate_requests += 1
+                    return False
+                self.listening = False
+        self.changed('listening', {'listening': False})
+        return True
+
+    def listen(self, worker):
+        thread = threading.current_thread()
+        audio = None
+        try:
+            audio = self.audio_factory()
+            with self.lock:
+                self.audio = audio
+            worker(audio, lambda: self.listening and self.audio_thread is thread)
+        except Exception as e:
+            print(f"Error in audio processing: {e}")
+        finally:
+            with self.lock:
+                if self.audio is audio:
+                    self.audio = None
+                # The worker gave up on its own (no microphone, no model): tell the tabs
+                stopped = self.listening and self.audio_thread is thread
+                if stopped:
+                    self.listening = False
+            if audio:
+                audio.terminate()
+            if stopped:
+                self.changed('listening', {'listening': False})
+
+    def stats(self):
+        with self.lock:
+            return {'version': self.version, 'connected': self.connection is not None,
+                    'listening': self.listening, 'queued': self.commands.qsize(),
+                    'history': len(self.history), 'duplicate_requests': self.duplicate_requests,
+                    'queue': self.commands.stats()}
@@ -0,0 +1,58 @@
+"""Voice settings and speech model for dashboard.py
+
+Kept apart from the Dash app so replay.py can run the dashboard's command
+parsing on recorded audio without PyAudio, Dash or a browser. Importing
+this module has no side effects; the model loads on first use.
+"""
+import os
+import threading
+
+from audio_profile import get_profile
+from recognition import build_grammar, create_recognizer, load_model, service_socket
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "vosk-model-small-en-us-0.15")
+SAMPLE_RATE = 16000
+PROFILE = get_profile()  # Buffer/read sizes and poll policy (audio_profile.py)
+CHUNK = PROFILE.read_size
+USE_GRAMMAR = False  # Restrict decoding to VOICE_COMMANDS
+VOICE_COMMANDS = ['open', 'close', 'shut']
+USE_VAD = False  # Skip silent chunks before they reach the recognizer
+
+# Vosk model, loaded on first use rather than at import so the Flask
+# reloader's parent process never loads a second copy
+model = None
+recognizer = None
+model_lock = threading.Lock()
+
+
+def parse_voice_command(text):
+    """Map recognized text to a button command ('open' or 'close'), or None"""
+    if 'open' in text:
+        return 'open'
+    if 'close' in text or 'shut' in text:
+        return 'close'
+    return None
+
+
+def grammar():
+    """Vosk grammar for VOICE_COMMANDS, or None for the open vocabulary"""
+    return build_grammar(VOICE_COMMANDS) if USE_GRAMMAR else None
+
+
+def model_available():
+    """True if the recognition service is running or the model is on disk"""
+    return service_socket() is not None or os.path.exists(MODEL_PATH)
+
+
+def get_recognizer():
+    """Load the model (or connect to the recognition service) on first use"""
+    global model, recognizer
+    with model_lock:
+        if recognizer is None:
+            if not model_available():
+                print(f"Please download the Vosk model to {MODEL_PATH}")
+                print("Run: python download_model.py")
+                return None
+            model = load_model(MODEL_PATH)
+            recognizer = create_recognizer(model, SAMPLE_RATE, grammar())
+        return recognizer
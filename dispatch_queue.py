@@ -0,0 +1,91 @@
+import collections
+import queue
+import threading
+
+# Commands that skip ahead of pending moves and cancel them
+PRIORITY_COMMANDS = ('stop', 'exit', 'quit')
+
+
+class CoalescingQueue:
+    """Dispatch queue that keeps only the newest target per actuator.
+
+    A move queued while an older one for the same actuator is still waiting
+    replaces it, and a move to where the actuator is already headed is
+    dropped: the move handed out and not yet acked, or else the target the
+    device confirmed (current, e.g. a PositionCache lookup). Priority
+    commands jump the queue and clear pending moves. get() returns
+    (command, trace) like the queue.Queue it replaces.
+    """
+
+    def __init__(self, priority=PRIORITY_COMMANDS, current=None):
+        self.priority = set(priority)
+        self.current = current                  # actuator -> confirmed target, or None
+        self.urgent = collections.deque()
+        self.slots = collections.OrderedDict()  # actuator -> (command, trace), oldest first
+        self.last = {}                          # actuator -> command handed out, awaiting its ack
+        self.cond = threading.Condition()
+        self.merged = 0      # pending moves replaced by a newer one
+        self.duplicates = 0  # moves dropped because the actuator already has that target
+        self.cleared = 0     # pending moves cancelled by a priority command
+
+    def put(self, command, trace=None, actuator=0):
+        with self.cond:
+            if command in self.priority:
+                self.cleared += len(self.slots)
+                self.slots.clear()
+                self.urgent.append((command, trace))
+            else:
+                if actuator in self.slots:
+                    del self.slots[actuator]
+                    self.merged += 1
+                if self.headed(actuator) == command:
+                    self.duplicates += 1
+                    return
+                self.slots[actuator] = (command, trace)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Next command and its trace; raises queue.Empty after timeout"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.urgent or self.slots, timeout):
+                raise queue.Empty
+            if self.urgent:
+                return self.urgent.popleft()
+            actuator, (command, trace) = self.slots.popitem(last=False)
+            self.last[actuator] = command
+            return command, trace
+
+    def headed(self, actuator):
+        """The unacked move for actuator, else its confirmed target (call with cond held)"""
+        if actuator in self.last:
+            return self.last[actuator]
+        return self.current(actuator) if self.current else None
+
+    def target(self, actuator=0, default=None):
+        """Where the actuator is headed: its pending move, the one in flight, or the confirmed target"""
+        with self.cond:
+            if actuator in self.slots:
+                return self.slots[actuator][0]
+            target = self.headed(actuator)
+            return default if target is None else target
+
+    def forget(self, actuator=0, command=None):
+        """Stop tracking the move handed out for actuator, once it was acked or failed.
+
+        With command, only if that is still the latest move handed out.
+        After this, target() and deduplication go by the confirmed target.
+        """
+        with self.cond:
+            if command is None or self.last.get(actuator) == command:
+                self.last.pop(actuator, None)
+
+    def qsize(self):
+        with self.cond:
+            return len(self.urgent) + len(self.slots)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def stats(self):
+        with self.cond:
+            return {'merged': self.merged, 'duplicates': self.duplicates, 'cleared': self.cleared}
@@ -0,0 +1,76 @@
+"""Server-Sent Events: push state changes to every open dashboard tab
+
+publish() hands an event to each subscriber's queue, and stream() turns
+one subscription into a text/event-stream body for a Flask response.
+A subscriber that falls behind loses its oldest events rather than
+blocking the publisher (the audio thread or a serial ack).
+"""
+import collections
+import itertools
+import json
+import threading
+
+
+class Subscription:
+    def __init__(self, max_pending):
+        self.pending = collections.deque(maxlen=max_pending)
+        self.cond = threading.Condition()
+
+
+class EventBroadcaster:
+    """Fan-out of small JSON events to any number of streaming clients"""
+
+    def __init__(self, max_pending=100, keepalive=15.0):
+        self.max_pending = max_pending
+        self.keepalive = keepalive  # seconds between comments that keep proxies from closing idle streams
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        subscriber = Subscription(self.max_pending)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, kind, data=None):
+        """Send {'id', 'kind', 'data'} to every subscriber"""
+        event = {'id': next(self.ids), 'kind': kind, 'data': data}
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            with subscriber.cond:
+                if len(subscriber.pending) == subscriber.pending.maxlen:
+                    self.dropped += 1
+                subscriber.pending.append(event)
+                subscriber.cond.notify()
+        return event['id']
+
+    def stream(self):
+        """Generator of SSE messages for one client; unsubscribes when the client goes away"""
+        subscriber = self.subscribe()
+        try:
+            yield "retry: 2000\n\n"  # browser reconnect delay
+            while True:
+                with subscriber.cond:
+                    if not subscriber.pending:
+                        subscriber.cond.wait(self.keepalive)
+                    events = list(subscriber.pending)
+                    subscriber.pending.clear()
+                if not events:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    yield f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self.lock:
+            return {'clients': len(self.subscribers), 'published': self.published, 'dropped': self.dropped}
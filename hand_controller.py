@@ -0,0 +1,170 @@
+"""Multi-servo, multi-board hand: named poses sent as one frame per board
+
+Each joint lives on a (port, servo index) pair; servo indexes follow
+SERVO_PINS in servo_control.ino. A pose is split per board and every
+board gets a single POSE frame, submitted back to back without waiting
+for acks, so all joints on all boards start moving together. Joint
+positions are read from each board's PositionCache, so they only ever
+show what the boards confirmed. Poses need the binary protocol; a board
+running a text-only sketch refuses them.
+
+Usage: python hand_controller.py <pose> [port]
+"""
+import sys
+import threading
+from concurrent.futures import Future
+
+from serial_connection import open_connection
+
+# joint -> (port, servo index on that board)
+DEFAULT_JOINTS = {
+    'thumb': ('COM9', 0),
+    'index': ('COM9', 1),
+    'middle': ('COM9', 2),
+    'ring': ('COM9', 3),
+    'pinky': ('COM9', 4),
+}
+
+# Joint angles: 0 = finger extended, 180 = fully curled
+POSES = {
+    'open hand': {'thumb': 0, 'index': 0, 'middle': 0, 'ring': 0, 'pinky': 0},
+    'fist': {'thumb': 180, 'index': 180, 'middle': 180, 'ring': 180, 'pinky': 180},
+    'point': {'thumb': 180, 'index': 0, 'middle': 180, 'ring': 180, 'pinky': 180},
+    'peace': {'thumb': 180, 'index': 0, 'middle': 0, 'ring': 180, 'pinky': 180},
+    'thumbs up': {'thumb': 0, 'index': 180, 'middle': 180, 'ring': 180, 'pinky': 180},
+}
+
+
+class HandController:
+    """Drive the joints of a hand spread over one or more serial boards"""
+
+    def __init__(self, joints=None, poses=None, baud=9600, suppress_reset=False, max_baud=None):
+        self.joints = joints or DEFAULT_JOINTS
+        self.poses = poses or POSES
+        self.baud = baud
+        self.suppress_reset = suppress_reset
+        self.max_baud = max_baud
+        self.connections = {}
+
+    @property
+    def positions(self):
+        """{joint: angle} for every joint whose board has confirmed a target"""
+        positions = {}
+        for joint, (port, servo) in self.joints.items():
+            connection = self.connections.get(port)
+            angle = connection.positions.target(servo) if connection else None
+            if angle is not None:
+                positions[joint] = angle
+        return positions
+
+    def current_pose(self):
+        """Name of the pose the boards confirm the hand is in, or None"""
+        positions = self.positions
+        for name, targets in self.poses.items():
+            if all(positions.get(joint) == angle for joint, angle in targets.items()):
+                return name
+        return None
+
+    @property
+    def ports(self):
+        return sorted({port for port, _ in self.joints.values()})
+
+    def connect(self):
+        """Open every board at once (each may need its bootloader time)"""
+        errors = {}
+
+        def open_board(port):
+            try:
+                self.connections[port] = open_connection(
+                    port, self.baud, suppress_reset=self.suppress_reset, max_baud=self.max_baud
+                )
+            except Exception as e:
+                errors[port] = e
+
+        threads = [threading.Thread(target=open_board, args=(port,)) for port in self.ports]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for port, error in errors.items():
+            print(f"❌ Failed to connect to {port}: {error}")
+        return not errors
+
+    def split(self, targets):
+        """{joint: angle} -> {port: {servo: angle}}"""
+        boards = {}
+        for joint, angle in targets.items():
+            if joint not in self.joints:
+                raise KeyError(f"Unknown joint '{joint}'")
+            port, servo = self.joints[joint]
+            boards.setdefault(port, {})[servo] = int(angle)
+        return boards
+
+    def move(self, targets):
+        """Send joint targets to every board; returns {port: [futures]} without waiting"""
+        futures = {}
+        for port, servos in self.split(targets).items():
+            connection = self.connections.get(port)
+            if connection is None:
+                print(f"⚠️  {port} is not connected")
+                continue
+            if connection.codec and connection.codec.name == 'binary':
+                futures[port] = [connection.submit(servos)]
+            else:
+                # Text sketches drive one servo and only take their own words
+                # ('open'/'close', or 0/180), so joint angles cannot be sent
+                refused = Future()
+                refused.set_exception(ValueError(
+                    f"{port} runs a text-only sketch; poses need servo_control.ino with the binary protocol"))
+                futures[port] = [refused]
+            for future in futures[port]:
+                future.add_done_callback(lambda f, port=port: self.on_ack(f, port))
+        return futures
+
+    def on_ack(self, future, port):
+        if future.exception():
+            print(f"❌ {port}: {future.exception()}")
+
+    def pose(self, name, wait=False, timeout=None):
+        """Move to a named pose; with wait=True, block until every board acks"""
+        futures = self.move(self.poses[name])
+        if wait:
+            for port_futures in futures.values():
+                for future in port_futures:
+                    future.exception(timeout)
+        return futures
+
+    def match_pose(self, text):
+        """Name of the pose mentioned in text, or None (longest name first)"""
+        for name in sorted(self.poses, key=len, reverse=True):
+            if name in text:
+                return name
+        return None
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections = {}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in POSES:
+        print(__doc__)
+        print("Poses:", ", ".join(POSES))
+        return 1
+    joints = DEFAULT_JOINTS
+    if len(sys.argv) > 2:
+        joints = {joint: (sys.argv[2], servo) for joint, (_, servo) in DEFAULT_JOINTS.items()}
+    hand = HandController(joints, max_baud=115200)
+    if not hand.connect():
+        return 1
+    try:
+        hand.pose(sys.argv[1], wait=True, timeout=3.0)
+        print(f"✅ {sys.argv[1]}: {hand.positions}")
+    finally:
+        hand.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import collections
+import json
+import math
+import threading
+import time
+
+# Pipeline stages in the order a voice command passes through them
+STAGES = ['captured', 'recognized', 'parsed', 'enqueued', 'dequeued', 'sent', 'acked']
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, math.inf]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+
+class CommandTrace:
+    """Monotonic timestamps for one command as it moves through the pipeline"""
+
+    def __init__(self, **stamps):
+        self.stamps = dict(stamps)
+
+    def mark(self, stage, when=None):
+        """Record that the command reached stage (now, unless when is given)"""
+        self.stamps[stage] = time.monotonic() if when is None else when
+
+    def intervals(self):
+        """(name, seconds) between each pair of consecutive recorded stages"""
+        reached = [stage for stage in STAGES if stage in self.stamps]
+        pairs = zip(reached, reached[1:])
+        return [(f"{a}->{b}", self.stamps[b] - self.stamps[a]) for a, b in pairs]
+
+
+class LatencyTracker:
+    """Rolling per-stage latency histograms over the last `window` commands"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self.commands = 0
+        self.lock = threading.Lock()
+
+    def record(self, trace):
+        """Add a finished trace to the histograms"""
+        if trace is None:
+            return
+        intervals = trace.intervals()
+        if not intervals:
+            return
+        reached = [trace.stamps[stage] for stage in STAGES if stage in trace.stamps]
+        with self.lock:
+            self.commands += 1
+            for name, seconds in intervals:
+                self.samples[name].append(seconds)
+            self.samples['total'].append(reached[-1] - reached[0])
+
+    def summary(self):
+        """Per-stage count, percentiles and bucket counts, in milliseconds"""
+        with self.lock:
+            snapshot = {name: sorted(values) for name, values in self.samples.items()}
+            commands = self.commands
+
+        stages = {}
+        for name, values in snapshot.items():
+            if not values:
+                continue
+            ms = [v * 1000 for v in values]
+            buckets = {}
+            for bound in BUCKETS_MS:
+                label = f"<={bound:g}" if bound != math.inf else "inf"
+                buckets[label] = sum(1 for v in ms if v <= bound) - sum(buckets.values())
+            stages[name] = {
+                'count': len(ms),
+                'mean': sum(ms) / len(ms),
+                'p50': percentile(ms, 50),
+                'p90': percentile(ms, 90),
+                'p99': percentile(ms, 99),
+                'max': ms[-1],
+                'buckets': buckets,
+            }
+        return {'commands': commands, 'window': self.window, 'stages_ms': stages}
+
+    def export_json(self, path):
+        """Write summary() to path as JSON and return it"""
+        report = self.summary()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
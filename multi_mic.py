@@ -0,0 +1,281 @@
+"""Concurrent multi-microphone recognition with best-hypothesis fusion
+
+Every input device gets its own capture ring buffer, recognizer and
+decode thread (Vosk releases the GIL while decoding, so the threads run
+in parallel). Final results that arrive within a short fusion window are
+treated as the same utterance, and only the one with the highest mean
+word confidence is forwarded. The window is only an upper bound: once
+every active mic has reported, the winner is forwarded at once.
+
+Benchmark: python multi_mic.py <wav_dir> [max_devices]
+"""
+import json
+import sys
+import threading
+import time
+
+import pyaudio
+
+from audio_capture import CallbackCapture
+from recognition import create_recognizer, load_model
+from recognition_service import DEFAULT_MODEL
+from vad import VoiceActivityGate
+from wav_dataset import load_labeled_wavs
+
+
+def confidence(result):
+    """Mean word confidence of a Vosk result (needs SetWords(True))"""
+    words = result.get("result") or []
+    if not words:
+        return 0.0
+    return sum(word.get("conf", 0.0) for word in words) / len(words)
+
+
+class HypothesisFuser:
+    """Collect per-device finals for one utterance and keep the most confident.
+
+    active() (optional) returns how many mics can still report; when each
+    of them has a final in the current window it is fused without waiting
+    for the window to run out.
+    """
+
+    def __init__(self, on_result, window=0.4, active=None):
+        self.on_result = on_result
+        self.window = window
+        self.active = active
+        self.candidates = []
+        self.timer = None
+        self.generation = 0  # bumped per window, so a late timer cannot flush the next one
+        self.lock = threading.Lock()
+        self.utterances = 0
+        self.suppressed = 0
+        self.early = 0  # windows fused before the timeout
+
+    def add(self, device, text, score, captured, recognized):
+        with self.lock:
+            self.candidates.append((score, device, text, captured, recognized))
+            complete = self.active is not None and len({c[1] for c in self.candidates}) >= self.active()
+            if complete:
+                self.early += 1
+            elif self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush, args=(self.generation,))
+                self.timer.daemon = True
+                self.timer.start()
+        if complete:
+            self.flush()
+
+    def flush(self, generation=None):
+        """Forward the winning hypothesis of the current window"""
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            candidates, self.candidates = self.candidates, []
+            if self.timer:
+                self.timer.cancel()
+            self.timer = None
+            self.generation += 1
+        if not candidates:
+            return
+        score, device, text, captured, recognized = max(candidates, key=lambda c: c[0])
+        self.utterances += 1
+        self.suppressed += len(candidates) - 1
+        self.on_result(text, device, score, captured, recognized)
+
+    def cancel(self):
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+            self.timer = None
+            self.candidates = []
+            self.generation += 1
+
+
+class MicChannel:
+    """One device: read chunks, decode them, hand finals to the fuser.
+
+    read() returns a chunk of PCM, None when nothing arrived yet, or b''
+    at the end of the stream.
+    """
+
+    def __init__(self, device, read, recognizer, fuser, vad=None):
+        self.device = device
+        self.read = read
+        self.recognizer = recognizer
+        self.fuser = fuser
+        self.vad = vad
+        self.chunks = 0
+        self.audio_bytes = 0
+
+    def submit(self, result, captured):
+        text = result.get("text", "").strip()
+        if text:
+            self.fuser.add(self.device, text, confidence(result), captured, time.monotonic())
+
+    def run(self, running):
+        while running():
+            data = self.read()
+            if data is None:
+                continue
+            if not data:
+                break
+            captured = time.monotonic()
+            self.chunks += 1
+            self.audio_bytes += len(data)
+            if self.vad:
+                data = self.vad.gate(data)
+                if not data:
+                    continue
+            if self.recognizer.AcceptWaveform(data):
+                self.submit(json.loads(self.recognizer.Result()), captured)
+        self.submit(json.loads(self.recognizer.FinalResult()), time.monotonic())
+
+
+class MultiMicRecognizer:
+    """Capture and recognize on several input devices at once"""
+
+    def __init__(self, audio, devices, model, sample_rate, chunk, on_result,
+                 grammar=None, fusion_window=0.4, buffer_seconds=2.0, use_vad=False):
+        self.audio = audio
+        self.devices = devices
+        self.model = model
+        self.sample_rate = sample_rate
+        self.chunk = chunk
+        self.grammar = grammar
+        self.buffer_seconds = buffer_seconds
+        self.use_vad = use_vad  # one VoiceActivityGate per mic, each with its own noise floor
+        self.fuser = HypothesisFuser(on_result, fusion_window, active=self.active_channels)
+        self.captures = {}
+        self.channels = []
+        self.threads = []
+        self.running = False
+
+    def start(self):
+        self.running = True
+        for device in self.devices:
+            capture = CallbackCapture(self.chunk, self.sample_rate, self.buffer_seconds)
+            capture.open(
+                self.audio,
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.sample_rate,
+                input_device_index=device
+            )
+            self.captures[device] = capture
+            recognizer = create_recognizer(self.model, self.sample_rate, self.grammar, words=True)
+            vad = VoiceActivityGate(self.sample_rate, self.chunk) if self.use_vad else None
+            channel = MicChannel(device, self.reader(capture), recognizer, self.fuser, vad)
+            self.channels.append(channel)
+            thread = threading.Thread(target=channel.run, args=(lambda: self.running,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"✅ Listening on {len(self.devices)} microphones: {self.devices}")
+
+    def active_channels(self):
+        """Mics whose decode thread is still running"""
+        return sum(thread.is_alive() for thread in self.threads) or len(self.devices)
+
+    def reader(self, capture):
+        return lambda: capture.read(self.chunk, timeout=0.5)
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.fuser.cancel()
+        for capture in self.captures.values():
+            capture.stream.stop_stream()
+            capture.stream.close()
+
+    def stats(self):
+        return {
+            'utterances': self.fuser.utterances,
+            'suppressed_duplicates': self.fuser.suppressed,
+            'fused_early': self.fuser.early,
+            'vad': {channel.device: channel.vad.stats() for channel in self.channels if channel.vad},
+            'captures': {device: capture.stats() for device, capture in self.captures.items()},
+        }
+
+
+def run_multi_mic(audio, devices, model, sample_rate, chunk, on_result, running, grammar=None,
+                  use_vad=False, early_fire=False):
+    """Recognize on every device until running() turns False, then print the stats"""
+    if early_fire:
+        print("⚠️  EARLY_FIRE is ignored with several INPUT_DEVICES: "
+              "commands wait for the fused final result")
+    multi_mic = MultiMicRecognizer(audio, devices, model, sample_rate, chunk, on_result,
+                                   grammar=grammar, use_vad=use_vad)
+    multi_mic.start()
+    while running():
+        time.sleep(0.1)
+    multi_mic.stop()
+    stats = multi_mic.stats()
+    print(f"📊 Multi-mic: {stats['utterances']} utterances "
+          f"({stats['fused_early']} fused as soon as every mic reported), "
+          f"{stats['suppressed_duplicates']} duplicate hypotheses dropped")
+    for device, vad in stats['vad'].items():
+        print(f"📊 Mic {device} VAD skipped {vad['skipped']}/{vad['chunks']} chunks")
+
+
+def pcm_reader(pcm, chunk):
+    """read() callable serving pcm in chunk-sized pieces, then b''"""
+    chunks = iter([pcm[i:i + chunk * 2] for i in range(0, len(pcm), chunk * 2)])
+    return lambda: next(chunks, b'')
+
+
+def benchmark(model, samples, sample_rate, chunk, device_counts):
+    """Decode the same recordings on N simulated mics; report throughput and CPU"""
+    pcm = b''.join(sample[2] for sample in samples)
+    audio_seconds = len(pcm) / 2 / sample_rate
+    rows = []
+    for count in device_counts:
+        fuser = HypothesisFuser(lambda *args: None, window=0.0)
+        channels = []
+        for device in range(count):
+            recognizer = create_recognizer(model, sample_rate, words=True)
+            channels.append(MicChannel(device, pcm_reader(pcm, chunk), recognizer, fuser))
+        threads = [threading.Thread(target=c.run, args=(lambda: True,)) for c in channels]
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+        rows.append({
+            'devices': count,
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'audio_seconds_per_second': count * audio_seconds / wall if wall else 0.0,
+            'realtime_streams': audio_seconds / wall if wall else 0.0,
+            'cpu_per_stream_second': cpu / (count * audio_seconds) if audio_seconds else 0.0,
+        })
+    return rows
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    sample_rate, chunk = 16000, 8192
+    samples = load_labeled_wavs(sys.argv[1], sample_rate)
+    if not samples:
+        print("❌ No usable WAV files found")
+        return 1
+    max_devices = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    counts = sorted({1, 2, 4, 8, max_devices} & set(range(1, max_devices + 1)))
+
+    rows = benchmark(load_model(DEFAULT_MODEL), samples, sample_rate, chunk, counts)
+    print(f"\nMulti-mic scaling ({sum(len(s[2]) for s in samples) / 2 / sample_rate:.1f} s of audio per mic)")
+    print("=" * 64)
+    print(f"{'mics':>5}{'wall s':>10}{'CPU s':>10}{'audio s/s':>12}{'x real time':>13}{'CPU/audio s':>13}")
+    for r in rows:
+        print(f"{r['devices']:>5}{r['wall_seconds']:>10.2f}{r['cpu_seconds']:>10.2f}"
+              f"{r['audio_seconds_per_second']:>12.1f}{r['realtime_streams']:>13.1f}"
+              f"{r['cpu_per_stream_second']:>13.3f}")
+    print(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+class PartialStabilizer:
+    """Fire a command early once it is stable across consecutive partials.
+
+    parse(text) turns a transcript into a command (or None). A command is
+    fired when the same one comes out of `threshold` consecutive partial
+    results. The final result of the utterance is then checked against it
+    so the same command is not sent twice; a different final result is
+    passed through as a correction.
+    """
+
+    def __init__(self, parse, threshold=2, pending=None):
+        self.parse = parse
+        self.threshold = max(1, threshold)
+        self.pending = pending  # pending(text) -> True while a longer phrase may follow
+        self.candidate = None
+        self.count = 0
+        self.fired = None
+        self.early_fired = 0
+        self.deduplicated = 0
+        self.corrected = 0
+
+    def reset(self):
+        """Start a new utterance"""
+        self.candidate = None
+        self.count = 0
+        self.fired = None
+
+    def partial(self, text):
+        """Feed a partial result; return a command to fire now, or None"""
+        if self.fired is not None:
+            return None
+        command = self.parse(text) if text else None
+        if command is None or (self.pending and self.pending(text)):
+            self.candidate = None
+            self.count = 0
+            return None
+        if command == self.candidate:
+            self.count += 1
+        else:
+            self.candidate = command
+            self.count = 1
+        if self.count >= self.threshold:
+            self.fired = command
+            self.early_fired += 1
+            return command
+        return None
+
+    def final(self, text):
+        """Feed the final result; return (command, fired_early).
+
+        command is what still needs dispatching: None when the final result
+        repeats the early-fired command or contains no command at all.
+        """
+        fired = self.fired
+        self.reset()
+        command = self.parse(text) if text else None
+        if fired is None:
+            return command, False
+        if command is None or command == fired:
+            self.deduplicated += 1
+            return None, True
+        self.corrected += 1
+        return command, True
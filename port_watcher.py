@@ -0,0 +1,103 @@
+"""Shared serial port discovery: one background scan for every dashboard tab
+
+comports() walks sysfs (Linux) or the registry (Windows) on every call.
+PortWatcher runs it on a single thread, keeps the result as a snapshot,
+and calls its listeners only when the set of ports changes. Where pyudev
+is installed (Linux), tty hotplug events trigger a rescan at once and
+the periodic scan is only a safety net; elsewhere ports are rescanned
+every `interval` seconds.
+"""
+import threading
+
+import serial.tools.list_ports
+
+try:
+    import pyudev
+except ImportError:  # optional: without it we fall back to periodic scans
+    pyudev = None
+
+
+class PortWatcher:
+    """Cached, change-notifying view of the serial ports on this machine"""
+
+    def __init__(self, interval=2.0, hotplug_interval=30.0, extra_ports=()):
+        self.extra_ports = list(extra_ports)  # e.g. ptys, which comports() never lists
+        self.interval = interval
+        self.hotplug_interval = hotplug_interval
+        self.ports = []
+        self.version = 0
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+        self.monitor = None
+        self.scans = 0
+        self.changes = 0
+
+    def start(self):
+        self.scan()
+        self.running = True
+        self.monitor = self.start_hotplug()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        if self.monitor:
+            self.monitor.stop()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def start_hotplug(self):
+        """Rescan when udev reports a tty being added or removed (None without pyudev)"""
+        if pyudev is None:
+            return None
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by('tty')
+            observer = pyudev.MonitorObserver(monitor, callback=lambda device: self.wake.set())
+            observer.start()
+            return observer
+        except Exception as e:
+            print(f"⚠️  udev hotplug unavailable ({e}); scanning every {self.interval:.0f}s")
+            return None
+
+    def run(self):
+        while self.running:
+            self.wake.wait(self.hotplug_interval if self.monitor else self.interval)
+            self.wake.clear()
+            if self.running:
+                self.scan()
+
+    def scan(self):
+        """List the ports now; notify listeners if the set changed"""
+        ports = sorted({port.device for port in serial.tools.list_ports.comports()} | set(self.extra_ports))
+        with self.lock:
+            self.scans += 1
+            if ports == self.ports:
+                return False
+            self.ports = ports
+            self.version += 1
+            self.changes += 1
+            version, listeners = self.version, list(self.listeners)
+        for listener in listeners:
+            listener(version, ports)
+        return True
+
+    def snapshot(self):
+        """(version, ports) as of the last scan; version changes whenever the ports do"""
+        with self.lock:
+            return self.version, list(self.ports)
+
+    def add_listener(self, callback):
+        """callback(version, ports) runs on the watcher thread after every change"""
+        with self.lock:
+            self.listeners.append(callback)
+
+    def stats(self):
+        with self.lock:
+            return {'scans': self.scans, 'changes': self.changes, 'ports': len(self.ports),
+                    'hotplug': self.monitor is not None}
@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class PositionCache:
+    """Servo angles as confirmed by the device, never as merely commanded.
+
+    The serial transport feeds it from acks (the target the firmware
+    accepted), from STATUS reports (where the servos actually are) and from
+    the text sketches' reply lines. Senders read it for relative moves and
+    deduplication, so a write that was lost never shows up as a position.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.targets = {}    # servo -> target the device acknowledged
+        self.positions = {}  # servo -> position the device reported
+        self.moving = set()
+        self.updated = {}    # servo -> monotonic time of the last confirmation
+        self.confirmations = 0
+        self.reports = 0
+
+    def confirm(self, angles):
+        """The device accepted these targets (MOVE/POSE ack or a text reply)"""
+        now = time.monotonic()
+        with self.lock:
+            for servo, angle in angles.items():
+                self.targets[servo] = angle
+                self.updated[servo] = now
+                if servo not in self.moving:
+                    # Without a report saying otherwise, a jump-mode servo is already there
+                    self.positions[servo] = angle
+            self.confirmations += 1
+
+    def report(self, angles, moving=()):
+        """The device said where its servos are (STATUS ack or settle report)"""
+        now = time.monotonic()
+        with self.lock:
+            for servo, angle in angles.items():
+                self.positions[servo] = angle
+                self.updated[servo] = now
+                if servo in moving:
+                    self.moving.add(servo)
+                else:
+                    self.moving.discard(servo)
+                    self.targets[servo] = angle
+            self.reports += 1
+
+    def target(self, servo=0, default=None):
+        """Where the servo is headed, as far as the device has confirmed"""
+        with self.lock:
+            return self.targets.get(servo, default)
+
+    def position(self, servo=0, default=None):
+        """Where the servo is now, as far as the device has reported"""
+        with self.lock:
+            return self.positions.get(servo, default)
+
+    def is_moving(self, servo=0):
+        with self.lock:
+            return servo in self.moving
+
+    def age(self, servo=0):
+        """Seconds since the device last confirmed this servo, or None if it never has"""
+        with self.lock:
+            updated = self.updated.get(servo)
+        return None if updated is None else time.monotonic() - updated
+
+    def clear(self):
+        """Forget everything, e.g. after the board may have reset"""
+        with self.lock:
+            self.targets.clear()
+            self.positions.clear()
+            self.moving.clear()
+            self.updated.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {servo: {'target': self.targets.get(servo), 'position': self.positions.get(servo),
+                            'moving': servo in self.moving} for servo in sorted(self.updated)}
+
+    def stats(self):
+        with self.lock:
+            return {'confirmations': self.confirmations, 'reports': self.reports}
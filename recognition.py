@@ -0,0 +1,83 @@
+import json
+import os
+import socket
+
+from vosk import KaldiRecognizer, Model
+
+from command_matcher import tokenize
+from recognition_service import RemoteModel, listening
+
+UNKNOWN_WORD = "[unk]"
+
+# Set to the recognition service's socket path to share one loaded model
+SERVICE_SOCKET_ENV = "VOSK_SERVICE_SOCKET"
+
+
+def service_socket():
+    """Socket path of a running recognition service, or None"""
+    path = os.environ.get(SERVICE_SOCKET_ENV)
+    if not path or not os.path.exists(path) or not hasattr(socket, 'AF_UNIX'):
+        return None
+    # A socket file left behind by a crashed service still exists; make sure
+    # something is listening before giving up on loading the model locally
+    if not listening(path):
+        print(f"⚠️  Nothing listening on {path} (stale recognition service socket?); ignoring it")
+        return None
+    return path
+
+
+def load_model(model_path, socket_path=None):
+    """Use the shared recognition service if one is running, else load locally"""
+    socket_path = socket_path or service_socket()
+    if socket_path:
+        print(f"Using recognition service at {socket_path}")
+        return RemoteModel(socket_path)
+    return Model(model_path)
+
+
+def grammar_phrases(*tables):
+    """Collect the phrases a restricted grammar should accept.
+
+    Each table may be a dict (its keys are used) or a list of phrases.
+    Digit-only tokens are left out because they are never in the model
+    vocabulary; the spoken form is expected to be in the tables too.
+    """
+    phrases = []
+    for table in tables:
+        for phrase in table:
+            words = [word for word in tokenize(phrase) if not word.isdigit()]
+            phrase = " ".join(words)
+            if phrase and phrase not in phrases:
+                phrases.append(phrase)
+    return phrases
+
+
+def build_grammar(*tables):
+    """Build a Vosk grammar (JSON list) from command tables, plus [unk]"""
+    return json.dumps(grammar_phrases(*tables) + [UNKNOWN_WORD])
+
+
+def create_recognizer(model, sample_rate, grammar=None, words=False):
+    """Create a recognizer, restricted to grammar if one is given"""
+    if isinstance(model, RemoteModel):
+        return model.recognizer(sample_rate, grammar, words)
+    if grammar:
+        recognizer = KaldiRecognizer(model, sample_rate, grammar)
+    else:
+        recognizer = KaldiRecognizer(model, sample_rate)
+    if words:
+        recognizer.SetWords(True)
+    return recognizer
+
+
+def switch_grammar(recognizer, model, sample_rate, grammar=None, words=False):
+    """Swap the grammar of a running recognizer and return the one to use.
+
+    Grammars can be changed in place on recent Vosk versions and on the
+    recognition service; going back to the open vocabulary (grammar=None)
+    or older versions need a new recognizer.
+    """
+    if isinstance(model, RemoteModel) or (grammar and hasattr(recognizer, "SetGrammar")):
+        recognizer.SetGrammar(grammar)
+        return recognizer
+    return create_recognizer(model, sample_rate, grammar, words)
@@ -0,0 +1,267 @@
+"""Shared speech recognition service
+
+Loads the Vosk model once and serves any number of front ends (CLI
+controllers, dashboard) over a Unix socket. Each client connection gets
+its own KaldiRecognizer session.
+
+Usage: python recognition_service.py [--socket PATH] [--model PATH]
+
+Clients use it by setting VOSK_SERVICE_SOCKET to the socket path.
+"""
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+DEFAULT_SOCKET = "/tmp/vosk-recognition.sock"
+DEFAULT_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vosk-model-small-en-us-0.15")
+
+# Frame: 1-byte kind + 4-byte payload length, then the payload
+HEADER = struct.Struct('!cI')
+OPEN = b'O'         # JSON {"sample_rate", "grammar", "words"}
+AUDIO = b'A'        # raw 16-bit PCM
+FINAL = b'F'        # FinalResult()
+GRAMMAR = b'G'      # new grammar JSON, empty for open vocabulary
+WORDS = b'W'        # b'1' / b'0'
+RESET = b'X'        # Reset()
+REPLY = b'R'        # JSON reply to every request
+EMPTY_PARTIAL = '{"partial" : ""}'
+
+
+def listening(path, timeout=1.0):
+    """True if a service answers on the socket at path (not just a leftover file)"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(timeout)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def send_frame(sock, kind, payload=b''):
+    sock.sendall(HEADER.pack(kind, len(payload)) + payload)
+
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock):
+    """Return (kind, payload), or (None, None) once the peer has closed"""
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None, None
+    kind, size = HEADER.unpack(header)
+    payload = recv_exact(sock, size) if size else b''
+    if payload is None:
+        return None, None
+    return kind, payload
+
+
+class RemoteRecognizer:
+    """KaldiRecognizer look-alike backed by a session on the service"""
+
+    def __init__(self, socket_path, sample_rate, grammar=None, words=False):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.result = '{"text" : ""}'
+        self.partial = EMPTY_PARTIAL
+        options = {'sample_rate': sample_rate, 'grammar': grammar, 'words': words}
+        self._call(OPEN, json.dumps(options).encode('utf-8'))
+
+    def _call(self, kind, payload=b''):
+        send_frame(self.sock, kind, payload)
+        reply_kind, reply = recv_frame(self.sock)
+        if reply_kind != REPLY:
+            raise ConnectionError("Recognition service closed the connection")
+        reply = json.loads(reply)
+        if 'error' in reply:
+            raise RuntimeError(f"Recognition service error: {reply['error']}")
+        return reply
+
+    def AcceptWaveform(self, data):
+        reply = self._call(AUDIO, bytes(data))
+        if reply['endpoint']:
+            self.result = reply['result']
+            self.partial = EMPTY_PARTIAL
+        else:
+            self.partial = reply['result']
+        return reply['endpoint']
+
+    def Result(self):
+        return self.result
+
+    def PartialResult(self):
+        return self.partial
+
+    def FinalResult(self):
+        self.partial = EMPTY_PARTIAL
+        return self._call(FINAL)['result']
+
+    def SetWords(self, enabled):
+        self._call(WORDS, b'1' if enabled else b'0')
+
+    def SetGrammar(self, grammar):
+        self._call(GRAMMAR, (grammar or '').encode('utf-8'))
+
+    def Reset(self):
+        self.partial = EMPTY_PARTIAL
+        self._call(RESET)
+
+    def close(self):
+        self.sock.close()
+
+    def __del__(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+class RemoteModel:
+    """Stands in for vosk.Model when recognition runs in the service"""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+
+    def recognizer(self, sample_rate, grammar=None, words=False):
+        return RemoteRecognizer(self.socket_path, sample_rate, grammar, words)
+
+
+class RecognitionService:
+    """Unix socket server sharing one loaded model between clients"""
+
+    def __init__(self, model_path=DEFAULT_MODEL, socket_path=DEFAULT_SOCKET):
+        from vosk import Model
+        self.socket_path = socket_path
+        print(f"Loading model from {model_path}...")
+        self.model = Model(model_path)
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    def new_recognizer(self, sample_rate, grammar=None, words=False):
+        from vosk import KaldiRecognizer
+        if grammar:
+            recognizer = KaldiRecognizer(self.model, sample_rate, grammar)
+        else:
+            recognizer = KaldiRecognizer(self.model, sample_rate)
+        if words:
+            recognizer.SetWords(True)
+        return recognizer
+
+    def handle(self, conn):
+        """Serve one client session until it disconnects"""
+        recognizer = None
+        options = {}
+        with self.lock:
+            self.sessions += 1
+            print(f"Client connected ({self.sessions} active)")
+        try:
+            while True:
+                kind, payload = recv_frame(conn)
+                if kind is None:
+                    break
+                try:
+                    if kind == OPEN:
+                        options = json.loads(payload)
+                        recognizer = self.new_recognizer(
+                            options['sample_rate'], options.get('grammar'), options.get('words', False)
+                        )
+                        reply = {'ok': True}
+                    elif recognizer is None:
+                        reply = {'error': 'session not opened'}
+                    elif kind == AUDIO:
+                        endpoint = bool(recognizer.AcceptWaveform(payload))
+                        result = recognizer.Result() if endpoint else recognizer.PartialResult()
+                        reply = {'endpoint': endpoint, 'result': result}
+                    elif kind == FINAL:
+                        reply = {'result': recognizer.FinalResult()}
+                    elif kind == GRAMMAR:
+                        grammar = payload.decode('utf-8') or None
+                        options['grammar'] = grammar
+                        if grammar and hasattr(recognizer, 'SetGrammar'):
+                            recognizer.SetGrammar(grammar)
+                        else:
+                            recognizer = self.new_recognizer(
+                                options['sample_rate'], grammar, options.get('words', False)
+                            )
+                        reply = {'ok': True}
+                    elif kind == WORDS:
+                        options['words'] = payload == b'1'
+                        recognizer.SetWords(options['words'])
+                        reply = {'ok': True}
+                    elif kind == RESET:
+                        recognizer.Reset()
+                        reply = {'ok': True}
+                    else:
+                        reply = {'error': f"unknown request {kind!r}"}
+                except Exception as e:
+                    reply = {'error': str(e)}
+                send_frame(conn, REPLY, json.dumps(reply).encode('utf-8'))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            with self.lock:
+                self.sessions -= 1
+                print(f"Client disconnected ({self.sessions} active)")
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            if listening(self.socket_path):
+                raise RuntimeError(f"Another recognition service is already listening on {self.socket_path}")
+            os.remove(self.socket_path)  # stale socket from a previous run
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        bound = os.stat(self.socket_path)
+        server.listen()
+        print(f"✅ Recognition service listening on {self.socket_path}")
+        try:
+            while True:
+                conn, _ = server.accept()
+                threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            # Only remove our own socket, not one a later service bound at the same path
+            try:
+                current = os.stat(self.socket_path)
+                if (current.st_dev, current.st_ino) == (bound.st_dev, bound.st_ino):
+                    os.remove(self.socket_path)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared Vosk recognition service")
+    parser.add_argument('--socket', default=os.environ.get('VOSK_SERVICE_SOCKET', DEFAULT_SOCKET))
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model not found at {args.model}")
+        print("Run: python download_model.py")
+        return 1
+    try:
+        RecognitionService(args.model, args.socket).serve_forever()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\n👋 Recognition service stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Offline replay of labeled WAV files through a front end's voice pipeline
+
+Usage: python replay.py <wav_dir> [--target voice_control|voice_control_fixed|dashboard]
+                        [--realtime] [--json results.json]
+
+Each file is chunked, gated, decoded and parsed exactly as the chosen
+front end does it live, without a microphone or an Arduino. Labels come
+from labels.json or the file names (see wav_dataset.py); label the
+files that should produce no command with an empty string.
+
+Latency is measured from the end of the last recognized word to the
+moment the command is emitted. With --realtime, chunks are delivered at
+the rate a microphone would deliver them, so buffering delay is
+included. Otherwise audio is fed as fast as possible, and latency is
+taken from when the chunk holding that word was fed.
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+
+from latency import percentile
+from partial_dispatch import PartialStabilizer
+from recognition import create_recognizer
+from vad import VoiceActivityGate
+from wav_dataset import iter_chunks, load_labeled_wavs
+
+TARGETS = ['voice_control', 'voice_control_fixed', 'dashboard']
+
+
+class ReplayTarget:
+    """The pieces of a front end's pipeline that replay needs"""
+
+    def __init__(self, name, model, sample_rate, chunk, parse, grammar=None,
+                 use_vad=False, early_fire=False, stability=2, pending=None, poll_sleep=0.0):
+        self.name = name
+        self.model = model
+        self.sample_rate = sample_rate
+        self.chunk = chunk
+        self.poll_sleep = poll_sleep
+        self.parse = parse
+        self.grammar = grammar
+        self.use_vad = use_vad
+        self.early_fire = early_fire
+        self.stability = stability
+        self.pending = pending
+
+
+def load_target(name):
+    """Build a ReplayTarget from a front end's own configuration"""
+    if name == 'dashboard':
+        # The dashboard's voice side only: no PyAudio, no Dash app
+        import dashboard_voice as dashboard
+        dashboard.get_recognizer()
+        return ReplayTarget(
+            name, dashboard.model, dashboard.SAMPLE_RATE, dashboard.CHUNK,
+            dashboard.parse_voice_command, dashboard.grammar(), dashboard.USE_VAD,
+            poll_sleep=dashboard.PROFILE.sleep
+        )
+    vc = importlib.import_module(name).VoiceControl(open_devices=False)
+    matcher = getattr(vc, 'matcher', None)
+    return ReplayTarget(
+        name, vc.model, vc.SAMPLE_RATE, vc.CHUNK, vc.parse_command, vc.grammar,
+        vc.USE_VAD, vc.EARLY_FIRE, vc.PARTIAL_STABILITY,
+        matcher.has_pending_phrase if matcher else None,
+        vc.PROFILE.sleep
+    )
+
+
+def replay_utterance(target, pcm, realtime=False):
+    """Run one utterance through the pipeline and time the emitted commands"""
+    recognizer = create_recognizer(target.model, target.sample_rate, target.grammar, words=True)
+    stabilizer = None
+    if target.early_fire:
+        stabilizer = PartialStabilizer(target.parse, target.stability, target.pending)
+    vad = VoiceActivityGate(target.sample_rate, target.chunk) if target.use_vad else None
+
+    bytes_per_second = target.sample_rate * 2
+    chunk_seconds = target.chunk / target.sample_rate
+    segments = []       # (recognizer offset, file offset, length) of audio fed
+    fed_bytes = 0
+    file_offset = 0
+    arrivals = []       # wall time each chunk became available
+    emitted = []        # (command, emit time, source)
+    texts = []
+    speech_end = [None]
+
+    def file_time(recognizer_seconds):
+        """Map recognizer audio time to (file offset seconds, chunk index)"""
+        offset = recognizer_seconds * bytes_per_second
+        for rec_start, file_start, length in segments:
+            if rec_start <= offset <= rec_start + length:
+                position = file_start + (offset - rec_start)
+                return position / bytes_per_second, int(position // (target.chunk * 2))
+        return None, None
+
+    def on_final(result, now):
+        text = result.get("text", "").strip()
+        words = result.get("result") or []
+        if words:
+            seconds, index = file_time(words[-1]['end'])
+            if seconds is not None:
+                speech_end[0] = start + seconds if realtime else arrivals[min(index, len(arrivals) - 1)]
+        if stabilizer:
+            command, _ = stabilizer.final(text)
+        else:
+            command = target.parse(text) if text else None
+        if text:
+            texts.append(text)
+        if command is not None:
+            emitted.append((command, now, 'final'))
+
+    cpu_start = time.thread_time()
+    start = time.monotonic()
+    for index, data in enumerate(iter_chunks(pcm, target.chunk)):
+        if realtime:
+            if target.poll_sleep:
+                time.sleep(target.poll_sleep)
+            delay = start + (index + 1) * chunk_seconds - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        arrivals.append(time.monotonic())
+        fed = vad.gate(data) if vad else data
+        if fed:
+            segments.append((fed_bytes, file_offset + len(data) - len(fed), len(fed)))
+            fed_bytes += len(fed)
+        file_offset += len(data)
+        if not fed:
+            continue
+        if recognizer.AcceptWaveform(fed):
+            on_final(json.loads(recognizer.Result()), time.monotonic())
+        elif stabilizer:
+            partial = json.loads(recognizer.PartialResult()).get("partial", "").strip()
+            command = stabilizer.partial(partial)
+            if command is not None:
+                emitted.append((command, time.monotonic(), 'partial'))
+    on_final(json.loads(recognizer.FinalResult()), time.monotonic())
+    cpu = time.thread_time() - cpu_start
+
+    # The last command sent is the one the hand ends up acting on; an early
+    # command the final result replaced is a correction, not the answer
+    command = emitted[-1][0] if emitted else None
+    first = next((e for e in emitted if e[0] == command), None)
+    latency = None
+    if first:
+        reference = speech_end[0] if speech_end[0] is not None else arrivals[-1]
+        latency = first[1] - reference
+    return {
+        'text': " ".join(texts),
+        'command': command,
+        'latency': latency,
+        'early': first is not None and first[2] == 'partial',
+        'corrections': sum(1 for e in emitted if e[0] != command),
+        'cpu_seconds': cpu,
+        'audio_seconds': len(pcm) / bytes_per_second,
+    }
+
+
+def run_replay(target, samples, realtime=False, verbose=True):
+    """Replay every sample and summarize latency, accuracy and throughput"""
+    latencies = []
+    correct = 0
+    cpu = 0.0
+    audio = 0.0
+    utterances = []
+    wall_start = time.monotonic()
+    for filename, label, pcm in samples:
+        expected = target.parse(label) if label else None
+        r = replay_utterance(target, pcm, realtime)
+        ok = r['command'] == expected
+        correct += ok
+        cpu += r['cpu_seconds']
+        audio += r['audio_seconds']
+        if r['latency'] is not None:
+            latencies.append(r['latency'])
+        r.update(file=filename, label=label, expected=expected, correct=ok)
+        utterances.append(r)
+        if verbose:
+            mark = "✅" if ok else "❌"
+            latency = f"{r['latency'] * 1000:7.1f} ms" if r['latency'] is not None else "      - "
+            print(f"{mark} {filename:<30} {latency}  heard: {r['text']!r} -> {r['command']}")
+    wall = time.monotonic() - wall_start
+
+    return {
+        'target': target.name,
+        'chunk': target.chunk,
+        'realtime': realtime,
+        'utterances': len(samples),
+        'accuracy': correct / len(samples) if samples else 0.0,
+        'latency_ms': {
+            name: (value * 1000 if value is not None else None)
+            for name, value in (
+                ('p50', percentile(latencies, 50)),
+                ('p90', percentile(latencies, 90)),
+                ('p99', percentile(latencies, 99)),
+                ('max', max(latencies) if latencies else None),
+            )
+        },
+        'early_fired': sum(1 for r in utterances if r['early']),
+        'corrected': sum(1 for r in utterances if r['corrections']),
+        'audio_seconds': audio,
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'utterances_per_second': len(samples) / wall if wall else 0.0,
+        'speed_x_realtime': audio / wall if wall else 0.0,
+        'details': utterances,
+    }
+
+
+def print_summary(results):
+    """Human-readable summary of run_replay() output"""
+    lat = results['latency_ms']
+
+    def ms(value):
+        return f"{value:.1f} ms" if value is not None else "n/a"
+
+    print(f"\n📊 Replay: {results['target']} (chunk {results['chunk']}, "
+          f"{'real-time' if results['realtime'] else 'as fast as possible'})")
+    print("=" * 50)
+    print(f"Utterances:    {results['utterances']}")
+    print(f"Accuracy:      {results['accuracy']:.1%}")
+    print(f"Latency:       p50 {ms(lat['p50'])}, p90 {ms(lat['p90'])}, p99 {ms(lat['p99'])}")
+    print(f"Early fired:   {results['early_fired']}")
+    print(f"Corrected:     {results['corrected']} (an early command replaced by the final result)")
+    print(f"Throughput:    {results['utterances_per_second']:.2f} utt/s, "
+          f"{results['speed_x_realtime']:.1f}x real time")
+    print(f"Decode CPU:    {results['cpu_seconds']:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay labeled WAV files through a front end")
+    parser.add_argument('wav_dir')
+    parser.add_argument('--target', choices=TARGETS, default='voice_control')
+    parser.add_argument('--realtime', action='store_true', help="pace chunks like a live microphone")
+    parser.add_argument('--json', help="write full results to this file")
+    args = parser.parse_args()
+
+    target = load_target(args.target)
+    samples = load_labeled_wavs(args.wav_dir, target.sample_rate)
+    if not samples:
+        print("❌ No usable WAV files found")
+        return 1
+
+    results = run_replay(target, samples, args.realtime)
+    print_summary(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""Long-lived Arduino connections: handshake readiness, no-reset reopen, auto-reconnect
+
+Opening a USB serial port normally pulses DTR, which resets an Uno/Nano,
+and the senders used to sleep(2) through the bootloader. Here readiness
+is detected by repeating the HELLO probe until the sketch answers. With
+suppress_reset the port is opened with DTR held low and HUPCL cleared
+(POSIX), so later opens of the same port no longer reset the board.
+
+open_connection() keeps one SerialConnection per port for the whole
+process, so a dashboard reconnect to the same port is instant. If the
+port disappears (USB glitch, cable pulled) the connection reopens it in
+the background with exponential backoff.
+
+Links always open at the base baud rate. With max_baud above it, a
+sketch that speaks the binary protocol is switched to the fastest rate
+both ends support that passes an echo test (serial_protocol.negotiate_baud).
+A board that resets while the port stays open (e.g. a servo brownout)
+comes back at the base rate and stops acking, so a negotiated link that
+stalls goes through the reconnect path: HELLO at the base rate, then a
+fresh negotiation.
+
+Each connection keeps a PositionCache of what the board has confirmed.
+It is seeded from a STATUS query once the sketch answers, and emptied
+when the port is lost, since the board may have reset meanwhile.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+import serial
+
+from position_cache import PositionCache
+from serial_protocol import AsciiCodec, negotiate_baud, probe, read_positions
+from serial_transport import SerialTransport
+
+try:
+    import termios
+except ImportError:  # Windows: DTR is controlled through pyserial only
+    termios = None
+
+
+def disable_hupcl(ser):
+    """Keep DTR asserted when the port is closed, so the next open doesn't reset the board"""
+    if termios is None or not hasattr(ser, 'fileno'):
+        return False
+    try:
+        attrs = termios.tcgetattr(ser.fileno())
+        attrs[2] &= ~termios.HUPCL
+        termios.tcsetattr(ser.fileno(), termios.TCSANOW, attrs)
+        return True
+    except (OSError, termios.error):
+        return False
+
+
+class SerialConnection:
+    """One Arduino port, kept open and ready, reconnected after failures"""
+
+    def __init__(self, port, baud, suppress_reset=False, ready_timeout=3.0,
+                 probe_timeout=0.25, max_backoff=8.0, transport_options=None, max_baud=None,
+                 text_only=False):
+        self.port = port
+        self.baud = baud                     # rate every session starts at
+        self.max_baud = max_baud or baud     # fastest rate to negotiate up to
+        self.link_baud = baud                # rate currently in use
+        self.suppress_reset = suppress_reset
+        self.text_only = text_only           # send text lines even to a binary-capable sketch
+        self.ready_timeout = ready_timeout
+        self.probe_timeout = probe_timeout
+        self.max_backoff = max_backoff
+        self.transport_options = transport_options or {}
+        self.ser = None
+        self.codec = None
+        self.transport = None
+        self.positions = PositionCache()
+        self.state = 'closed'  # closed -> connecting -> ready -> reconnecting -> ready ...
+        self.lock = threading.Lock()
+        self.reconnects = 0
+        self.ready_seconds = None  # time from open() to the first handshake answer
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def open_port(self):
+        ser = serial.Serial()
+        ser.port = self.port
+        ser.baudrate = self.baud
+        ser.timeout = 1
+        if self.suppress_reset:
+            ser.dtr = False  # applied as the port opens (prevents the reset on Windows)
+        ser.open()
+        if self.suppress_reset:
+            disable_hupcl(ser)
+        return ser
+
+    def wait_ready(self, ser):
+        """Probe until the sketch answers; the codec it speaks (ASCII if it never does)"""
+        # A board that didn't reset (e.g. a USB glitch) may still be at the negotiated rate
+        rates = [self.baud] if self.link_baud == self.baud else [self.baud, self.link_baud]
+        deadline = time.monotonic() + self.ready_timeout
+        attempt = 0
+        while time.monotonic() < deadline:
+            ser.baudrate = rates[attempt % len(rates)]
+            attempt += 1
+            codec = probe(ser, self.probe_timeout)
+            if codec:
+                return codec
+        ser.baudrate = self.baud
+        print(f"⚠️  No handshake from {self.port} after {self.ready_timeout:.1f}s, assuming a text-only sketch")
+        ser.reset_input_buffer()
+        return AsciiCodec()
+
+    def open(self):
+        """Open the port and wait for the sketch; raises serial.SerialException on failure"""
+        self.state = 'connecting'
+        start = time.monotonic()
+        try:
+            self.attach(self.open_port())
+        except Exception:
+            self.state = 'closed'
+            raise
+        self.ready_seconds = time.monotonic() - start
+        return self
+
+    def attach(self, ser):
+        """Start a transport on ser; False if close() was called meanwhile (ser is closed)"""
+        try:
+            codec = self.wait_ready(ser)
+            if self.text_only:
+                codec = AsciiCodec()
+            link_baud = negotiate_baud(ser, codec, self.max_baud)
+            status = read_positions(ser, codec)
+        except Exception:
+            ser.close()
+            raise
+        with self.lock:
+            if self.state == 'closed':  # close() was called while we were connecting
+                ser.close()
+                return False
+            if status:
+                self.positions.report(*status)
+            transport = SerialTransport(ser, codec, on_error=self.on_port_error, positions=self.positions,
+                                        on_stall=self.on_link_stall, **self.transport_options)
+            self.ser, self.codec, self.transport = ser, codec, transport.start()
+            self.link_baud = link_baud
+            self.state = 'ready'
+        return True
+
+    def submit(self, command, **kwargs):
+        """Send through the current transport (fails fast while reconnecting)"""
+        transport = self.transport
+        if not self.ready or transport is None:
+            return transport_unavailable(self.state)
+        return transport.submit(command, **kwargs)
+
+    def send(self, command, **kwargs):
+        return self.submit(command, **kwargs).result()
+
+    def on_port_error(self, error):
+        """Called by the transport's reader thread when the port fails"""
+        self.start_reconnect(f"Lost {self.port} ({error})")
+
+    def on_link_stall(self, error):
+        """Called by the transport's reader thread when acks stop coming"""
+        if self.link_baud == self.baud:
+            return  # nothing negotiated; a reset board still answers at this rate
+        self.start_reconnect(f"{self.port} stopped answering at {self.link_baud} baud (board reset?)")
+
+    def start_reconnect(self, reason):
+        with self.lock:
+            if self.state != 'ready':
+                return
+            self.state = 'reconnecting'
+        print(f"⚠️  {reason}; reconnecting...")
+        threading.Thread(target=self.reconnect, daemon=True).start()
+
+    def reconnect(self):
+        self.release_port()
+        self.positions.clear()  # re-read once the board answers again
+        delay = 0.25
+        while self.state == 'reconnecting':
+            try:
+                if self.attach(self.open_port()):
+                    self.reconnects += 1
+                    print(f"✅ Reconnected to {self.port} ({self.codec.name} protocol)")
+                return
+            except Exception:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def release_port(self):
+        with self.lock:
+            transport, ser = self.transport, self.ser
+            self.transport = self.ser = None
+        if transport:
+            transport.stop()
+        if ser:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+    def close(self):
+        with self.lock:
+            self.state = 'closed'
+        self.release_port()
+        with _registry_lock:
+            if _connections.get(self.port) is self:
+                del _connections[self.port]
+
+    def stats(self):
+        stats = self.transport.stats() if self.transport else {}
+        stats.update({'port': self.port, 'state': self.state, 'reconnects': self.reconnects,
+                      'baud': self.link_baud, 'positions': self.positions.snapshot(),
+                      'ready_seconds': self.ready_seconds})
+        return stats
+
+
+def transport_unavailable(state):
+    future = Future()
+    future.set_exception(ConnectionError(f"Arduino not ready ({state})"))
+    return future
+
+
+_connections = {}
+_registry_lock = threading.Lock()
+
+
+def open_connection(port, baud, **options):
+    """Shared connection for port, reusing one that is already open with the same settings"""
+    with _registry_lock:
+        connection = _connections.get(port)
+        if (connection and connection.state != 'closed' and connection.baud == baud
+                and connection.max_baud == (options.get('max_baud') or baud)):
+            return connection
+    if connection:
+        connection.close()
+    connection = SerialConnection(port, baud, **options).open()
+    with _registry_lock:
+        _connections[port] = connection
+    return connection
+
+
+def close_all():
+    for connection in list(_connections.values()):
+        connection.close()
@@ -0,0 +1,394 @@
+"""Host side of the servo serial protocol, shared by every sender
+
+Binary frames (firmware protocol version 1 and later):
+
+    0xA5 | cmd | seq | len | payload[len] | crc8(cmd, seq, len, payload)
+
+The device answers each request with a short ack frame whose cmd is
+the request's cmd | 0x80. The first payload byte is a status code,
+followed by command-specific data.
+
+From protocol version 2 the device also reports where its servos are:
+CMD_STATUS returns every servo's position, and the same payload is sent
+unprompted (seq 0, no ack flag) when slewing servos come to rest.
+
+Older sketches only understand text lines ("open", "90", ...). negotiate()
+sends a HELLO frame, and if no binary ack comes back it falls back to
+AsciiCodec, which writes exactly the lines the senders always used.
+"""
+import re
+import time
+
+START = 0xA5
+PROTOCOL_VERSION = 2
+
+CMD_HELLO = 0x01    # payload: [host version] -> ack: [status, firmware version, baud mask]
+CMD_MOVE = 0x02     # payload: [servo, angle] -> ack: [status, servo, angle]
+CMD_POSE = 0x03     # payload: [servo, angle] * n -> ack: [status, n]
+CMD_BAUD = 0x04     # payload: [rate index] -> ack: [status, rate index], then both ends switch
+CMD_ECHO = 0x05     # payload: bytes -> ack: [status, bytes]
+CMD_STATUS = 0x06   # payload: [] -> ack: [status, n, moving mask, angle * n] (protocol v2)
+ACK_FLAG = 0x80
+
+STATUS_OK = 0
+STATUS_BAD_SERVO = 1
+STATUS_BAD_ANGLE = 2
+STATUS_UNKNOWN = 3
+
+# Rates a sketch may advertise in the HELLO ack's baud mask (bit i = BAUD_RATES[i]).
+# Every link starts at BAUD_RATES[0].
+BAUD_RATES = [9600, 19200, 38400, 57600, 115200]
+# Mixes every bit pattern that tends to fail on a marginal link, plus the frame start
+ECHO_PATTERN = bytes((0x55, 0xAA, 0x00, 0xFF, 0xA5, 0x0A, 0x0D, 0x7E))
+BAUD_CONFIRM_SECONDS = 1.0  # firmware reverts to 9600 if nothing valid arrives in time
+
+MAX_PAYLOAD = 16  # firmware receive buffer, i.e. up to 8 joints per POSE frame
+
+# Named positions understood by servo_control.ino
+NAMED_ANGLES = {'open': 0, 'close': 90, 'shut': 90}
+
+# Lines in which the text sketches say where their servo went:
+# "Moving to 90°", "Servo: Opened to 0°" (servo_control.ino),
+# "Opened (0 degrees)", "Servo initialized to CLOSED position (180 degrees)" (voice.ino)
+TEXT_POSITION = re.compile(r"(?:moving to|opened to|closed to) (\d+)°|\((\d+) degrees\)", re.IGNORECASE)
+# servo_control.ino echoes each text command, then prints progress lines
+# before the one that ends it ("Servo: Opened to 0°", "Unknown command...")
+TEXT_ECHO = re.compile(r"^Received command:\s*(.*)$", re.IGNORECASE)
+TEXT_PROGRESS = re.compile(r"^(?:Opening servo|Closing servo|Moving to )", re.IGNORECASE)
+
+
+def _crc8_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+
+CRC8_TABLE = _crc8_table()
+
+
+def crc8(data):
+    """CRC-8 (polynomial 0x07, init 0), matching crc8() in the sketch"""
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_frame(cmd, seq, payload=b''):
+    body = bytes((cmd, seq & 0xFF, len(payload))) + bytes(payload)
+    return bytes((START,)) + body + bytes((crc8(body),))
+
+
+def to_angle(command):
+    """Angle for a host command: an int, '90', 'open'/'close', or 'set 90'"""
+    if isinstance(command, int):
+        return command
+    text = str(command).strip().lower()
+    if text in NAMED_ANGLES:
+        return NAMED_ANGLES[text]
+    if text.startswith('set '):
+        text = text[4:].strip()
+    if text.isdigit():
+        return int(text)
+    return None
+
+
+class Frame:
+    def __init__(self, cmd, seq, payload):
+        self.cmd = cmd
+        self.seq = seq
+        self.payload = payload
+
+    @property
+    def is_ack(self):
+        return bool(self.cmd & ACK_FLAG)
+
+    @property
+    def request(self):
+        return self.cmd & ~ACK_FLAG
+
+    @property
+    def status(self):
+        return self.payload[0] if self.payload else None
+
+    def __repr__(self):
+        return f"Frame(cmd=0x{self.cmd:02X}, seq={self.seq}, payload={bytes(self.payload).hex()})"
+
+
+class FrameDecoder:
+    """Incremental parser for a byte stream mixing frames and text lines"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.text = bytearray()
+        self.crc_errors = 0
+
+    def feed(self, data):
+        """Consume bytes; return (frames, text_lines) completed so far"""
+        self.buffer += data
+        frames, lines = [], []
+        while self.buffer:
+            if self.buffer[0] != START:
+                byte = self.buffer.pop(0)
+                if byte == ord('\n'):
+                    line = self.text.decode('utf-8', errors='replace').strip()
+                    self.text.clear()
+                    if line:
+                        lines.append(line)
+                else:
+                    self.text.append(byte)
+                continue
+            if len(self.buffer) < 4:
+                break
+            size = 5 + self.buffer[3]
+            if len(self.buffer) < size:
+                break
+            body = bytes(self.buffer[1:size - 1])
+            if crc8(body) != self.buffer[size - 1]:
+                # Not a real frame start (or corrupted): skip the start byte and resync
+                self.crc_errors += 1
+                del self.buffer[0]
+                continue
+            frames.append(Frame(body[0], body[1], body[3:]))
+            del self.buffer[:size]
+        return frames, lines
+
+
+class AsciiCodec:
+    """Text lines, as understood by every existing sketch"""
+
+    name = 'ascii'
+    version = 0
+
+    def encode(self, command, servo=0, seq=0):
+        if isinstance(command, dict):
+            # Text sketches drive a single servo, so a pose can only carry that joint
+            if len(command) != 1:
+                raise ValueError("Text firmware takes one joint per command")
+            command = next(iter(command.values()))
+        return f"{command}\n".encode('utf-8')
+
+    def read_reply(self, ser):
+        """Read the device's reply line"""
+        return ser.readline().decode('utf-8', errors='replace').strip()
+
+
+class BinaryCodec:
+    """Framed binary commands with CRC and short acks"""
+
+    name = 'binary'
+
+    def __init__(self, version=PROTOCOL_VERSION, baud_mask=0x01):
+        self.version = version
+        self.baud_mask = baud_mask
+        self.seq = 0
+        self.decoder = FrameDecoder()
+
+    def next_seq(self):
+        self.seq = (self.seq + 1) & 0xFF
+        return self.seq
+
+    def encode(self, command, servo=0, seq=None):
+        """MOVE frame for one angle, or a POSE frame for a {servo: angle} dict"""
+        if isinstance(command, dict):
+            return self.encode_pose(command, seq)
+        angle = to_angle(command)
+        if angle is None or not 0 <= angle <= 180:
+            raise ValueError(f"Cannot encode command {command!r} as a servo angle")
+        return encode_frame(CMD_MOVE, self.next_seq() if seq is None else seq, bytes((servo, angle)))
+
+    def encode_pose(self, joints, seq=None):
+        payload = bytearray()
+        for servo, angle in sorted(joints.items()):
+            if not 0 <= angle <= 180:
+                raise ValueError(f"Angle {angle} for servo {servo} is out of range")
+            payload += bytes((servo, angle))
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError(f"At most {MAX_PAYLOAD // 2} joints fit in one pose frame")
+        return encode_frame(CMD_POSE, self.next_seq() if seq is None else seq, bytes(payload))
+
+    def read_reply(self, ser):
+        """Read until an ack frame arrives (or the port's read timeout expires)"""
+        while True:
+            data = ser.read(max(1, ser.in_waiting))
+            if not data:
+                return ""
+            frames, _ = self.decoder.feed(data)
+            for frame in frames:
+                if frame.is_ack:
+                    return describe_ack(frame)
+
+
+def describe_ack(frame):
+    """Human-readable ack text for logs and the dashboard history"""
+    status = {STATUS_OK: 'ok', STATUS_BAD_SERVO: 'bad servo',
+              STATUS_BAD_ANGLE: 'bad angle', STATUS_UNKNOWN: 'unknown command'}.get(frame.status, 'error')
+    if frame.request == CMD_MOVE and len(frame.payload) >= 3:
+        return f"servo {frame.payload[1]} at {frame.payload[2]}° ({status})"
+    if frame.request == CMD_POSE and len(frame.payload) >= 2:
+        return f"pose of {frame.payload[1]} joints ({status})"
+    if frame.request == CMD_STATUS and len(frame.payload) >= 3:
+        return f"{frame.payload[1]} servos at {list(frame.payload[3:])} ({status})"
+    if frame.request == CMD_HELLO and len(frame.payload) >= 2:
+        return f"firmware protocol v{frame.payload[1]} ({status})"
+    return status
+
+
+def frame_positions(frame, command=None):
+    """{servo: angle} confirmed by a frame, and the set of servos still moving.
+
+    MOVE acks echo the target; a POSE ack only counts joints, so the
+    targets come from the pose that was sent (command).
+    """
+    if frame.status != STATUS_OK:
+        return {}, set()
+    if frame.request == CMD_STATUS and len(frame.payload) >= 3:
+        angles = dict(enumerate(frame.payload[3:3 + frame.payload[1]]))
+        return angles, {servo for servo in angles if frame.payload[2] & (1 << servo)}
+    if frame.request == CMD_MOVE and frame.is_ack and len(frame.payload) >= 3:
+        return {frame.payload[1]: frame.payload[2]}, set()
+    if frame.request == CMD_POSE and frame.is_ack and isinstance(command, dict):
+        return dict(command), set()
+    return {}, set()
+
+
+def text_echo(line):
+    """Command a text sketch says it received in line, or None"""
+    match = TEXT_ECHO.match(line)
+    return match.group(1).strip() if match else None
+
+
+def is_text_progress(line):
+    """True for a line a text sketch prints while still working on a command"""
+    return TEXT_PROGRESS.match(line) is not None
+
+
+def text_position(line):
+    """Angle a text sketch reports in line (its single servo), or None"""
+    match = TEXT_POSITION.search(line)
+    if not match:
+        return None
+    return int(match.group(1) or match.group(2))
+
+
+def probe(ser, timeout=0.3):
+    """Send one HELLO; return the codec the firmware answered with, or None if it was silent.
+
+    The HELLO frame is followed by a newline so text-only sketches treat it
+    as one unknown line and answer straight away ("Unknown command...");
+    such a reply ends the probe early instead of waiting for the timeout.
+    """
+    decoder = FrameDecoder()
+    saved_timeout = ser.timeout
+    ser.timeout = min(0.05, timeout)
+    try:
+        ser.write(encode_frame(CMD_HELLO, 0, bytes((PROTOCOL_VERSION,))) + b"\n")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data = ser.read(max(1, ser.in_waiting))
+            if not data:
+                continue
+            frames, lines = decoder.feed(data)
+            for frame in frames:
+                if frame.request == CMD_HELLO and frame.is_ack and frame.status == STATUS_OK:
+                    baud_mask = frame.payload[2] if len(frame.payload) > 2 else 0x01
+                    return BinaryCodec(min(frame.payload[1], PROTOCOL_VERSION), baud_mask)
+            if any('command' in line.lower() for line in lines):
+                time.sleep(timeout)  # let the rest of the text reply arrive
+                ser.reset_input_buffer()
+                return AsciiCodec()
+        return None
+    finally:
+        ser.timeout = saved_timeout
+
+
+def negotiate(ser, timeout=0.3, attempts=1):
+    """Pick the codec the firmware supports, falling back to ASCII"""
+    for _ in range(attempts):
+        codec = probe(ser, timeout)
+        if codec:
+            return codec
+    ser.reset_input_buffer()  # drop anything a text-only sketch printed
+    return AsciiCodec()
+
+
+def exchange(ser, codec, cmd, payload=b'', timeout=0.3):
+    """Send one request frame and wait for its ack; the ack Frame or None"""
+    seq = codec.next_seq()
+    decoder = FrameDecoder()
+    saved_timeout = ser.timeout
+    ser.timeout = min(0.05, timeout)
+    try:
+        ser.write(encode_frame(cmd, seq, payload))
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data = ser.read(max(1, ser.in_waiting))
+            if not data:
+                continue
+            frames, _ = decoder.feed(data)
+            for frame in frames:
+                if frame.is_ack and frame.request == cmd and frame.seq == seq:
+                    return frame
+        return None
+    finally:
+        ser.timeout = saved_timeout
+
+
+def read_positions(ser, codec, timeout=0.3):
+    """Ask a protocol v2 sketch where its servos are: ({servo: angle}, moving) or None"""
+    if codec.name != 'binary' or codec.version < 2:
+        return None
+    frame = exchange(ser, codec, CMD_STATUS, timeout=timeout)
+    if not frame or frame.status != STATUS_OK:
+        return None
+    return frame_positions(frame)
+
+
+def supported_rates(codec, max_baud):
+    """Rates both ends can use, fastest first"""
+    rates = [rate for i, rate in enumerate(BAUD_RATES) if codec.baud_mask & (1 << i)]
+    return sorted((rate for rate in rates if rate <= max_baud), reverse=True)
+
+
+def echo_ok(ser, codec, attempts=2):
+    for _ in range(attempts):
+        frame = exchange(ser, codec, CMD_ECHO, ECHO_PATTERN)
+        if frame and frame.status == STATUS_OK and bytes(frame.payload[1:]) == ECHO_PATTERN:
+            return True
+    return False
+
+
+def switch_baud(ser, codec, rate):
+    """Move both ends to rate and verify it with an echo test; False (and back at the old rate) on failure"""
+    old_rate = ser.baudrate
+    frame = exchange(ser, codec, CMD_BAUD, bytes((BAUD_RATES.index(rate),)))
+    if not frame or frame.status != STATUS_OK:
+        return False
+    ser.baudrate = rate
+    if echo_ok(ser, codec):
+        return True
+    # The firmware may have heard the echo (and kept the new rate) even though
+    # its reply didn't get through: ask it to switch back before we do
+    ser.write(encode_frame(CMD_BAUD, codec.next_seq(), bytes((BAUD_RATES.index(old_rate),))))
+    ser.flush()
+    ser.baudrate = old_rate
+    time.sleep(BAUD_CONFIRM_SECONDS + 0.1)  # let the firmware give up on the new rate too
+    ser.reset_input_buffer()
+    return False
+
+
+def negotiate_baud(ser, codec, max_baud):
+    """Raise the link to the fastest rate that passes the echo test; returns the rate in use"""
+    if codec.name != 'binary' or ser.baudrate not in BAUD_RATES:
+        return ser.baudrate
+    for rate in supported_rates(codec, max_baud):
+        if rate <= ser.baudrate:
+            break
+        if switch_baud(ser, codec, rate):
+            return rate
+        print(f"⚠️  {rate} baud failed the echo test, trying a lower rate")
+    return ser.baudrate
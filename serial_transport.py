@@ -0,0 +1,312 @@
+"""Non-blocking serial transport: a reader thread resolves per-command futures
+
+Senders call submit() and get a concurrent.futures.Future that completes
+with the device's reply (or TimeoutError once the retries are used up).
+Several commands can be in flight at once, so the command rate is no
+longer capped at one per round trip.
+
+Binary acks carry the request's sequence number and are matched exactly.
+The firmware handles frames in order, so an ack also means every frame
+written before it that is still unacknowledged was lost (it is resent at
+once), and every frame written after it is queued behind a slow command
+(its deadline is extended). Text replies are not tagged, so in text mode
+only one command is in flight at a time and it completes on the first
+line that ends a command; echo and progress lines are skipped. Once the
+sketch is seen to echo commands, replies are only taken after the echo of
+the pending command, so the tail of a command that timed out is dropped
+rather than taken as the next one's reply.
+
+After stall_after acks in a row time out, on_stall is called: the device
+has stopped answering altogether (e.g. it reset and fell back to the base
+baud rate), which the connection can recover from.
+
+With a PositionCache, every position the device confirms (acks, STATUS
+reports, the text sketches' "Moving to 90°" lines) is recorded there
+before the command's future completes.
+"""
+import asyncio
+import collections
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from serial_protocol import (CMD_STATUS, FrameDecoder, describe_ack, frame_positions, is_text_progress,
+                             text_echo, text_position)
+
+
+class Pending:
+    def __init__(self, key, command, data, future, timeout, retries):
+        self.key = key
+        self.command = command
+        self.data = data
+        self.future = future
+        self.timeout = timeout
+        self.retries = retries
+        self.first_sent = None
+        self.deadline = None
+        self.order = None  # write order of the latest attempt
+        self.attempts = 0
+        self.echoed = False  # text mode: the sketch echoed this command back
+
+
+class SerialTransport:
+    """Pipelined sends over one open serial port, acks read on a background thread"""
+
+    def __init__(self, ser, codec, max_in_flight=4, timeout=1.0, retries=1, poll=0.02, on_error=None,
+                 positions=None, on_stall=None, stall_after=2):
+        self.ser = ser
+        self.codec = codec
+        self.binary = codec.name == 'binary'
+        self.max_in_flight = max_in_flight if self.binary else 1
+        self.timeout = timeout
+        self.retries = retries
+        self.poll = poll
+        self.on_error = on_error  # called from the reader thread when the port fails
+        self.on_stall = on_stall  # called from the reader thread when acks stop coming
+        self.stall_after = stall_after
+        self.timeouts_in_a_row = 0
+        self.positions = positions  # PositionCache updated from what the device reports
+        self.decoder = FrameDecoder()
+        self.slots = threading.BoundedSemaphore(self.max_in_flight)
+        self.pending = collections.OrderedDict()
+        self.keys = itertools.count()
+        self.orders = itertools.count()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.lines = collections.deque(maxlen=50)  # text the device printed unprompted
+        self.echoes = False  # text mode: the sketch echoes each command it receives
+        self.thread = None
+        self.running = False
+        self.saved_timeout = None
+        self.counters = collections.Counter()
+        self.rtts = collections.deque(maxlen=500)
+
+    def start(self):
+        self.saved_timeout = self.ser.timeout
+        self.ser.timeout = self.poll
+        self.running = True
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the reader and fail whatever is still waiting for an ack"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.thread = None
+        self.fail_all(ConnectionError("Serial transport stopped"))
+        try:
+            if self.ser.is_open:
+                self.ser.timeout = self.saved_timeout
+        except Exception:
+            pass  # the port may already be gone
+
+    def submit(self, command, timeout=None, retries=None):
+        """Send command without waiting for its ack; returns a Future.
+
+        Blocks only while max_in_flight commands are already unacknowledged.
+        """
+        future = Future()
+        if not self.running:
+            future.set_exception(ConnectionError("Serial transport is not running"))
+            return future
+        self.slots.acquire()
+        try:
+            if self.binary:
+                key = self.codec.next_seq()
+                data = self.codec.encode(command, seq=key)
+            else:
+                key = next(self.keys)
+                data = self.codec.encode(command)
+        except Exception as e:
+            self.slots.release()
+            future.set_exception(e)
+            return future
+        entry = Pending(key, command, data, future,
+                        self.timeout if timeout is None else timeout,
+                        self.retries if retries is None else retries)
+        with self.lock:
+            self.pending[key] = entry
+        try:
+            self.write(entry)
+        except Exception as e:
+            self.finish(key, error=e)
+        return future
+
+    def send(self, command, timeout=None, retries=None):
+        """Send command and wait for its reply"""
+        future = self.submit(command, timeout, retries)
+        return future.result()
+
+    async def send_async(self, command, timeout=None, retries=None):
+        """asyncio version of send()"""
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self.submit, command, timeout, retries)
+        return await asyncio.wrap_future(future)
+
+    def write(self, entry):
+        now = time.monotonic()
+        if entry.first_sent is None:
+            entry.first_sent = now
+            self.counters['sent'] += 1
+        entry.deadline = now + entry.timeout
+        with self.write_lock:
+            entry.order = next(self.orders)
+            entry.attempts += 1
+            self.ser.write(entry.data)
+            self.counters['bytes_out'] += len(entry.data)
+
+    def read_loop(self):
+        while self.running:
+            try:
+                data = self.ser.read(max(1, self.ser.in_waiting))
+            except Exception as e:
+                print(f"❌ Serial read failed: {e}")
+                self.running = False
+                self.fail_all(e)
+                if self.on_error:
+                    self.on_error(e)
+                break
+            if data:
+                self.counters['bytes_in'] += len(data)
+                self.handle(data)
+            self.expire()
+
+    def handle(self, data):
+        frames, lines = self.decoder.feed(data)
+        for frame in frames:
+            if frame.is_ack:
+                self.finish(frame.seq, reply=describe_ack(frame), frame=frame)
+            elif frame.request == CMD_STATUS and self.positions is not None:
+                angles, moving = frame_positions(frame)  # servos came to rest
+                self.positions.report(angles, moving)
+        for line in lines:
+            angle = text_position(line)
+            if angle is not None and self.positions is not None:
+                self.positions.confirm({0: angle})
+            if not self.binary and self.text_reply(line):
+                continue
+            self.counters['unsolicited'] += 1
+            self.lines.append(line)
+
+    def text_reply(self, line):
+        """Match a text line to the pending command; False if it is not part of its reply"""
+        with self.lock:
+            entry = next(iter(self.pending.values()), None)
+        echoed = text_echo(line)
+        if echoed is not None:
+            self.echoes = True
+            if entry and echoed == entry.data.decode('utf-8', errors='replace').strip():
+                entry.echoed = True
+                return True
+            return False  # an older command's echo
+        if entry is None or (self.echoes and not entry.echoed):
+            return False  # nothing waiting, or the tail of an earlier command
+        if is_text_progress(line):
+            return True
+        self.finish(entry.key, reply=line)
+        return True
+
+    def finish(self, key, reply=None, error=None, frame=None):
+        with self.lock:
+            entry = self.pending.pop(key, None)
+        if entry is None:
+            self.counters['stale_acks'] += 1  # e.g. the ack of an attempt we already retried
+            return
+        self.slots.release()
+        if error is not None:
+            self.counters['timeouts' if isinstance(error, TimeoutError) else 'failed'] += 1
+            entry.future.set_exception(error)
+            if isinstance(error, TimeoutError):
+                self.timed_out(error)
+            return
+        self.timeouts_in_a_row = 0
+        self.counters['acked'] += 1
+        self.rtts.append(time.monotonic() - entry.first_sent)
+        if self.binary:
+            self.progress(entry)
+        if frame is not None and self.positions is not None:
+            angles, moving = frame_positions(frame, entry.command)
+            if frame.request == CMD_STATUS:
+                self.positions.report(angles, moving)
+            elif angles:
+                self.positions.confirm(angles)
+        entry.future.set_result(reply)
+
+    def timed_out(self, error):
+        self.timeouts_in_a_row += 1
+        if self.timeouts_in_a_row >= self.stall_after and self.on_stall:
+            self.timeouts_in_a_row = 0
+            self.counters['stalls'] += 1
+            self.on_stall(error)
+
+    def progress(self, acked):
+        """Use the firmware's in-order handling to spot losses and slow commands early"""
+        now = time.monotonic()
+        with self.lock:
+            written = [entry for entry in self.pending.values() if entry.order is not None]
+            # A resent frame's ack may answer an earlier attempt, so it proves nothing was lost
+            lost = [] if acked.attempts > 1 else [entry for entry in written
+                                                  if entry.order < acked.order and entry.attempts == 1]
+            for entry in written:
+                if entry.order > acked.order:
+                    entry.deadline = max(entry.deadline, now + entry.timeout)
+        # One early resend per command, on top of its retries: it goes out while the
+        # line is busy, so it is likelier to be hit by the same burst of errors
+        for entry in lost:
+            self.counters['fast_retries'] += 1
+            try:
+                self.write(entry)
+            except Exception as e:
+                self.finish(entry.key, error=e)
+
+    def expire(self):
+        """Resend or fail commands whose ack is overdue"""
+        now = time.monotonic()
+        with self.lock:
+            overdue = [entry for entry in self.pending.values() if entry.deadline and entry.deadline < now]
+        for entry in overdue:
+            self.retry(entry)
+
+    def retry(self, entry):
+        """Resend entry, or fail it once its retries are used up"""
+        if entry.retries > 0:
+            entry.retries -= 1
+            self.counters['retries'] += 1
+            try:
+                self.write(entry)
+            except Exception as e:
+                self.finish(entry.key, error=e)
+        else:
+            self.finish(entry.key, error=TimeoutError(f"No ack for {entry.command!r}"))
+
+    def fail_all(self, error):
+        with self.lock:
+            keys = list(self.pending)
+        for key in keys:
+            self.finish(key, error=error)
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.pending)
+
+    def stats(self):
+        rtts = sorted(self.rtts)
+        return {
+            'protocol': self.codec.name,
+            'max_in_flight': self.max_in_flight,
+            'sent': self.counters['sent'],
+            'acked': self.counters['acked'],
+            'retries': self.counters['retries'],
+            'fast_retries': self.counters['fast_retries'],
+            'timeouts': self.counters['timeouts'],
+            'stalls': self.counters['stalls'],
+            'failed': self.counters['failed'],
+            'unsolicited_lines': self.counters['unsolicited'],
+            'bytes_sent': self.counters['bytes_out'],
+            'bytes_received': self.counters['bytes_in'],
+            'rtt_ms_mean': sum(rtts) / len(rtts) * 1000 if rtts else None,
+            'rtt_ms_max': rtts[-1] * 1000 if rtts else None,
+        }
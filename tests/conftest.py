@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def board():
+    """Start VirtualArduino boards on ptys; all of them are stopped after the test"""
+    virtual_arduino = pytest.importorskip('virtual_arduino')
+    if virtual_arduino.pty is None:
+        pytest.skip("the virtual Arduino needs a POSIX pseudo-terminal")
+    devices = []
+
+    def start(**options):
+        options.setdefault('boot_time', 0.2)
+        device = virtual_arduino.VirtualArduino(**options).start()
+        devices.append(device)
+        return device
+
+    yield start
+    for device in devices:
+        device.stop()
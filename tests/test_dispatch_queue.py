@@ -0,0 +1,54 @@
+import queue
+
+import pytest
+
+from dispatch_queue import CoalescingQueue
+
+
+def test_newer_move_replaces_a_waiting_one():
+    commands = CoalescingQueue()
+    commands.put(0, 'a')
+    commands.put(90, 'b')
+    assert commands.get(timeout=0) == (90, 'b')
+    assert commands.stats()['merged'] == 1
+    with pytest.raises(queue.Empty):
+        commands.get(timeout=0)
+
+
+def test_actuators_keep_their_own_slot():
+    commands = CoalescingQueue()
+    commands.put(0, actuator=0)
+    commands.put(45, actuator=1)
+    assert [commands.get(timeout=0)[0] for _ in range(2)] == [0, 45]
+
+
+def test_move_to_the_unacked_target_is_dropped_until_forgotten():
+    commands = CoalescingQueue()
+    commands.put('open')
+    commands.get(timeout=0)
+    commands.put('open')
+    assert commands.empty()
+    assert commands.stats()['duplicates'] == 1
+    commands.forget(command='close')  # not the latest move: still tracked
+    commands.put('open')
+    assert commands.empty()
+    commands.forget(command='open')
+    commands.put('open')
+    assert commands.get(timeout=0)[0] == 'open'
+
+
+def test_confirmed_target_deduplicates():
+    commands = CoalescingQueue(current=lambda actuator: 90)
+    commands.put(90)
+    assert commands.empty()
+    assert commands.target(0) == 90
+
+
+def test_priority_command_clears_pending_moves():
+    commands = CoalescingQueue()
+    commands.put(0, actuator=0)
+    commands.put(45, actuator=1)
+    commands.put('stop')
+    assert commands.get(timeout=0)[0] == 'stop'
+    assert commands.empty()
+    assert commands.stats()['cleared'] == 2
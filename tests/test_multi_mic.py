@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+pytest.importorskip('pyaudio')
+pytest.importorskip('vosk')
+
+from multi_mic import HypothesisFuser, confidence
+
+
+def collect():
+    results = []
+    done = threading.Event()
+
+    def on_result(text, device, score, captured, recognized):
+        results.append((text, device, score))
+        done.set()
+    return results, done, on_result
+
+
+def test_confidence_is_the_mean_word_confidence():
+    assert confidence({'result': [{'conf': 0.5}, {'conf': 1.0}]}) == 0.75
+    assert confidence({'text': ''}) == 0.0
+
+
+def test_fuses_as_soon_as_every_mic_reported():
+    results, done, on_result = collect()
+    fuser = HypothesisFuser(on_result, window=30, active=lambda: 2)
+    fuser.add(0, "open", 0.6, 0, 0)
+    assert not results
+    fuser.add(1, "close", 0.9, 0, 0)
+    assert results == [("close", 1, 0.9)]
+    assert (fuser.early, fuser.suppressed) == (1, 1)
+
+
+def test_window_flushes_a_missing_mic():
+    results, done, on_result = collect()
+    fuser = HypothesisFuser(on_result, window=0.05, active=lambda: 2)
+    fuser.add(0, "open", 0.6, 0, 0)
+    assert done.wait(2)
+    assert results == [("open", 0, 0.6)]
+    assert fuser.early == 0
+
+
+def test_stale_timer_does_not_flush_the_next_window():
+    results, done, on_result = collect()
+    fuser = HypothesisFuser(on_result, window=30, active=lambda: 2)
+    fuser.add(0, "open", 0.6, 0, 0)
+    stale = fuser.generation
+    fuser.flush()
+    fuser.add(1, "close", 0.9, 0, 0)
+    fuser.flush(stale)
+    assert results == [("open", 0, 0.6)]
+    fuser.cancel()
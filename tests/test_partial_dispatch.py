@@ -0,0 +1,36 @@
+from partial_dispatch import PartialStabilizer
+
+
+def parse(text):
+    return {'open': 'open', 'close': 'close'}.get(text.split()[-1]) if text else None
+
+
+def test_fires_once_stable():
+    stabilizer = PartialStabilizer(parse, threshold=2)
+    assert stabilizer.partial("open") is None
+    assert stabilizer.partial("open") == 'open'
+    assert stabilizer.partial("open") is None  # already fired this utterance
+    assert stabilizer.early_fired == 1
+
+
+def test_changing_candidate_restarts_the_count():
+    stabilizer = PartialStabilizer(parse, threshold=2)
+    stabilizer.partial("open")
+    assert stabilizer.partial("open close") is None
+    assert stabilizer.partial("open close") == 'close'
+
+
+def test_pending_phrase_holds_back():
+    stabilizer = PartialStabilizer(parse, threshold=1, pending=lambda text: text.endswith("go open"))
+    assert stabilizer.partial("go open") is None
+    assert stabilizer.partial("open") == 'open'
+
+
+def test_final_deduplicates_or_corrects():
+    stabilizer = PartialStabilizer(parse, threshold=1)
+    stabilizer.partial("open")
+    assert stabilizer.final("open") == (None, True)
+    stabilizer.partial("open")
+    assert stabilizer.final("close") == ('close', True)
+    assert stabilizer.final("close") == ('close', False)
+    assert (stabilizer.deduplicated, stabilizer.corrected) == (1, 1)
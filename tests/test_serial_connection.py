@@ -0,0 +1,124 @@
+"""SerialConnection end to end against VirtualArduino on a pty"""
+import time
+
+import pytest
+
+pytest.importorskip('serial')
+
+from serial_connection import SerialConnection
+from serial_protocol import BAUD_RATES
+from virtual_arduino import stress
+
+
+def connect(device, **options):
+    return SerialConnection(device.port, BAUD_RATES[0], **options).open()
+
+
+def settle(device, angle, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while device.angles()[0] != angle and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return device.angles()[0]
+
+
+def test_binary_link_negotiates_and_moves(board):
+    device = board()
+    connection = connect(device, max_baud=115200)
+    try:
+        assert connection.codec.name == 'binary'
+        assert connection.link_baud == 115200
+        assert device.baud == 115200
+        assert connection.submit(0).result(2) == "servo 0 at 0° (ok)"
+        assert connection.submit('close').result(2) == "servo 0 at 90° (ok)"
+        assert connection.positions.target(0) == 90
+        assert settle(device, 90) == 90
+    finally:
+        connection.close()
+
+
+def test_ascii_link_stays_at_base_rate(board):
+    device = board()
+    connection = connect(device, max_baud=115200, text_only=True)
+    try:
+        assert connection.codec.name == 'ascii'
+        assert connection.link_baud == BAUD_RATES[0]
+        assert connection.submit('open').result(3) == "Servo: Opened to 0°"
+        assert settle(device, 0) == 0
+    finally:
+        connection.close()
+
+
+def test_text_replies_match_their_own_command(board):
+    device = board()
+    connection = connect(device, text_only=True)
+    try:
+        replies = [connection.submit(command).result(3) for command in ['open', 'close', 'wave', 'shut']]
+        assert replies == ["Servo: Opened to 0°", "Servo: Closed to 90°",
+                           "Unknown command. Use 'open' or 'close'", "Servo: Closed to 90°"]
+    finally:
+        connection.close()
+
+
+def test_text_reply_of_a_timed_out_command_is_not_taken_by_the_next(board):
+    device = board()
+    connection = connect(device, text_only=True)
+    device.ack_delay = 0.1  # after the handshake, so its probes are answered promptly
+    try:
+        with pytest.raises(TimeoutError):
+            connection.submit('wave', timeout=0.05, retries=0).result(3)
+        assert connection.submit('open').result(5) == "Servo: Opened to 0°"
+    finally:
+        connection.close()
+
+
+def test_voice_sketch_replies(board):
+    device = board(sketch='voice')
+    connection = connect(device, ready_timeout=1.0)
+    try:
+        assert connection.codec.name == 'ascii'
+        assert connection.submit(0).result(3) == "Opened (0 degrees)"
+        assert connection.submit(180).result(3) == "Closed (180 degrees)"
+    finally:
+        connection.close()
+
+
+def test_seeded_byte_drops_are_recovered(board):
+    device = board(drop_rate=0.002, seed=4)
+    report = stress(device, 200, 115200, 4)
+    assert device.stats()['dropped'] > 0
+    assert report['acked'] == 200
+    assert report['failed'] == 0
+
+
+def test_seeded_drops_repeat(board):
+    def draws(device, counter):
+        return [device.randoms[counter].random() for _ in range(20)]
+
+    first, second, other = board(seed=7), board(seed=7), board(seed=8)
+    for counter in ('bytes_in', 'bytes_out'):
+        assert draws(first, counter) == draws(second, counter)
+        assert draws(first, counter) != draws(other, counter)
+    assert draws(board(seed=7), 'bytes_in') != draws(board(seed=7), 'bytes_out')
+
+
+@pytest.mark.parametrize('max_baud', [BAUD_RATES[0], 115200])
+def test_recovers_from_a_reset_with_the_port_open(board, max_baud):
+    device = board()
+    connection = connect(device, max_baud=max_baud)
+    try:
+        device.reset()
+        time.sleep(0.3)  # bootloader
+        acked = 0
+        deadline = time.monotonic() + 15
+        while acked < 3 and time.monotonic() < deadline:
+            try:
+                connection.submit(['open', 'close'][acked % 2]).result(5)
+                acked += 1
+            except (TimeoutError, ConnectionError):
+                time.sleep(0.2)
+        assert acked == 3
+        assert connection.ready
+        assert connection.link_baud == max_baud
+        assert device.baud == max_baud
+    finally:
+        connection.close()
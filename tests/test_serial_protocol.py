@@ -0,0 +1,74 @@
+from serial_protocol import (CMD_MOVE, START, AsciiCodec, BinaryCodec, FrameDecoder, crc8, encode_frame,
+                             is_text_progress, text_echo, text_position, to_angle)
+
+
+def test_crc8_check_value():
+    # CRC-8 (poly 0x07, init 0) of the standard check string
+    assert crc8(b"123456789") == 0xF4
+    assert crc8(b"") == 0
+
+
+def test_encode_frame_layout():
+    frame = encode_frame(CMD_MOVE, 7, bytes((0, 90)))
+    assert frame[0] == START
+    assert frame[1:5] == bytes((CMD_MOVE, 7, 2, 0))
+    assert frame[-1] == crc8(frame[1:-1])
+
+
+def test_decoder_round_trip_byte_by_byte():
+    data = encode_frame(CMD_MOVE | 0x80, 3, bytes((0, 0, 45)))
+    decoder = FrameDecoder()
+    frames = []
+    for byte in data:
+        frames += decoder.feed(bytes((byte,)))[0]
+    assert len(frames) == 1
+    assert frames[0].is_ack and frames[0].request == CMD_MOVE
+    assert (frames[0].seq, bytes(frames[0].payload)) == (3, bytes((0, 0, 45)))
+
+
+def test_decoder_splits_text_and_frames():
+    frame = encode_frame(CMD_MOVE | 0x80, 1, bytes((0, 0, 90)))
+    frames, lines = FrameDecoder().feed(b"Moving to 90\xc2\xb0\r\n" + frame + b"Ready\r\n\r\n")
+    assert [f.seq for f in frames] == [1]
+    assert lines == ["Moving to 90°", "Ready"]
+
+
+def test_decoder_resyncs_after_a_corrupted_frame():
+    bad = bytearray(encode_frame(CMD_MOVE | 0x80, 1, bytes((0, 0, 90))))
+    bad[-1] ^= 0xFF
+    good = encode_frame(CMD_MOVE | 0x80, 2, bytes((0, 0, 0)))
+    decoder = FrameDecoder()
+    frames, _ = decoder.feed(bytes(bad) + good)
+    assert [f.seq for f in frames] == [2]
+    assert decoder.crc_errors >= 1
+
+
+def test_decoder_waits_for_a_partial_frame():
+    frame = encode_frame(CMD_MOVE | 0x80, 9, bytes((0, 0, 10)))
+    decoder = FrameDecoder()
+    assert decoder.feed(frame[:4]) == ([], [])
+    frames, _ = decoder.feed(frame[4:])
+    assert [f.seq for f in frames] == [9]
+
+
+def test_to_angle():
+    assert to_angle(45) == 45
+    assert to_angle('open') == 0
+    assert to_angle('Close') == 90
+    assert to_angle('set 120') == 120
+    assert to_angle('wave') is None
+
+
+def test_codecs_encode():
+    assert AsciiCodec().encode('open') == b"open\n"
+    codec = BinaryCodec()
+    assert codec.encode('close', seq=5) == encode_frame(CMD_MOVE, 5, bytes((0, 90)))
+
+
+def test_text_reply_helpers():
+    assert text_echo("Received command: open") == "open"
+    assert text_echo("Servo: Opened to 0°") is None
+    assert is_text_progress("Opening servo...")
+    assert not is_text_progress("Servo: Opened to 0°")
+    assert text_position("Servo: Closed to 90°") == 90
+    assert text_position("Opened (0 degrees)") == 0
@@ -0,0 +1,57 @@
+from concurrent.futures import Future
+
+from trajectory import TrajectoryPlanner
+
+
+def run(planner, seconds, dt=0.02):
+    for _ in range(int(seconds / dt)):
+        planner.tick(dt)
+
+
+def test_reaches_the_target_within_the_limits():
+    planner = TrajectoryPlanner(lambda angle: None, max_velocity=180, max_acceleration=720, start=90)
+    planner.set_target(0)
+    velocity = 0.0
+    for _ in range(100):
+        planner.step(0.02)
+        if planner.idle():
+            break  # the last step snaps onto the target
+        assert abs(planner.velocity) <= 180
+        assert abs(planner.velocity - velocity) <= 720 * 0.02 + 1e-9
+        velocity = planner.velocity
+    assert planner.idle() and planner.position == 0
+
+
+def test_streams_setpoints_and_skips_while_one_is_in_flight():
+    futures = []
+
+    def send(angle):
+        futures.append(Future())
+        return futures[-1]
+    planner = TrajectoryPlanner(send, start=90)
+    planner.set_target(180)
+    run(planner, 0.2)
+    assert planner.sent == 1 and planner.skipped > 0
+    futures[-1].set_result("ok")
+    run(planner, 0.02)
+    assert planner.sent == 2
+
+
+def test_new_target_preempts_a_move():
+    planner = TrajectoryPlanner(lambda angle: None, start=90)
+    planner.set_target(180)
+    run(planner, 0.1)
+    planner.set_target(0)
+    assert planner.preemptions == 1
+    run(planner, 3)
+    assert planner.position == 0
+
+
+def test_hold_stops_inside_the_range():
+    planner = TrajectoryPlanner(lambda angle: None, start=90)
+    planner.set_target(180)
+    run(planner, 0.2)
+    planner.hold()
+    run(planner, 2)
+    assert planner.idle()
+    assert 90 < planner.position < 180
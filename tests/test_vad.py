@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from vad import VoiceActivityGate
+
+CHUNK = 4000
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def noise(rng, amplitude):
+    return rng.normal(0, amplitude, CHUNK).astype(np.int16).tobytes()
+
+
+def tone(rng, amplitude=3000):
+    return (np.sin(np.arange(CHUNK) * 0.3) * amplitude + rng.normal(0, 100, CHUNK)).astype(np.int16).tobytes()
+
+
+def test_skips_silence_and_passes_speech(rng):
+    gate = VoiceActivityGate(16000, CHUNK)
+    for _ in range(20):
+        gate.gate(noise(rng, 25))
+    assert gate.chunks_skipped >= 15
+    assert gate.gate(tone(rng))
+
+
+def test_noise_floor_follows_a_lasting_rise_in_noise(rng):
+    gate = VoiceActivityGate(16000, CHUNK)
+    for _ in range(40):
+        gate.gate(noise(rng, 25))
+    before = gate.chunks_skipped
+    for _ in range(200):
+        gate.gate(noise(rng, 100))
+    assert gate.chunks_skipped - before > 100
+    assert gate.gate(tone(rng))
+
+
+def test_flushed_preroll_is_not_counted_as_skipped(rng):
+    gate = VoiceActivityGate(16000, CHUNK)
+    fed = total = 0
+    for i in range(60):
+        chunk = noise(rng, 25) if i % 20 < 14 else tone(rng, 8000)
+        total += len(chunk)
+        fed += len(gate.gate(chunk))
+    assert fed + gate.skipped_bytes == total
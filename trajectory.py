@@ -0,0 +1,135 @@
+"""Host-side motion planner: velocity/acceleration-limited setpoints at a fixed rate
+
+Instead of sending the final angle and letting the servo jump to it, the
+planner moves a virtual position toward the target along a trapezoidal
+velocity profile and streams the rounded position every tick. A new
+target replaces the old one mid-move, keeping the current velocity, so
+motion stays smooth and can be redirected at any time.
+
+Ticks are scheduled on the monotonic clock against absolute deadlines,
+so the rate does not drift with the time spent sending. Setpoints are
+latest-wins: if the previous one has not been acknowledged yet, the tick
+is skipped rather than queued behind it. This pairs with
+NON_BLOCKING_MOVES in servo_control.ino, which acks a move at once
+instead of after delay(500).
+"""
+import math
+import threading
+import time
+
+
+class TrajectoryPlanner:
+    """Stream interpolated setpoints for one servo from a background thread"""
+
+    def __init__(self, send, rate=50.0, max_velocity=180.0, max_acceleration=720.0, start=90.0):
+        self.send = send                  # callable(angle) -> Future or None
+        self.period = 1.0 / rate
+        self.max_velocity = max_velocity  # degrees per second
+        self.max_acceleration = max_acceleration  # degrees per second squared
+        self.position = float(start)
+        self.velocity = 0.0
+        self.target = float(start)
+        self.last_sent = int(round(start))  # assume the servo is already at start
+        self.pending = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.running = False
+        self.ticks = 0
+        self.sent = 0
+        self.skipped = 0         # ticks whose setpoint was dropped (previous one still in flight)
+        self.late_ticks = 0      # ticks that started more than one period late
+        self.max_lateness = 0.0
+        self.preemptions = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.thread = None
+
+    def set_target(self, angle):
+        """Head for angle from wherever the servo is now (preempts the current move)"""
+        with self.lock:
+            if not self.idle():
+                self.preemptions += 1
+            self.target = float(max(0, min(180, angle)))
+        self.wake.set()
+
+    def hold(self):
+        """Stop as quickly as the acceleration limit allows"""
+        with self.lock:
+            stopping = self.velocity * abs(self.velocity) / (2 * self.max_acceleration)
+            self.target = max(0.0, min(180.0, self.position + stopping))
+        self.wake.set()
+
+    def idle(self):
+        return self.position == self.target and self.velocity == 0.0
+
+    def step(self, dt):
+        """Advance the virtual position by dt seconds (trapezoidal profile)"""
+        with self.lock:
+            distance = self.target - self.position
+            if abs(distance) < 0.5 and abs(self.velocity) <= self.max_acceleration * dt:
+                self.position, self.velocity = self.target, 0.0
+                return self.position
+            # Fastest speed from which we can still stop at the target
+            desired = math.copysign(min(self.max_velocity, math.sqrt(2 * self.max_acceleration * abs(distance))), distance)
+            change = self.max_acceleration * dt
+            self.velocity += max(-change, min(change, desired - self.velocity))
+            self.position += self.velocity * dt
+            if (self.target - self.position) * distance < 0:  # overshot within this tick
+                self.position, self.velocity = self.target, 0.0
+            return self.position
+
+    def tick(self, dt):
+        self.ticks += 1
+        angle = int(round(self.step(dt)))
+        if angle == self.last_sent:
+            return
+        if self.pending is not None and not self.pending.done():
+            self.skipped += 1
+            return
+        self.pending = self.send(angle)
+        self.last_sent = angle
+        self.sent += 1
+
+    def run(self):
+        deadline = time.monotonic()
+        while self.running:
+            with self.lock:
+                idle = self.idle()
+            if idle and self.last_sent == int(round(self.position)):
+                # Nothing to do: sleep until set_target(), then restart the clock
+                self.wake.wait()
+                self.wake.clear()
+                deadline = time.monotonic()
+                continue
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lateness = -delay
+                self.max_lateness = max(self.max_lateness, lateness)
+                if lateness > self.period:
+                    self.late_ticks += 1
+                    deadline = time.monotonic()  # resync instead of bursting to catch up
+            self.tick(self.period)
+
+    def stats(self):
+        return {
+            'ticks': self.ticks,
+            'setpoints_sent': self.sent,
+            'setpoints_skipped': self.skipped,
+            'late_ticks': self.late_ticks,
+            'max_lateness_ms': self.max_lateness * 1000,
+            'preemptions': self.preemptions,
+        }
@@ -0,0 +1,125 @@
+import collections
+import math
+import time
+
+import numpy as np
+
+
+class VoiceActivityGate:
+    """Energy / zero-crossing voice-activity gate for the recognizer input.
+
+    Each chunk is split into short frames. A frame counts as speech when
+    its energy is well above the adaptive noise floor, or moderately above
+    it with a high zero-crossing rate (unvoiced sounds like 's' and 'f').
+    The floor follows silent chunks, and is also raised to the quietest
+    chunk level of the last floor_seconds, so a lasting rise in background
+    noise (a fan switching on) cannot hold the gate open for good.
+    Silent chunks are skipped; the last few are kept as pre-roll and sent
+    ahead of the first speech chunk so word onsets are not clipped, and
+    a hangover of trailing chunks is still sent so the recognizer can
+    detect the end of the utterance.
+    """
+
+    def __init__(self, sample_rate, chunk_frames, frame_ms=20, preroll_seconds=0.3,
+                 hangover_seconds=1.0, threshold=3.0, zcr_threshold=0.25,
+                 min_speech_frames=2, adapt_rate=0.05, min_floor=100.0, floor_seconds=5.0):
+        self.frame_len = max(1, int(sample_rate * frame_ms / 1000))
+        chunk_seconds = chunk_frames / sample_rate
+        self.preroll = collections.deque(maxlen=max(1, math.ceil(preroll_seconds / chunk_seconds)))
+        self.hangover_chunks = max(1, math.ceil(hangover_seconds / chunk_seconds))
+        self.threshold = threshold
+        self.zcr_threshold = zcr_threshold
+        self.min_speech_frames = min_speech_frames
+        self.adapt_rate = adapt_rate
+        self.min_floor = min_floor
+        self.noise_floor = None
+        self.levels = collections.deque(maxlen=max(1, math.ceil(floor_seconds / chunk_seconds)))
+        self.hangover = 0
+
+        self.chunks_in = 0
+        self.chunks_skipped = 0
+        self.gate_cpu = 0.0
+        self.decode_cpu = 0.0
+        self.decode_bytes = 0
+        self.skipped_bytes = 0
+
+    def is_speech(self, data):
+        """Classify one chunk and update the noise floor"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        count = len(samples) // self.frame_len
+        if count == 0:
+            return False
+        frames = samples[:count * self.frame_len].reshape(count, self.frame_len).astype(np.float32)
+        energy = np.mean(frames * frames, axis=1)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        if self.noise_floor is None:
+            self.noise_floor = max(float(np.median(energy)), self.min_floor)
+
+        loud = energy > self.noise_floor * self.threshold
+        hissy = (energy > self.noise_floor * self.threshold / 2) & (zcr > self.zcr_threshold)
+        speech = int(np.count_nonzero(loud | hissy)) >= self.min_speech_frames
+
+        level = float(np.median(energy))
+        self.levels.append(level)
+        if not speech:
+            self.noise_floor = max(
+                self.min_floor,
+                (1 - self.adapt_rate) * self.noise_floor + self.adapt_rate * level
+            )
+        elif len(self.levels) == self.levels.maxlen:
+            # Minimum statistics: speech has pauses, so a window that never
+            # drops below a level is background noise at that level
+            self.noise_floor = max(self.noise_floor, min(self.levels))
+        return speech
+
+    def gate(self, data):
+        """Return the audio to feed the recognizer for this chunk (b'' to skip)"""
+        start = time.thread_time()
+        self.chunks_in += 1
+        if self.is_speech(data):
+            out = data
+            if self.hangover == 0 and self.preroll:
+                # The pre-roll was counted as skipped, but is decoded after all
+                flushed = b''.join(self.preroll)
+                self.chunks_skipped -= len(self.preroll)
+                self.skipped_bytes -= len(flushed)
+                out = flushed + data
+            self.preroll.clear()
+            self.hangover = self.hangover_chunks
+        elif self.hangover > 0:
+            self.hangover -= 1
+            out = data
+        else:
+            self.preroll.append(data)
+            self.chunks_skipped += 1
+            self.skipped_bytes += len(data)
+            out = b''
+        self.gate_cpu += time.thread_time() - start
+        return out
+
+    def note_decode(self, cpu_seconds, size):
+        """Record recognizer CPU spent on size bytes, to estimate savings"""
+        self.decode_cpu += cpu_seconds
+        self.decode_bytes += size
+
+    def stats(self):
+        """Skipped chunks and estimated recognizer CPU saved (net of gate cost)"""
+        per_byte = self.decode_cpu / self.decode_bytes if self.decode_bytes else 0.0
+        saved = self.skipped_bytes * per_byte
+        return {
+            'chunks': self.chunks_in,
+            'skipped': self.chunks_skipped,
+            'skipped_pct': 100.0 * self.chunks_skipped / self.chunks_in if self.chunks_in else 0.0,
+            'decode_cpu_seconds': self.decode_cpu,
+            'gate_cpu_seconds': self.gate_cpu,
+            'cpu_saved_seconds': saved - self.gate_cpu,
+            'noise_floor': self.noise_floor,
+        }
+
+    def summary(self):
+        """One-line report for logs"""
+        s = self.stats()
+        return (f"VAD skipped {s['skipped']}/{s['chunks']} chunks ({s['skipped_pct']:.0f}%), "
+                f"saved ~{s['cpu_saved_seconds']:.2f}s recognizer CPU")
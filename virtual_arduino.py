@@ -0,0 +1,469 @@
+"""Virtual Arduino on a pseudo-terminal, for testing the serial paths without hardware
+
+The device opens a pty and behaves like one of the sketches:
+
+  servo_control  arduino/servo_control/servo_control.ino: text commands with
+                 the same reply lines, plus binary frames (HELLO, MOVE, POSE,
+                 BAUD, ECHO, STATUS), NON_BLOCKING_MOVES or the old delay(500)
+  voice          arduino/servo_control/voice/voice.ino: "0" / "180" only
+
+Bytes take wire time at the device's current baud rate (10 bits per
+byte), and bytes sent while host and device rates differ are lost. The
+servo turns at a finite slew speed. Faults can be injected: dropped
+bytes, slow acks, and resets (reboot into the bootloader, back to 9600).
+
+Point any sender at the printed port, e.g.
+    VOICE_SERIAL_PORT=/dev/pts/7 python voice_control.py
+
+Usage: python virtual_arduino.py [--sketch voice] [--blocking] [--drop 0.01] [--seed 1]
+                                 [--ack-delay 0.05] [--reset-every 30]
+       python virtual_arduino.py --stress 500 [--max-baud 115200] [--window 4] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import select
+import sys
+import threading
+import time
+
+from latency import percentile
+from serial_protocol import (ACK_FLAG, BAUD_CONFIRM_SECONDS, BAUD_RATES, CMD_BAUD, CMD_ECHO,
+                             CMD_HELLO, CMD_MOVE, CMD_POSE, CMD_STATUS, MAX_PAYLOAD, PROTOCOL_VERSION, START,
+                             STATUS_BAD_ANGLE, STATUS_BAD_SERVO, STATUS_OK, STATUS_UNKNOWN,
+                             crc8, encode_frame)
+
+try:
+    import pty
+    import termios
+    import tty
+except ImportError:  # Windows has no ptys
+    pty = termios = tty = None
+
+SERVO_PINS = [9, 10, 11, 5, 6]  # as in servo_control.ino
+BAUD_MASK = 0x1F
+SETTLE_SECONDS = 0.5            # delay(500) in blocking mode
+FRAME_TIMEOUT = 0.05            # FRAME_TIMEOUT_MS
+READ_STRING_TIMEOUT = 1.0       # Serial.readStringUntil() default timeout
+
+
+def termios_speeds():
+    if termios is None:
+        return {}
+    return {getattr(termios, f"B{rate}"): rate for rate in BAUD_RATES if hasattr(termios, f"B{rate}")}
+
+
+class Servo:
+    """Hobby servo turning at a finite speed toward the last written angle"""
+
+    def __init__(self, angle, speed):
+        self.speed = speed  # degrees per second
+        self.start_angle = self.target = angle
+        self.started = time.monotonic()
+
+    def write(self, angle):
+        self.start_angle = self.angle()
+        self.target = angle
+        self.started = time.monotonic()
+
+    def angle(self):
+        travelled = self.speed * (time.monotonic() - self.started)
+        distance = self.target - self.start_angle
+        if abs(distance) <= travelled:
+            return self.target
+        return self.start_angle + travelled * (1 if distance > 0 else -1)
+
+
+class ServoControlSketch:
+    """servo_control.ino"""
+
+    def __init__(self, device, non_blocking=True):
+        self.device = device
+        self.non_blocking = non_blocking
+        self.servos = [Servo(90, device.slew) for _ in SERVO_PINS]
+        self.binary_mode = False  # binaryMode: skip stray bytes instead of reading a text line
+
+    def setup(self):
+        self.println("Servo attached successfully to pin 9")
+        self.close_servo()
+        self.println("\nSingle Servo Control Ready!")
+        self.println("Send 'open' or 'shut' to control the servo")
+
+    def println(self, text):
+        self.device.emit(f"{text}\r\n".encode('utf-8'))
+
+    def loop(self, buffer):
+        """Consume what loop() would from buffer; returns the bytes left over"""
+        if buffer[0] == START:
+            return self.read_frame(buffer)
+        if self.binary_mode:
+            return buffer[1:]  # resync on the next frame
+        if b'\n' not in buffer:
+            if time.monotonic() - self.device.first_byte_at < READ_STRING_TIMEOUT:
+                return buffer  # readStringUntil() is still waiting
+            line, rest = buffer, b''
+        else:
+            line, rest = buffer.split(b'\n', 1)
+        command = line.decode('utf-8', errors='replace').strip()
+        if command:
+            self.text_command(command)
+        return rest
+
+    def text_command(self, command):
+        self.println("\nReceived command: " + command)
+        if command == "open":
+            self.println("Opening servo...")
+            self.move_servo(0)
+            self.println("Servo: Opened to 0°")
+        elif command in ("shut", "close"):
+            self.println("Closing servo...")
+            self.close_servo()
+        else:
+            self.println("Unknown command. Use 'open' or 'close'")
+
+    def close_servo(self):
+        self.move_servo(90)
+        self.println("Servo: Closed to 90°")
+
+    def move_servo(self, angle):
+        angle = max(0, min(180, angle))
+        self.println(f"Moving to {angle}°")
+        self.servos[0].write(angle)
+        self.finish_move()
+
+    def finish_move(self):
+        if not self.non_blocking:
+            time.sleep(SETTLE_SECONDS)
+
+    def read_frame(self, buffer):
+        if len(buffer) < 4 or len(buffer) < 5 + buffer[3]:
+            if time.monotonic() - self.device.first_byte_at > FRAME_TIMEOUT:
+                return buffer[1:]  # readByteTimeout() gave up; resync on the next byte
+            return buffer
+        length = buffer[3]
+        if length > MAX_PAYLOAD:
+            return buffer[4:]
+        size = 5 + length
+        body = buffer[1:size - 1]
+        if crc8(body) == buffer[size - 1]:
+            self.device.confirm_baud()
+            self.binary_mode = body[0] != CMD_HELLO
+            self.handle_frame(body[0], body[1], body[3:])
+        return buffer[size:]
+
+    def ack(self, cmd, seq, payload):
+        self.device.emit(encode_frame(cmd | ACK_FLAG, seq, bytes(payload)))
+
+    def handle_frame(self, cmd, seq, payload):
+        if cmd == CMD_HELLO:
+            self.ack(cmd, seq, (STATUS_OK, PROTOCOL_VERSION, BAUD_MASK))
+        elif cmd == CMD_MOVE and len(payload) >= 2:
+            servo, angle = payload[0], payload[1]
+            if servo >= len(self.servos):
+                status = STATUS_BAD_SERVO
+            elif angle > 180:
+                status = STATUS_BAD_ANGLE
+            else:
+                status = STATUS_OK
+                self.servos[servo].write(angle)
+                self.finish_move()
+            self.ack(cmd, seq, (status, servo, angle))
+        elif cmd == CMD_POSE and len(payload) % 2 == 0:
+            pairs = [(payload[i], payload[i + 1]) for i in range(0, len(payload), 2)]
+            status = STATUS_OK
+            for servo, angle in pairs:
+                if servo >= len(self.servos):
+                    status = STATUS_BAD_SERVO
+                elif angle > 180:
+                    status = STATUS_BAD_ANGLE
+            if status == STATUS_OK:
+                for servo, angle in pairs:
+                    self.servos[servo].write(angle)
+                self.finish_move()
+            self.ack(cmd, seq, (status, len(pairs)))
+        elif cmd == CMD_BAUD and len(payload) == 1:
+            index = payload[0]
+            self.ack(cmd, seq, (STATUS_OK if index < len(BAUD_RATES) else STATUS_UNKNOWN, index))
+            if index < len(BAUD_RATES):
+                self.device.set_baud(BAUD_RATES[index], confirm=True)
+        elif cmd == CMD_STATUS:
+            # The sketch reports what it wrote (SLEW_DEG_PER_STEP = 0), not the shaft angle
+            targets = [int(servo.target) for servo in self.servos]
+            self.ack(cmd, seq, [STATUS_OK, len(targets), 0] + targets)
+        elif cmd == CMD_ECHO and len(payload) < MAX_PAYLOAD:
+            self.ack(cmd, seq, bytes((STATUS_OK,)) + bytes(payload))
+        else:
+            self.ack(cmd, seq, (STATUS_UNKNOWN,))
+
+
+class VoiceSketch:
+    """voice/voice.ino (text only, pin 10, no delay after a move)"""
+
+    def __init__(self, device, non_blocking=True):
+        self.device = device
+        self.servos = [Servo(180, device.slew)]
+
+    def println(self, text):
+        self.device.emit(f"{text}\r\n".encode('utf-8'))
+
+    def setup(self):
+        self.servos[0].write(180)
+        self.println("Servo initialized to CLOSED position (180 degrees)")
+        self.println("Send '0' to open or '180' to close")
+
+    def loop(self, buffer):
+        if b'\n' not in buffer:
+            if time.monotonic() - self.device.first_byte_at < READ_STRING_TIMEOUT:
+                return buffer
+            line, rest = buffer, b''
+        else:
+            line, rest = buffer.split(b'\n', 1)
+        command = line.decode('utf-8', errors='replace').strip()
+        if command == "0":
+            self.servos[0].write(0)
+            self.println("Opened (0 degrees)")
+        elif command == "180":
+            self.servos[0].write(180)
+            self.println("Closed (180 degrees)")
+        else:
+            self.println("Invalid command. Send '0' to open or '180' to close")
+        return rest
+
+
+SKETCHES = {'servo_control': ServoControlSketch, 'voice': VoiceSketch}
+
+
+class VirtualArduino:
+    """A sketch running behind a pty, with wire time, motion time and faults"""
+
+    def __init__(self, sketch='servo_control', non_blocking=True, slew=600.0, boot_time=1.6,
+                 drop_rate=0.0, ack_delay=0.0, reset_every=None, seed=None):
+        if pty is None:
+            raise RuntimeError("The virtual Arduino needs a POSIX pseudo-terminal")
+        self.sketch_name = sketch
+        self.non_blocking = non_blocking
+        self.slew = slew                # servo speed, degrees per second (~0.1 s / 60°)
+        self.boot_time = boot_time      # bootloader time after a reset
+        self.drop_rate = drop_rate      # probability of losing each byte, both directions
+        self.ack_delay = ack_delay      # extra seconds before every reply
+        self.reset_every = reset_every  # seconds between injected resets
+        # One generator per direction, so with a seed the bytes lost in each
+        # direction do not depend on how reads and writes interleave
+        self.randoms = {counter: random.Random(None if seed is None else f"{seed}-{counter}")
+                        for counter in ('bytes_in', 'bytes_out')}
+        self.baud = BAUD_RATES[0]
+        self.speeds = termios_speeds()
+        self.baud_deadline = None
+        self.buffer = b''
+        self.first_byte_at = 0.0
+        self.master = self.slave = None
+        self.port = None
+        self.thread = None
+        self.running = False
+        self.booted_at = None
+        self.setup_done = False
+        self.counters = {'bytes_in': 0, 'bytes_out': 0, 'dropped': 0, 'garbled': 0, 'resets': 0}
+
+    def start(self):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        self.reset(count=False)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def reset(self, count=True):
+        """Reboot: bootloader first, then setup() with its banner, at 9600 baud"""
+        if count:
+            self.counters['resets'] += 1
+        self.sketch = SKETCHES[self.sketch_name](self, self.non_blocking)
+        self.baud = BAUD_RATES[0]
+        self.baud_deadline = None
+        self.buffer = b''
+        self.booted_at = time.monotonic() + self.boot_time
+        self.setup_done = False
+
+    def host_baud(self):
+        """Rate the host configured on its end of the pty (None if unknown)"""
+        try:
+            return self.speeds.get(termios.tcgetattr(self.slave)[5])
+        except termios.error:
+            return None
+
+    def set_baud(self, rate, confirm=False):
+        self.baud = rate
+        self.baud_deadline = time.monotonic() + BAUD_CONFIRM_SECONDS if confirm else None
+
+    def confirm_baud(self):
+        self.baud_deadline = None
+
+    def wire_time(self, count):
+        time.sleep(count * 10.0 / self.baud)
+
+    def lose(self, data, counter):
+        """Apply byte drops and rate mismatches to data crossing the wire"""
+        host = self.host_baud()
+        if host is not None and host != self.baud:
+            self.counters['garbled'] += len(data)
+            return b''
+        if self.drop_rate:
+            rng = self.randoms[counter]
+            kept = bytes(b for b in data if rng.random() >= self.drop_rate)
+            self.counters['dropped'] += len(data) - len(kept)
+            data = kept
+        self.counters[counter] += len(data)
+        return data
+
+    def emit(self, data):
+        if self.ack_delay:
+            time.sleep(self.ack_delay)
+        self.wire_time(len(data))
+        data = self.lose(data, 'bytes_out')
+        if data:
+            os.write(self.master, data)
+
+    def run(self):
+        next_reset = time.monotonic() + self.reset_every if self.reset_every else None
+        while self.running:
+            now = time.monotonic()
+            if next_reset and now >= next_reset:
+                self.reset()
+                next_reset = now + self.reset_every
+            if self.baud_deadline and now > self.baud_deadline:
+                self.set_baud(BAUD_RATES[0])  # checkBaudConfirm()
+            readable, _, _ = select.select([self.master], [], [], 0.01)
+            if readable:
+                try:
+                    data = os.read(self.master, 256)
+                except OSError:
+                    continue
+                self.wire_time(len(data))
+                if now < self.booted_at:
+                    continue  # the bootloader swallows whatever arrives
+                data = self.lose(data, 'bytes_in')
+                if data and not self.buffer:
+                    self.first_byte_at = time.monotonic()
+                self.buffer += data
+            if now >= self.booted_at and not self.setup_done:
+                self.setup_done = True
+                self.sketch.setup()
+            while self.buffer and self.setup_done:
+                before = self.buffer
+                self.buffer = self.sketch.loop(self.buffer)
+                if self.buffer == before:
+                    break  # waiting for the rest of a line or frame
+                self.first_byte_at = time.monotonic()
+
+    def angles(self):
+        return [round(servo.angle(), 1) for servo in self.sketch.servos]
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update({'sketch': self.sketch_name, 'baud': self.baud, 'angles': self.angles()})
+        return stats
+
+
+def stress(device, commands, max_baud, window):
+    """Fire commands as fast as the link accepts them; report rate and ack latency"""
+    from serial_connection import SerialConnection
+
+    connection = SerialConnection(device.port, BAUD_RATES[0], max_baud=max_baud,
+                                  transport_options={'max_in_flight': window}).open()
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def done(future, sent):
+        with lock:
+            if future.exception():
+                failures.append(str(future.exception()))
+            else:
+                latencies.append(time.monotonic() - sent)
+
+    start = time.monotonic()
+    futures = []
+    for i in range(commands):
+        angle = (i * 37) % 181
+        sent = time.monotonic()
+        future = connection.submit(angle)
+        future.add_done_callback(lambda f, sent=sent: done(f, sent))
+        futures.append(future)
+    for future in futures:
+        future.exception()
+    elapsed = time.monotonic() - start
+    link = connection.stats()
+    connection.close()
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        'sketch': device.sketch_name,
+        'protocol': link.get('protocol'),
+        'baud': link.get('baud'),
+        'window': window,
+        'commands': commands,
+        'acked': len(latencies),
+        'failed': len(failures),
+        'retries': link.get('retries', 0),
+        'seconds': elapsed,
+        'commands_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'ack_ms': {'p50': percentile(ms, 50), 'p90': percentile(ms, 90),
+                   'p99': percentile(ms, 99), 'max': max(ms) if ms else None},
+        'device': device.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual Arduino on a pty")
+    parser.add_argument('--sketch', choices=SKETCHES, default='servo_control')
+    parser.add_argument('--blocking', action='store_true', help="delay(500) after every move")
+    parser.add_argument('--slew', type=float, default=600.0, help="servo speed in degrees per second")
+    parser.add_argument('--drop', type=float, default=0.0, help="probability of dropping each byte")
+    parser.add_argument('--seed', type=int, help="seed for --drop, to repeat a run's losses")
+    parser.add_argument('--ack-delay', type=float, default=0.0, help="extra seconds before each reply")
+    parser.add_argument('--reset-every', type=float, help="reset the board every N seconds")
+    parser.add_argument('--boot-time', type=float, default=1.6)
+    parser.add_argument('--stress', type=int, metavar='N', help="send N commands and report")
+    parser.add_argument('--max-baud', type=int, default=115200)
+    parser.add_argument('--window', type=int, default=4, help="commands in flight (binary protocol)")
+    parser.add_argument('--json', help="write the stress report to this file")
+    args = parser.parse_args()
+
+    device = VirtualArduino(args.sketch, not args.blocking, args.slew, args.boot_time,
+                            args.drop, args.ack_delay, args.reset_every, args.seed).start()
+    try:
+        if not args.stress:
+            print(f"🔌 Virtual {args.sketch} on {device.port} (Ctrl+C to stop)")
+            while True:
+                time.sleep(1)
+        report = stress(device, args.stress, args.max_baud, args.window)
+        ack = report['ack_ms']
+        print(f"\n📊 {report['acked']}/{report['commands']} acked in {report['seconds']:.2f}s "
+              f"({report['commands_per_second']:.1f} commands/s) over {report['protocol']} @ {report['baud']} baud")
+        if ack['p50'] is not None:
+            print(f"   ack latency p50 {ack['p50']:.1f} ms, p90 {ack['p90']:.1f} ms, "
+                  f"p99 {ack['p99']:.1f} ms, max {ack['max']:.1f} ms")
+        print(f"   retries {report['retries']}, failed {report['failed']}, device {report['device']}")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {args.json}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,64 @@
 import os
 import json
 import queue
-import re
+import signal
 import threading
 import time
-import serial
 import pyaudio
-from vosk import Model, KaldiRecognizer
+from audio_capture import CallbackCapture
+from audio_profile import get_profile
+from command_matcher import CommandMatcher, tokenize
+from dispatch_queue import CoalescingQueue
+from hand_controller import HandController
+from trajectory import TrajectoryPlanner
+from latency import CommandTrace, LatencyTracker
+from multi_mic import run_multi_mic
+from partial_dispatch import PartialStabilizer
+from recognition import build_grammar, create_recognizer, load_model, service_socket, switch_grammar
+from serial_connection import open_connection
+from vad import VoiceActivityGate
 
 class VoiceControl:
-    def __init__(self):
+    def __init__(self, open_devices=True):
         # Audio configuration
         self.SAMPLE_RATE = 16000
-        self.CHUNK = 8192  # Increased buffer size for better recognition
+        # Buffer/read sizes and poll policy, shared with the other entry
+        # points (see audio_profile.py; VOICE_AUDIO_PROFILE selects one)
+        self.PROFILE = get_profile()
+        self.CHUNK = self.PROFILE.read_size
         self.AUDIO_FORMAT = pyaudio.paInt16
         self.CHANNELS = 1
         
+        # Capture with PyAudio's callback API into a ring buffer so slow
+        # decoding can't overflow the device buffer (opt-in)
+        self.USE_CALLBACK_CAPTURE = False
+        self.CAPTURE_BUFFER_SECONDS = 2.0
+        self.capture = None
+        
+        # Input device indexes to listen on at once, e.g. [1, 3]; the most
+        # confident hypothesis wins (None = default input only)
+        self.INPUT_DEVICES = None
+        
+        # Skip silent chunks before they reach the recognizer (opt-in)
+        self.USE_VAD = False
+        
         # Serial configuration
-        self.SERIAL_PORT = 'COM9'  # Update this
+        self.SERIAL_PORT = os.environ.get('VOICE_SERIAL_PORT', 'COM9')  # Update this (or point it at virtual_arduino.py)
         self.BAUD_RATE = 9600
+        # Don't reset the board on open (DTR held low; on Linux/macOS from the second open on)
+        self.SUPPRESS_RESET = False
+        # Links start at BAUD_RATE; binary-protocol sketches are then moved up to
+        # the fastest rate (at most this) that passes an echo test
+        self.MAX_BAUD_RATE = 115200
+        # Multi-servo hand with named poses ("fist", "point", ...); joints and
+        # boards are configured in hand_controller.DEFAULT_JOINTS
+        self.USE_HAND = False
+        # Stream velocity/acceleration-limited setpoints instead of jumping
+        # to each angle (trajectory.py; pair with NON_BLOCKING_MOVES in the sketch)
+        self.SMOOTH_MOTION = False
+        self.MAX_VELOCITY = 180.0       # degrees per second
+        self.MAX_ACCELERATION = 720.0   # degrees per second squared
+        self.SETPOINT_RATE = 50.0       # setpoints per second
         
         # Voice model path
         self.MODEL_PATH = os.path.join(
@@ -26,6 +66,19 @@ class VoiceControl:
             "vosk-model-small-en-us-0.15"
         )
         
+        # Per-stage latency histograms, written here at shutdown (and on SIGUSR1)
+        self.LATENCY_REPORT = os.path.join(os.path.dirname(__file__), "latency_report.json")
+        self.latency = LatencyTracker()
+        
+        # Restrict decoding to the command vocabulary below (opt-in)
+        self.USE_GRAMMAR = False
+        
+        # Fire commands from stable partial results instead of waiting for
+        # the endpoint; PARTIAL_STABILITY is the number of consecutive
+        # partials that must agree
+        self.EARLY_FIRE = False
+        self.PARTIAL_STABILITY = 2
+        
         # Voice command mappings
         self.COMMANDS = {
             'open': 0,
@@ -39,111 +92,289 @@ class VoiceControl:
             'forty-five': 45
         }
         
-        # Number patterns for better recognition
-        self.NUMBER_PATTERNS = {
-            r'\b(zero|oh|no|hero|nero|arrow|narrow|nora|nora|nora|nora)\b': 0,
-            r'\b(one|won|when|wine|won't|want|once|on|won't|when|wine|won't|want|once|on|won't|when|wine|won't|want|once|on)\b': 1,
-            r'\b(two|to|too|true|through|do|two|to|too|true|through|do|two|to|too|true|through|do)\b': 2,
-            r'\b(three|free|tree|the|three|free|tree|the|three|free|tree|the)\b': 3,
-            r'\b(four|for|fore|fourth|forth|for|fore|fourth|forth|for|fore|fourth|forth)\b': 4,
-            r'\b(five|fire|fight|fifth|five|fire|fight|fifth|five|fire|fight|fifth)\b': 5,
-            r'\b(six|sick|sikh|sikh|sick|sikh|sick|sikh|sick|sikh|sick|sikh)\b': 6,
-            r'\b(seven|saving|savings|saving|savings|saving|savings|saving|savings|saving|savings)\b': 7,
-            r'\b(eight|ate|hate|hate|hate|hate|hate|hate|hate|hate|hate|hate)\b': 8,
-            r'\b(nine|niner|niner|niner|niner|niner|niner|niner|niner|niner|niner|niner)\b': 9,
-            r'\b(ten|tennis|tenth|tennis|tenth|tennis|tenth|tennis|tenth|tennis|tenth|tennis)\b': 10,
-            r'\b(twenty|20|twenty|20|twenty|20|twenty|20|twenty|20|twenty|20)\b': 20,
-            r'\b(thirty|30|thirty|30|thirty|30|thirty|30|thirty|30|thirty|30)\b': 30,
-            r'\b(forty|40|forty|40|forty|40|forty|40|forty|40|forty|40)\b': 40,
-            r'\b(fifty|50|fifty|50|fifty|50|fifty|50|fifty|50|fifty|50)\b': 50,
-            r'\b(sixty|60|sixty|60|sixty|60|sixty|60|sixty|60|sixty|60)\b': 60,
-            r'\b(seventy|70|seventy|70|seventy|70|seventy|70|seventy|70|seventy|70)\b': 70,
-            r'\b(eighty|80|eighty|80|eighty|80|eighty|80|eighty|80|eighty|80)\b': 80,
-            r'\b(ninety|90|ninety|90|ninety|90|ninety|90|ninety|90|ninety|90)\b': 90,
-            r'\b(hundred|100|hundred|100|hundred|100|hundred|100|hundred|100|hundred|100)\b': 100,
-            r'\b(one hundred|100|one hundred|100|one hundred|100|one hundred|100|one hundred|100|one hundred|100)\b': 100,
-            r'\b(one eighty|180|one eighty|180|one eighty|180|one eighty|180|one eighty|180|one eighty|180)\b': 180
+        # Number words, checked after COMMANDS (longer phrases first, so
+        # "one hundred" is not taken for "one")
+        self.NUMBER_WORDS = {
+            'one hundred': 100,
+            'one eighty': 180, '180': 180,
+            'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+            'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+            'twenty': 20, '20': 20,
+            'thirty': 30, '30': 30,
+            'forty': 40, '40': 40,
+            'fifty': 50, '50': 50,
+            'sixty': 60, '60': 60,
+            'seventy': 70, '70': 70,
+            'eighty': 80, '80': 80,
+            'ninety': 90, '90': 90,
+            'hundred': 100, '100': 100
+        }
+        
+        # Common mis-hearings of the number words, checked last so a real
+        # number anywhere in the transcript wins; never put in the grammar,
+        # where they would turn noise like "the" or "no" into moves
+        self.NUMBER_ALIASES = {
+            'oh': 0, 'no': 0, 'hero': 0, 'nero': 0, 'arrow': 0, 'narrow': 0, 'nora': 0,
+            'won': 1, 'when': 1, 'wine': 1, "won't": 1, 'want': 1, 'once': 1, 'on': 1,
+            'to': 2, 'too': 2, 'true': 2, 'through': 2, 'do': 2,
+            'free': 3, 'tree': 3, 'the': 3,
+            'for': 4, 'fore': 4, 'fourth': 4, 'forth': 4,
+            'fire': 5, 'fight': 5, 'fifth': 5,
+            'sick': 6, 'sikh': 6,
+            'saving': 7, 'savings': 7,
+            'ate': 8, 'hate': 8,
+            'niner': 9,
+            'tennis': 10, 'tenth': 10
         }
         
-        self.setup_audio()
-        self.setup_serial()
+        # Built once; extract_number tokenizes each transcript a single time
+        self.matcher = CommandMatcher(self.COMMANDS, self.NUMBER_WORDS, self.NUMBER_ALIASES)
+        self.hand = HandController(
+            baud=self.BAUD_RATE,
+            suppress_reset=self.SUPPRESS_RESET,
+            max_baud=self.MAX_BAUD_RATE
+        ) if self.USE_HAND else None
+        
+        # Words handled directly in process_audio
+        self.CONTROL_WORDS = ['left', 'right', 'stop', 'exit', 'quit']
+        self.stabilizer = PartialStabilizer(
+            self.parse_command,
+            self.PARTIAL_STABILITY,
+            pending=self.partial_pending
+        )
+        
+        self.vad = VoiceActivityGate(self.SAMPLE_RATE, self.CHUNK) if self.USE_VAD else None
+        
+        self.connection = None  # SerialConnection once the Arduino is connected
+        
+        # open_devices=False skips the microphone and Arduino (benchmarks, replay)
+        if open_devices:
+            self.setup_audio()
+            self.setup_serial()
+            if self.hand:
+                self.hand.connect()
         self.setup_voice_model()
         
         self.running = False
-        self.command_queue = queue.Queue()
-        self.current_angle = 0
-
-    def setup_audio(self):
-        """Initialize audio input"""
-        self.audio = pyaudio.PyAudio()
-        self.stream = self.audio.open(
-            format=self.AUDIO_FORMAT,
-            channels=self.CHANNELS,
-            rate=self.SAMPLE_RATE,
-            input=True,
-            frames_per_buffer=self.CHUNK
-        )
+        # Newest target wins, 'stop' jumps ahead, repeats of a confirmed target are dropped
+        self.command_queue = CoalescingQueue(current=self.confirmed_target)
+        self.planner = None
+        if self.SMOOTH_MOTION and self.connection:
+            self.planner = TrajectoryPlanner(
+                lambda angle: self.connection.submit(angle, retries=0),
+                rate=self.SETPOINT_RATE,
+                max_velocity=self.MAX_VELOCITY,
+                max_acceleration=self.MAX_ACCELERATION,
+                start=self.connection.positions.target(0, 90)  # servo_control.ino closes to 90° at boot
+            )
+
+    def setup_audio(self, audio=None):
+        """Initialize audio input (audio may be a SyntheticAudio source)"""
+        self.audio = audio or pyaudio.PyAudio()
+        if self.INPUT_DEVICES:
+            return  # MultiMicRecognizer opens one stream per device
+        if self.USE_CALLBACK_CAPTURE:
+            self.capture = CallbackCapture(
+                self.PROFILE.frames_per_buffer, self.SAMPLE_RATE, self.CAPTURE_BUFFER_SECONDS
+            )
+            self.stream = self.capture.open(
+                self.audio,
+                format=self.AUDIO_FORMAT,
+                channels=self.CHANNELS,
+                rate=self.SAMPLE_RATE
+            )
+        else:
+            self.stream = self.audio.open(
+                format=self.AUDIO_FORMAT,
+                channels=self.CHANNELS,
+                rate=self.SAMPLE_RATE,
+                input=True,
+                frames_per_buffer=self.PROFILE.frames_per_buffer
+            )
+
+    def read_chunk(self):
+        """Read one CHUNK of audio; None if the capture buffer stayed empty"""
+        if self.PROFILE.sleep:
+            time.sleep(self.PROFILE.sleep)
+        if self.capture:
+            return self.capture.read(self.CHUNK, timeout=1.0)
+        return self.stream.read(self.CHUNK, exception_on_overflow=False)
+
+    def decode(self, data):
+        """Feed audio to the recognizer; True at the end of an utterance"""
+        if not self.vad:
+            return self.recognizer.AcceptWaveform(data)
+        start = time.thread_time()
+        endpoint = self.recognizer.AcceptWaveform(data)
+        self.vad.note_decode(time.thread_time() - start, len(data))
+        return endpoint
 
     def setup_serial(self):
-        """Initialize serial connection to Arduino"""
+        """Open the Arduino connection; returns once the sketch answers the handshake"""
         try:
-            self.arduino = serial.Serial(
+            self.connection = open_connection(
                 self.SERIAL_PORT,
                 self.BAUD_RATE,
-                timeout=1
+                suppress_reset=self.SUPPRESS_RESET,
+                max_baud=self.MAX_BAUD_RATE
             )
-            print(f"✅ Connected to Arduino on {self.SERIAL_PORT}")
+            print(f"✅ Connected to Arduino on {self.SERIAL_PORT} ({self.connection.codec.name} protocol, "
+                  f"{self.connection.link_baud} baud, ready in {self.connection.ready_seconds:.2f}s)")
         except Exception as e:
             print(f"❌ Failed to connect to Arduino: {e}")
-            self.arduino = None
+            self.connection = None
+
+    @property
+    def current_angle(self):
+        """Servo angle the Arduino has confirmed (0 until it reports one)"""
+        angle = self.confirmed_target(0)
+        return 0 if angle is None else angle
+
+    def confirmed_target(self, actuator):
+        """Where the Arduino says an actuator is headed, read from the position cache"""
+        if actuator == 'hand':
+            return self.hand.current_pose() if self.hand else None
+        if self.connection:
+            return self.connection.positions.target(actuator)
+        return None
 
     def setup_voice_model(self):
-        """Initialize voice recognition model"""
-        if not os.path.exists(self.MODEL_PATH):
+        """Initialize voice recognition model (or connect to the shared service)"""
+        socket_path = service_socket()
+        if not socket_path and not os.path.exists(self.MODEL_PATH):
             print(f"❌ Model not found at {self.MODEL_PATH}")
             print("Please download the model from:")
             print("https://alphacephei.com/vosk/models")
             exit(1)
             
-        self.model = Model(self.MODEL_PATH)
-        self.recognizer = KaldiRecognizer(self.model, self.SAMPLE_RATE)
+        self.model = load_model(self.MODEL_PATH, socket_path)
+        self.grammar = self.command_grammar() if self.USE_GRAMMAR else None
+        self.recognizer = create_recognizer(self.model, self.SAMPLE_RATE, self.grammar)
         print("✅ Voice model loaded")
 
-    def send_command(self, command):
-        """Send command to Arduino"""
-        if not self.arduino or not self.arduino.is_open:
+    def command_grammar(self):
+        """Vosk grammar covering every phrase this controller acts on (no NUMBER_ALIASES)"""
+        tables = [self.COMMANDS, self.NUMBER_WORDS, self.CONTROL_WORDS]
+        if self.hand:
+            tables.append(self.hand.poses)
+        return build_grammar(*tables)
+
+    def set_grammar(self, grammar):
+        """Switch the recognizer grammar at runtime (None for open vocabulary)"""
+        self.grammar = grammar
+        self.recognizer = switch_grammar(self.recognizer, self.model, self.SAMPLE_RATE, grammar)
+
+    def send_command(self, command, trace=None):
+        """Send command to Arduino without waiting for the ack"""
+        if not self.connection or not self.connection.ready:
             print("⚠️  Not connected to Arduino")
+            self.command_queue.forget()
+            self.latency.record(trace)
             return False
             
+        future = self.connection.submit(command)
+        if trace:
+            trace.mark('sent')
+        future.add_done_callback(lambda f: self.on_ack(f, trace, command=command))
+        return True
+
+    def send_pose(self, name, trace=None):
+        """Send a named hand pose, one frame per board"""
+        print(f"✋ Pose: {name}")
+        futures = [f for port_futures in self.hand.pose(name).values() for f in port_futures]
+        if trace:
+            trace.mark('sent')
+        if not futures:
+            self.latency.record(trace)
+            return False
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            # The trace is finished by the last board to answer
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            failed = [f for f in futures if f.exception()]
+            self.on_ack(failed[0] if failed else futures[0], trace, actuator='hand', command=name)
+        for future in futures:
+            future.add_done_callback(done)
+        return True
+
+    def on_ack(self, future, trace, actuator=0, command=None):
+        """Finish a command's trace once the Arduino answers (runs on the serial reader thread)"""
         try:
-            cmd_str = f"{command}\n"
-            self.arduino.write(cmd_str.encode('utf-8'))
-            return True
+            future.result()
+            if trace:
+                trace.mark('acked')
         except Exception as e:
             print(f"❌ Error sending command: {e}")
-            return False
+        # Acked or not, the position cache now says where the actuator is headed
+        self.command_queue.forget(actuator, command)
+        self.latency.record(trace)
+
+    def partial_pending(self, text):
+        """True while a partial may still turn into another command.
 
+        That is when it stops part-way through a phrase, or on a word that is
+        only a mis-hearing of a number ("go to", "turn to the"): the real
+        number usually follows.
+        """
+        tokens = tokenize(text)
+        return self.matcher.has_pending_phrase(text) or bool(tokens) and tokens[-1] in self.NUMBER_ALIASES
+    
     def extract_number(self, text):
-        """Extract number from spoken text using pattern matching"""
-        # First check for exact command matches
-        text = text.lower()
-        
-        # Check for direct matches in commands
-        for cmd, angle in self.COMMANDS.items():
-            if cmd in text:
-                return angle
-        
-        # Try to extract numbers
-        for pattern, number in self.NUMBER_PATTERNS.items():
-            if re.search(pattern, text):
-                return number
-                
-        # Try to find numbers in the text
-        numbers = re.findall(r'\d+', text)
-        if numbers:
-            return min(int(numbers[0]), 180)  # Cap at 180 degrees
-            
-        return None
+        """Extract angle from spoken text using the prebuilt command matcher"""
+        return self.matcher.match(text)
+    
+    def parse_command(self, text):
+        """Map a transcript to 'exit', 'stop', a pose name, 'left', 'right', an angle, or None"""
+        if not text:
+            return None
+        # Process exit command first
+        if "exit" in text or "quit" in text:
+            return 'exit'
+        if "stop" in text:
+            return 'stop'
+        # Pose names come before angles ("open hand" is not "open")
+        if self.hand:
+            pose = self.hand.match_pose(text)
+            if pose:
+                return pose
+        # Check for directional commands
+        if "left" in text:
+            return 'left'
+        if "right" in text:
+            return 'right'
+        # Try to extract a number/angle from the command
+        return self.extract_number(text)
+
+    def dispatch(self, command, trace=None):
+        """Act on a parsed command"""
+        if command == 'exit':
+            print("🛑 Exiting...")
+            self.running = False
+            return
+        if self.hand and command in self.hand.poses:
+            if trace:
+                trace.mark('enqueued')
+            self.command_queue.put(command, trace, actuator='hand')
+            return
+        # Step from where the servo is headed, so quick repeats add up
+        target = self.command_queue.target(default=self.current_angle)
+        if command == 'left':
+            command = max(0, target - 15)
+        elif command == 'right':
+            command = min(180, target + 15)
+        if trace:
+            trace.mark('enqueued')
+        self.command_queue.put(command, trace)
+
+    def dump_latency(self, *args):
+        """Write the per-stage latency report (also bound to SIGUSR1)"""
+        report = self.latency.export_json(self.LATENCY_REPORT)
+        print(f"\n📊 Latency report for {report['commands']} commands written to {self.LATENCY_REPORT}")
     
     def process_audio(self):
         """Process audio in a separate thread"""
@@ -155,52 +386,80 @@ class VoiceControl:
         print("- 'one eighty' or '180': Move to 180°")
         print("- '45', '90', etc.: Move to specific angle")
         print("- 'left'/'right': Rotate 15° in that direction")
+        print("- 'stop': Cancel moves that haven't been sent yet")
         print("- 'exit' to quit")
         print("\nListening... (Press Ctrl+C to stop)")
         
+        if self.INPUT_DEVICES:
+            self.process_multi_mic()
+            return
+        
         while self.running:
             try:
-                data = self.stream.read(self.CHUNK, exception_on_overflow=False)
+                data = self.read_chunk()
+                captured = time.monotonic()
+                if self.vad and data:
+                    data = self.vad.gate(data)
+                if not data:
+                    continue
                 
-                if self.recognizer.AcceptWaveform(data):
+                if self.decode(data):
+                    recognized = time.monotonic()
                     result = json.loads(self.recognizer.Result())
                     text = result.get("text", "").strip()
                     
+                    if self.EARLY_FIRE:
+                        command, fired_early = self.stabilizer.final(text)
+                    else:
+                        command, fired_early = self.parse_command(text), False
+                    trace = CommandTrace(captured=captured, recognized=recognized)
+                    trace.mark('parsed')
+                    
                     if not text:
                         continue
                         
                     print(f"\n🎤 Heard: {text}")
                     
-                    # Process exit command first
-                    if "exit" in text or "quit" in text:
-                        print("🛑 Exiting...")
-                        self.running = False
-                        continue
-                        
-                    # Check for directional commands
-                    if "left" in text:
-                        new_angle = max(0, self.current_angle - 15)
-                        self.command_queue.put(new_angle)
-                        continue
-                        
-                    if "right" in text:
-                        new_angle = min(180, self.current_angle + 15)
-                        self.command_queue.put(new_angle)
-                        continue
-                    
-                    # Try to extract a number/angle from the command
-                    angle = self.extract_number(text)
-                    if angle is not None:
-                        self.command_queue.put(angle)
-                    else:
+                    if command is not None:
+                        self.dispatch(command, trace)
+                    elif not fired_early:
                         print("❌ Command not recognized. Try 'open', 'close', '45', '90', etc.")
                 
                 # Process partial results for better responsiveness
                 partial_result = json.loads(self.recognizer.PartialResult())
+                recognized = time.monotonic()
                 partial_text = partial_result.get("partial", "").strip()
-                if partial_text and ("left" in partial_text or "right" in partial_text):
+                if partial_text and self.EARLY_FIRE:
+                    command = self.stabilizer.partial(partial_text)
+                    if command is not None:
+                        trace = CommandTrace(captured=captured, recognized=recognized)
+                        trace.mark('parsed')
+                        print(f"\n⚡ Early command from partial: {partial_text}")
+                        self.dispatch(command, trace)
+                elif partial_text and ("left" in partial_text or "right" in partial_text):
                     print(f"\r🎤 Processing: {partial_text}", end='', flush=True)
                     
+            except Exception as e:
+                print(f"\n❌ Error in audio processing: {e}")
+                time.sleep(0.1)
+                    
+    def process_multi_mic(self):
+        """Recognize on every INPUT_DEVICES mic and act on the most confident result"""
+        run_multi_mic(self.audio, self.INPUT_DEVICES, self.model, self.SAMPLE_RATE, self.CHUNK,
+                      self.on_fused_result, lambda: self.running, grammar=self.grammar,
+                      use_vad=self.USE_VAD, early_fire=self.EARLY_FIRE)
+
+    def on_fused_result(self, text, device, score, captured, recognized):
+        """Act on the winning hypothesis from multi-mic fusion"""
+        print(f"\n🎤 Heard: {text} (mic {device}, confidence {score:.2f})")
+        trace = CommandTrace(captured=captured, recognized=recognized)
+        command = self.parse_command(text)
+        trace.mark('parsed')
+        if command is not None:
+            self.dispatch(command, trace)
+        else:
+            print("❌ Command not recognized. Try 'open', 'close', '45', '90', etc.")
+
     def listen(self):
         """Main listening loop"""
         print("\n🎤 Voice control started")
@@ -208,15 +467,33 @@ class VoiceControl:
         print("Press Ctrl+C to quit\n")
         
         self.running = True
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.dump_latency)
         audio_thread = threading.Thread(target=self.process_audio)
         audio_thread.start()
+        if self.planner:
+            self.planner.start()
         
         while self.running:
             try:
-                command = self.command_queue.get(timeout=1)
-                if command is not None:
-                    self.send_command(command)
-                    self.current_angle = command
+                command, trace = self.command_queue.get(timeout=1)
+                if trace:
+                    trace.mark('dequeued')
+                if command == 'stop':
+                    if self.planner:
+                        self.planner.hold()
+                    print("⏹️  Stopped: pending moves cancelled")
+                    self.latency.record(trace)
+                elif self.hand and command in self.hand.poses:
+                    self.send_pose(command, trace)
+                elif command is not None and self.planner:
+                    # The planner preempts any move in progress and streams the setpoints
+                    self.planner.set_target(command)
+                    if trace:
+                        trace.mark('sent')
+                    self.latency.record(trace)
+                elif command is not None:
+                    self.send_command(command, trace)
             except queue.Empty:
                 pass
             except KeyboardInterrupt:
@@ -238,8 +515,36 @@ class VoiceControl:
         if hasattr(self, 'audio'):
             self.audio.terminate()
             
-        if hasattr(self, 'arduino') and self.arduino and self.arduino.is_open:
-            self.arduino.close()
+        if self.capture:
+            stats = self.capture.stats()
+            print(f"📊 Capture: {stats['overruns']} overruns, "
+                  f"peak buffer fill {stats['peak_fill_pct']:.0f}%")
+            
+        if self.vad:
+            print(f"📊 {self.vad.summary()}")
+            
+        stats = self.command_queue.stats()
+        print(f"📊 Dispatch: {stats['merged']} stale moves merged, "
+              f"{stats['duplicates']} repeats dropped, {stats['cleared']} cancelled by stop")
+            
+        if self.planner:
+            self.planner.stop()
+            stats = self.planner.stats()
+            print(f"📊 Motion: {stats['setpoints_sent']} setpoints, {stats['setpoints_skipped']} skipped, "
+                  f"{stats['preemptions']} preemptions, max tick lateness {stats['max_lateness_ms']:.1f} ms")
+            
+        if self.connection:
+            stats = self.connection.stats()
+            self.connection.close()
+            print(f"📊 Serial: {stats.get('acked', 0)}/{stats.get('sent', 0)} acked, "
+                  f"{stats.get('retries', 0)} retries, {stats.get('timeouts', 0)} timeouts, "
+                  f"{stats['reconnects']} reconnects")
+            
+        if self.hand:
+            self.hand.close()
+            
+        if self.latency.commands:
+            self.dump_latency()
             
         print("✅ Cleanup complete")
 
@@ -1,23 +1,52 @@
 import os
 import json
 import queue
+import signal
 import threading
 import time
-import serial
 import pyaudio
-from vosk import Model, KaldiRecognizer
+from audio_capture import CallbackCapture
+from audio_profile import get_profile
+from dispatch_queue import CoalescingQueue
+from latency import CommandTrace, LatencyTracker
+from multi_mic import run_multi_mic
+from partial_dispatch import PartialStabilizer
+from recognition import build_grammar, create_recognizer, load_model, service_socket, switch_grammar
+from serial_connection import open_connection
+from vad import VoiceActivityGate
 #   
 class VoiceControl:
-    def __init__(self):
+    def __init__(self, open_devices=True):
         # Audio configuration
         self.SAMPLE_RATE = 16000
-        self.CHUNK = 8192
+        # Buffer/read sizes and poll policy, shared with the other entry
+        # points (see audio_profile.py; VOICE_AUDIO_PROFILE selects one)
+        self.PROFILE = get_profile()
+        self.CHUNK = self.PROFILE.read_size
         self.AUDIO_FORMAT = pyaudio.paInt16
         self.CHANNELS = 1
         
+        # Capture with PyAudio's callback API into a ring buffer so slow
+        # decoding can't overflow the device buffer (opt-in)
+        self.USE_CALLBACK_CAPTURE = False
+        self.CAPTURE_BUFFER_SECONDS = 2.0
+        self.capture = None
+        
+        # Input device indexes to listen on at once, e.g. [1, 3]; the most
+        # confident hypothesis wins (None = default input only)
+        self.INPUT_DEVICES = None
+        
+        # Skip silent chunks before they reach the recognizer (opt-in)
+        self.USE_VAD = False
+        
         # Serial configuration
-        self.SERIAL_PORT = 'COM9'  
+        self.SERIAL_PORT = os.environ.get('VOICE_SERIAL_PORT', 'COM9')
         self.BAUD_RATE = 9600
+        # Don't reset the board on open (DTR held low; on Linux/macOS from the second open on)
+        self.SUPPRESS_RESET = False
+        # Links start at BAUD_RATE; binary-protocol sketches are then moved up to
+        # the fastest rate (at most this) that passes an echo test
+        self.MAX_BAUD_RATE = 115200
         
 
         
@@ -27,79 +56,159 @@ class VoiceControl:
             "vosk-model-small-en-us-0.15"
         )
         
+        # Per-stage latency histograms, written here at shutdown (and on SIGUSR1)
+        self.LATENCY_REPORT = os.path.join(os.path.dirname(__file__), "latency_report.json")
+        self.latency = LatencyTracker()
+        
+        # Restrict decoding to the command vocabulary below (opt-in)
+        self.USE_GRAMMAR = False
+        
+        # Fire commands from stable partial results instead of waiting for
+        # the endpoint; PARTIAL_STABILITY is the number of consecutive
+        # partials that must agree
+        self.EARLY_FIRE = False
+        self.PARTIAL_STABILITY = 2
+        
         # Voice command mappings (only open/close)
         self.OPEN_COMMANDS = ['open', 'on', 'start', 'zero']
         self.CLOSE_COMMANDS = ['close', 'shut', 'off', 'one eighty', '180']
+        self.CONTROL_WORDS = ['exit', 'quit']
+        self.stabilizer = PartialStabilizer(self.parse_command, self.PARTIAL_STABILITY)
+        
+        self.vad = VoiceActivityGate(self.SAMPLE_RATE, self.CHUNK) if self.USE_VAD else None
         
-        self.setup_audio()
-        self.setup_serial()
+        self.connection = None  # SerialConnection once the Arduino is connected
+        
+        # open_devices=False skips the microphone and Arduino (benchmarks, replay)
+        if open_devices:
+            self.setup_audio()
+            self.setup_serial()
         self.setup_voice_model()
         
         self.running = False
-        self.command_queue = queue.Queue()
-        self.current_angle = 90  # Start at 90 degrees (center)
-
-
-    def setup_audio(self):
-        """Initialize audio input"""
-        self.audio = pyaudio.PyAudio()
-        self.stream = self.audio.open(
-            format=self.AUDIO_FORMAT,
-            channels=self.CHANNELS,
-            rate=self.SAMPLE_RATE,
-            input=True,
-            frames_per_buffer=self.CHUNK
-        )
+        # Newest target wins; repeats of the target the Arduino confirmed are dropped
+        self.command_queue = CoalescingQueue(current=self.confirmed_target)
+
+
+    def setup_audio(self, audio=None):
+        """Initialize audio input (audio may be a SyntheticAudio source)"""
+        self.audio = audio or pyaudio.PyAudio()
+        if self.INPUT_DEVICES:
+            return  # MultiMicRecognizer opens one stream per device
+        if self.USE_CALLBACK_CAPTURE:
+            self.capture = CallbackCapture(
+                self.PROFILE.frames_per_buffer, self.SAMPLE_RATE, self.CAPTURE_BUFFER_SECONDS
+            )
+            self.stream = self.capture.open(
+                self.audio,
+                format=self.AUDIO_FORMAT,
+                channels=self.CHANNELS,
+                rate=self.SAMPLE_RATE
+            )
+        else:
+            self.stream = self.audio.open(
+                format=self.AUDIO_FORMAT,
+                channels=self.CHANNELS,
+                rate=self.SAMPLE_RATE,
+                input=True,
+                frames_per_buffer=self.PROFILE.frames_per_buffer
+            )
+
+    def read_chunk(self):
+        """Read one CHUNK of audio; None if the capture buffer stayed empty"""
+        if self.PROFILE.sleep:
+            time.sleep(self.PROFILE.sleep)
+        if self.capture:
+            return self.capture.read(self.CHUNK, timeout=1.0)
+        return self.stream.read(self.CHUNK, exception_on_overflow=False)
+
+    def decode(self, data):
+        """Feed audio to the recognizer; True at the end of an utterance"""
+        if not self.vad:
+            return self.recognizer.AcceptWaveform(data)
+        start = time.thread_time()
+        endpoint = self.recognizer.AcceptWaveform(data)
+        self.vad.note_decode(time.thread_time() - start, len(data))
+        return endpoint
 
     def setup_serial(self):
-        """Initialize serial connection to Arduino"""
+        """Open the Arduino connection; returns once the sketch answers the handshake"""
         try:
-            self.ser = serial.Serial(self.SERIAL_PORT, self.BAUD_RATE, timeout=1)
-            time.sleep(2)  # Wait for Arduino to reset
-            print(f"✅ Connected to Arduino on {self.SERIAL_PORT}")
+            self.connection = open_connection(
+                self.SERIAL_PORT,
+                self.BAUD_RATE,
+                suppress_reset=self.SUPPRESS_RESET,
+                max_baud=self.MAX_BAUD_RATE
+            )
+            print(f"✅ Connected to Arduino on {self.SERIAL_PORT} ({self.connection.codec.name} protocol, "
+                  f"{self.connection.link_baud} baud, ready in {self.connection.ready_seconds:.2f}s)")
         except Exception as e:
             print(f"❌ Failed to connect to Arduino: {e}")
-            self.ser = None
+            self.connection = None
+
+    @property
+    def current_angle(self):
+        """Servo angle the Arduino has confirmed (90, the center, until it reports one)"""
+        angle = self.confirmed_target(0)
+        return 90 if angle is None else angle
+
+    def confirmed_target(self, actuator=0):
+        """Where the Arduino says the servo is headed, read from the position cache"""
+        return self.connection.positions.target(actuator) if self.connection else None
 
     def setup_voice_model(self):
-        """Initialize voice recognition model"""
-        if not os.path.exists(self.MODEL_PATH):
+        """Initialize voice recognition model (or connect to the shared service)"""
+        socket_path = service_socket()
+        if not socket_path and not os.path.exists(self.MODEL_PATH):
             print(f"❌ Model not found at {self.MODEL_PATH}")
             print("Please download the model using 'python -m vosk_model_download'")  
             exit(1)
             
-        self.model = Model(self.MODEL_PATH)
-        self.recognizer = KaldiRecognizer(self.model, self.SAMPLE_RATE)
-        self.recognizer.SetWords(True)
+        self.model = load_model(self.MODEL_PATH, socket_path)
+        self.grammar = self.command_grammar() if self.USE_GRAMMAR else None
+        self.recognizer = create_recognizer(self.model, self.SAMPLE_RATE, self.grammar, words=True)
+
+    def command_grammar(self):
+        """Vosk grammar covering every phrase this controller acts on"""
+        return build_grammar(self.OPEN_COMMANDS, self.CLOSE_COMMANDS, self.CONTROL_WORDS)
+
+    def set_grammar(self, grammar):
+        """Switch the recognizer grammar at runtime (None for open vocabulary)"""
+        self.grammar = grammar
+        self.recognizer = switch_grammar(
+            self.recognizer, self.model, self.SAMPLE_RATE, grammar, words=True
+        )
 
-    def send_command(self, angle):
-        """Send angle command to Arduino"""
-        if not self.ser or not self.ser.is_open:
+    def send_command(self, angle, trace=None):
+        """Send angle command to Arduino; the reply is handled by on_ack"""
+        if not self.connection or not self.connection.ready:
             print("⚠️  Not connected to Arduino")
+            self.command_queue.forget()
+            self.latency.record(trace)
             return False
             
+        # Binary MOVE frame, or the angle as a text line for older sketches
+        future = self.connection.submit(angle)
+        if trace:
+            trace.mark('sent')
+        print(f"→ Sent angle: {angle}°")
+        future.add_done_callback(lambda f: self.on_ack(f, angle, trace))
+        return True
+
+    def on_ack(self, future, angle, trace):
+        """Handle Arduino's response (runs on the serial reader thread)"""
         try:
-            # Send angle as a string with newline terminator
-            command = f"{angle}\n"
-            self.ser.write(command.encode('utf-8'))
-            print(f"→ Sent angle: {angle}°")
-            
-            # Wait for and read Arduino's response
-            start_time = time.time()
-            while self.ser.in_waiting == 0:
-                if time.time() - start_time > 1.0:  # 1 second timeout
-                    print("⚠️  No response from Arduino")
-                    return False
-                time.sleep(0.01)
-                
-            response = self.ser.readline().decode('utf-8').strip()
+            response = future.result()
+            if trace:
+                trace.mark('acked')
             print(f"← Arduino: {response}")
-            self.current_angle = angle  # Update current angle
-            return True
-            
+        except TimeoutError:
+            print("⚠️  No response from Arduino")
         except Exception as e:
             print(f"❌ Error sending command: {e}")
-            return False
+        # The position cache now holds whatever the Arduino confirmed
+        self.command_queue.forget(command=angle)
+        self.latency.record(trace)
 
     def process_command(self, text):
         """Process voice command and return angle (0 or 180)"""
@@ -117,6 +226,30 @@ class VoiceControl:
                 
         return None
 
+    def parse_command(self, text):
+        """Map a transcript to 'exit', an angle, or None"""
+        if not text:
+            return None
+        # Process exit command first
+        if "exit" in text or "quit" in text:
+            return 'exit'
+        return self.process_command(text)
+
+    def dispatch(self, command, trace=None):
+        """Act on a parsed command"""
+        if command == 'exit':
+            print("🛑 Exiting...")
+            self.running = False
+            return
+        if trace:
+            trace.mark('enqueued')
+        self.command_queue.put(command, trace)
+
+    def dump_latency(self, *args):
+        """Write the per-stage latency report (also bound to SIGUSR1)"""
+        report = self.latency.export_json(self.LATENCY_REPORT)
+        print(f"\n📊 Latency report for {report['commands']} commands written to {self.LATENCY_REPORT}")
+
     def process_audio(self):
         """Process audio in a separate thread"""
         print("\n🎤 Voice Control for Servo")
@@ -127,42 +260,76 @@ class VoiceControl:
         print("- 'exit' to quit")
         print("\nListening... (Press Ctrl+C to stop)")
         
+        if self.INPUT_DEVICES:
+            self.process_multi_mic()
+            return
+        
         while self.running:
             try:
-                data = self.stream.read(self.CHUNK, exception_on_overflow=False)
+                data = self.read_chunk()
+                captured = time.monotonic()
+                if self.vad and data:
+                    data = self.vad.gate(data)
+                if not data:
+                    continue
                 
-                if self.recognizer.AcceptWaveform(data):
+                if self.decode(data):
+                    recognized = time.monotonic()
                     result = json.loads(self.recognizer.Result())
                     text = result.get("text", "").strip()
                     
+                    if self.EARLY_FIRE:
+                        command, fired_early = self.stabilizer.final(text)
+                    else:
+                        command, fired_early = self.parse_command(text), False
+                    trace = CommandTrace(captured=captured, recognized=recognized)
+                    trace.mark('parsed')
+                    
                     if not text:
                         continue
                         
                     print(f"\n🎤 Heard: {text}")
                     
-                    # Process exit command first
-                    if "exit" in text or "quit" in text:
-                        print("🛑 Exiting...")
-                        self.running = False
-                        continue
-                    
-                    # Process open/close commands
-                    angle = self.process_command(text)
-                    if angle is not None:
-                        self.command_queue.put(angle)
-                    else:
+                    if command is not None:
+                        self.dispatch(command, trace)
+                    elif not fired_early:
                         print("❌ Command not recognized. Say 'open' or 'close'.")
                 
                 # Process partial results for better responsiveness
                 partial_result = json.loads(self.recognizer.PartialResult())
+                recognized = time.monotonic()
                 partial_text = partial_result.get("partial", "").strip()
-                if partial_text and ("left" in partial_text or "right" in partial_text):
+                if partial_text and self.EARLY_FIRE:
+                    command = self.stabilizer.partial(partial_text)
+                    if command is not None:
+                        trace = CommandTrace(captured=captured, recognized=recognized)
+                        trace.mark('parsed')
+                        print(f"\n⚡ Early command from partial: {partial_text}")
+                        self.dispatch(command, trace)
+                elif partial_text and ("left" in partial_text or "right" in partial_text):
                     print(f"\r🎤 Processing: {partial_text}", end='', flush=True)
                     
             except Exception as e:
                 print(f"\n❌ Error in audio processing: {e}")
                 time.sleep(0.1)
 
+    def process_multi_mic(self):
+        """Recognize on every INPUT_DEVICES mic and act on the most confident result"""
+        run_multi_mic(self.audio, self.INPUT_DEVICES, self.model, self.SAMPLE_RATE, self.CHUNK,
+                      self.on_fused_result, lambda: self.running, grammar=self.grammar,
+                      use_vad=self.USE_VAD, early_fire=self.EARLY_FIRE)
+
+    def on_fused_result(self, text, device, score, captured, recognized):
+        """Act on the winning hypothesis from multi-mic fusion"""
+        print(f"\n🎤 Heard: {text} (mic {device}, confidence {score:.2f})")
+        trace = CommandTrace(captured=captured, recognized=recognized)
+        command = self.parse_command(text)
+        trace.mark('parsed')
+        if command is not None:
+            self.dispatch(command, trace)
+        else:
+            print("❌ Command not recognized. Say 'open' or 'close'.")
+
     def listen(self):
         """Main listening loop"""
         print("\n🎤 Voice control started")
@@ -170,6 +337,8 @@ class VoiceControl:
         print("Press Ctrl+C to quit\n")
         
         self.running = True
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.dump_latency)
         audio_thread = threading.Thread(target=self.process_audio)
         audio_thread.daemon = True
         audio_thread.start()
@@ -179,8 +348,10 @@ class VoiceControl:
                 try:
                     # Process commands from the queue
                     try:
-                        angle = self.command_queue.get(timeout=0.1)
-                        self.send_command(str(angle))  # Convert to string for Arduino
+                        angle, trace = self.command_queue.get(timeout=0.1)
+                        if trace:
+                            trace.mark('dequeued')
+                        self.send_command(str(angle), trace)  # Convert to string for Arduino
                     except queue.Empty:
                         pass
                         
@@ -201,8 +372,22 @@ class VoiceControl:
             self.stream.close()
         if hasattr(self, 'audio'):
             self.audio.terminate()
-        if hasattr(self, 'ser') and self.ser and self.ser.is_open:
-            self.ser.close()
+        if self.capture:
+            stats = self.capture.stats()
+            print(f"📊 Capture: {stats['overruns']} overruns, "
+                  f"peak buffer fill {stats['peak_fill_pct']:.0f}%")
+        if self.vad:
+            print(f"📊 {self.vad.summary()}")
+        stats = self.command_queue.stats()
+        print(f"📊 Dispatch: {stats['merged']} stale moves merged, {stats['duplicates']} repeats dropped")
+        if self.connection:
+            stats = self.connection.stats()
+            self.connection.close()
+            print(f"📊 Serial: {stats.get('acked', 0)}/{stats.get('sent', 0)} acked, "
+                  f"{stats.get('retries', 0)} retries, {stats.get('timeouts', 0)} timeouts, "
+                  f"{stats['reconnects']} reconnects")
+        if self.latency.commands:
+            self.dump_latency()
         print("✅ Cleaned up resources")
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import json
+import os
+import wave
+
+LABELS_FILE = "labels.json"
+
+
+def label_from_filename(filename):
+    """'forty_five-02.wav' -> 'forty five'"""
+    stem = os.path.splitext(filename)[0].split('-')[0]
+    return stem.replace('_', ' ').strip().lower()
+
+
+def load_labeled_wavs(directory, sample_rate=16000):
+    """Load a directory of labeled 16-bit mono WAV files.
+
+    Labels come from labels.json ({"file.wav": "spoken text"}) when it is
+    present, otherwise from the file names. Returns a list of
+    (filename, label, pcm_bytes) tuples sorted by file name.
+    """
+    labels = {}
+    labels_path = os.path.join(directory, LABELS_FILE)
+    if os.path.exists(labels_path):
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+
+    samples = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith('.wav'):
+            continue
+        with wave.open(os.path.join(directory, filename), 'rb') as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                print(f"⚠️  Skipping {filename}: expected 16-bit mono audio")
+                continue
+            if wav.getframerate() != sample_rate:
+                print(f"⚠️  Skipping {filename}: expected {sample_rate} Hz, got {wav.getframerate()} Hz")
+                continue
+            pcm = wav.readframes(wav.getnframes())
+        label = labels.get(filename, label_from_filename(filename))
+        samples.append((filename, label, pcm))
+    return samples
+
+
+def iter_chunks(pcm, chunk_frames, sample_width=2):
+    """Yield fixed-size chunks of raw PCM, the way stream.read() returns them"""
+    step = chunk_frames * sample_width
+    for start in range(0, len(pcm), step):
+        yield pcm[start:start + step]